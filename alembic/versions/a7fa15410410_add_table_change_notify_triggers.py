@@ -0,0 +1,66 @@
+"""Add table change NOTIFY triggers for cache invalidation
+
+Revision ID: a7fa15410410
+Revises: 18300a85129d
+Create Date: 2026-10-16 09:12:40.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7fa15410410'
+down_revision: Union[str, Sequence[str], None] = '18300a85129d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 utils/database.py 中 CACHE_NOTIFY_CHANNEL 保持一致
+CHANNEL = 'table_changes'
+
+# 业务表 + 字典表：写入后各副本需要失效对应缓存
+NOTIFY_TABLES = [
+    'molds',
+    'mold_loan_records',
+    'mold_maintenance_logs',
+    'mold_statuses',
+    'loan_statuses',
+    'maintenance_types',
+    'maintenance_result_statuses',
+    'mold_functional_types',
+    'storage_locations',
+    'roles',
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 语句级触发器：每条语句只发一次通知，同一事务内相同负载由PostgreSQL合并
+    op.execute(f"""
+    CREATE OR REPLACE FUNCTION notify_table_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(
+            '{CHANNEL}',
+            json_build_object('table', TG_TABLE_NAME, 'op', TG_OP)::text
+        );
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+    for table in NOTIFY_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify_change ON {table}")
+        op.execute(f"""
+        CREATE TRIGGER trg_{table}_notify_change
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in NOTIFY_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS trg_{table}_notify_change ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_table_change()")
@@ -0,0 +1,43 @@
+"""Add composite indexes for keyset pagination
+
+Revision ID: c3d1e9b7a2f4
+Revises: a7fa15410410
+Create Date: 2026-10-16 14:05:21.503117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3d1e9b7a2f4'
+down_revision: Union[str, Sequence[str], None] = 'a7fa15410410'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 utils/database.py 中 fetch_keyset_page 的排序键一致：(排序时间, 主键)
+KEYSET_INDEXES = [
+    ('idx_molds_created_at_id', 'molds', '(created_at, mold_id)'),
+    ('idx_users_created_at_id', 'users', '(created_at, user_id)'),
+    ('idx_loan_records_app_ts_id', 'mold_loan_records', '(application_timestamp, loan_id)'),
+    # 借用列表按状态筛选后翻页
+    ('idx_loan_records_status_app_ts_id', 'mold_loan_records',
+     '(loan_status_id, application_timestamp, loan_id)'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY 不能在事务内执行；建索引期间不阻塞借用审批等写入
+    with op.get_context().autocommit_block():
+        for name, table, columns in KEYSET_INDEXES:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {columns}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in KEYSET_INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
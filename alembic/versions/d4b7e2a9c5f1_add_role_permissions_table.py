@@ -0,0 +1,66 @@
+"""Add role_permissions table
+
+Revision ID: d4b7e2a9c5f1
+Revises: c3d1e9b7a2f4
+Create Date: 2026-10-16 16:42:09.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4b7e2a9c5f1'
+down_revision: Union[str, Sequence[str], None] = 'c3d1e9b7a2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 初始权限，与此前 utils/auth.py 中硬编码的 ROLE_PERMISSIONS 一致
+INITIAL_PERMISSIONS = {
+    '超级管理员': ['*'],
+    '模具库管理员': [
+        'view_molds', 'manage_molds', 'approve_loans',
+        'view_reports', 'manage_schedule', 'manage_users'
+    ],
+    '模具工': [
+        'view_molds', 'manage_maintenance', 'view_own_tasks'
+    ],
+    '冲压操作工': [
+        'view_molds', 'create_loan', 'view_own_loans', 'view_schedule'
+    ],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('role_permissions',
+    sa.Column('role_id', sa.Integer(), nullable=False),
+    sa.Column('permission', sa.String(length=100), nullable=False),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.role_id'], name=op.f('fk_role_permissions_role_id_roles'),
+                            ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('role_id', 'permission', name=op.f('pk_role_permissions'))
+    )
+
+    # 只为已存在的角色写入；角色名不存在时跳过
+    for role_name, permissions in INITIAL_PERMISSIONS.items():
+        for permission in permissions:
+            op.execute(sa.text(
+                "INSERT INTO role_permissions (role_id, permission) "
+                "SELECT role_id, :permission FROM roles WHERE role_name = :role_name "
+                "ON CONFLICT DO NOTHING"
+            ).bindparams(role_name=role_name, permission=permission))
+
+    # 与迁移 a7fa15410410 相同：权限变更后各进程失效权限缓存
+    op.execute("""
+    CREATE TRIGGER trg_role_permissions_notify_change
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON role_permissions
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_table_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS trg_role_permissions_notify_change ON role_permissions")
+    op.drop_table('role_permissions')
@@ -0,0 +1,114 @@
+"""Partition system_logs by month
+
+Revision ID: f8a3d5c2e9b4
+Revises: e6c1f3a8b2d7
+Create Date: 2026-10-16 20:11:37.652840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f8a3d5c2e9b4'
+down_revision: Union[str, Sequence[str], None] = 'e6c1f3a8b2d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 utils/log_partitions.py 中的命名与预建月数一致
+PARTITION_PREFIX = 'system_logs_p'
+DEFAULT_PARTITION = 'system_logs_default'
+MONTHS_AHEAD = 3
+
+COLUMNS = "log_id, user_id, action_type, target_resource, target_id, details, ip_address, timestamp"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 迁移在一个事务内完成；先锁住原表，运行中的应用（异步审计写入）在此期间的
+    # 写入会等待，而不是写进即将被删除的旧表。EXCLUSIVE模式仍允许读取
+    op.execute("LOCK TABLE system_logs IN EXCLUSIVE MODE")
+
+    # 分区表的主键必须包含分区键；沿用原表的log_id序列
+    op.execute("ALTER SEQUENCE system_logs_log_id_seq OWNED BY NONE")
+    op.execute("""
+    CREATE TABLE system_logs_partitioned (
+        log_id BIGINT NOT NULL DEFAULT nextval('system_logs_log_id_seq'),
+        user_id INTEGER REFERENCES users(user_id),
+        action_type VARCHAR(100) NOT NULL,
+        target_resource VARCHAR(100),
+        target_id VARCHAR(100),
+        details JSONB,
+        ip_address VARCHAR(45),
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        PRIMARY KEY (log_id, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+    """)
+
+    # 覆盖已有数据的最早月份到当前月之后MONTHS_AHEAD个月；范围外的写入落入默认分区，
+    # 由 utils/log_partitions.py 的维护任务拆分
+    op.execute(f"""
+    DO $$
+    DECLARE
+        month_start DATE;
+        last_month DATE := (date_trunc('month', now()) + INTERVAL '{MONTHS_AHEAD} months')::date;
+    BEGIN
+        SELECT COALESCE(date_trunc('month', MIN(timestamp)), date_trunc('month', now()))::date
+        INTO month_start FROM system_logs;
+        WHILE month_start <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF system_logs_partitioned FOR VALUES FROM (%L) TO (%L)',
+                '{PARTITION_PREFIX}' || to_char(month_start, 'YYYYMM'),
+                month_start, (month_start + INTERVAL '1 month')::date
+            );
+            month_start := (month_start + INTERVAL '1 month')::date;
+        END LOOP;
+    END
+    $$;
+    """)
+    op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF system_logs_partitioned DEFAULT")
+
+    # 先搬数据后建索引，比逐行维护索引快
+    op.execute(f"INSERT INTO system_logs_partitioned ({COLUMNS}) SELECT {COLUMNS} FROM system_logs")
+    op.execute("DROP TABLE system_logs")
+    op.execute("ALTER TABLE system_logs_partitioned RENAME TO system_logs")
+    # 主键约束沿用常规名称，便于后续迁移和运维脚本按名查找
+    op.execute("ALTER TABLE system_logs RENAME CONSTRAINT system_logs_partitioned_pkey TO system_logs_pkey")
+    op.execute("ALTER SEQUENCE system_logs_log_id_seq OWNED BY system_logs.log_id")
+
+    # 在父表上建索引，各分区（含以后新建的）自动获得同样的索引：
+    #   (user_id, timestamp)  个人操作记录：按用户筛选、按时间倒序取前N条
+    #   (timestamp) btree     全部用户的最近活动：各分区按序合并即可取前N条（BRIN不能提供顺序）
+    #   (timestamp) BRIN      时间范围统计：日志按时间追加写入，物理顺序与timestamp高度相关，
+    #                         跨月的范围先由分区裁剪，分区内再按块范围跳过，索引只有几十KB
+    op.execute("CREATE INDEX idx_system_logs_user_id_timestamp ON system_logs (user_id, timestamp)")
+    op.execute("CREATE INDEX idx_system_logs_timestamp ON system_logs (timestamp)")
+    op.execute("CREATE INDEX idx_system_logs_timestamp_brin ON system_logs USING brin (timestamp)")
+    op.execute("ANALYZE system_logs")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE system_logs IN EXCLUSIVE MODE")
+    op.execute("ALTER SEQUENCE system_logs_log_id_seq OWNED BY NONE")
+    op.execute("""
+    CREATE TABLE system_logs_plain (
+        log_id BIGINT PRIMARY KEY DEFAULT nextval('system_logs_log_id_seq'),
+        user_id INTEGER REFERENCES users(user_id),
+        action_type VARCHAR(100) NOT NULL,
+        target_resource VARCHAR(100),
+        target_id VARCHAR(100),
+        details JSONB,
+        ip_address VARCHAR(45),
+        timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """)
+    op.execute(f"INSERT INTO system_logs_plain ({COLUMNS}) SELECT {COLUMNS} FROM system_logs")
+    op.execute("DROP TABLE system_logs")
+    op.execute("ALTER TABLE system_logs_plain RENAME TO system_logs")
+    op.execute("ALTER TABLE system_logs RENAME CONSTRAINT system_logs_plain_pkey TO system_logs_pkey")
+    op.execute("ALTER SEQUENCE system_logs_log_id_seq OWNED BY system_logs.log_id")
+    op.execute("CREATE INDEX idx_system_logs_user_id ON system_logs (user_id)")
+    op.execute("CREATE INDEX idx_system_logs_timestamp ON system_logs (timestamp)")
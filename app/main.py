@@ -2,7 +2,9 @@
 
 import streamlit as st
 from utils.auth import login_user, logout_user
-from utils.database import execute_query, test_connection
+from utils.database import execute_query, test_connection, clear_cache, warm_up_database, lookup_ids
+from utils.async_database import gather_queries
+from utils.log_partitions import start_log_partition_maintenance
 import logging
 import time
 import datetime
@@ -210,6 +212,14 @@ def show_login_form():
                                 # 短暂延迟后刷新页面
                                 time.sleep(1)
                                 st.rerun()
+                            elif st.session_state.get('login_busy'):
+                                st.error("❌ 系统繁忙，请稍后再试")
+                            elif 'login_retry_after' in st.session_state:
+                                retry_after = st.session_state['login_retry_after']
+                                if retry_after is None:
+                                    st.error("❌ 登录尝试过于频繁，账号已锁定，请联系管理员")
+                                else:
+                                    st.error(f"❌ 登录尝试过于频繁，请 {retry_after:.0f} 秒后再试")
                             else:
                                 st.error("❌ 用户名或密码错误，请重试")
                         except Exception as e:
@@ -294,7 +304,8 @@ def setup_sidebar():
             st.rerun()
         
         if st.button("🔄 刷新数据", use_container_width=True):
-            st.cache_data.clear()
+            # 写入会自动失效相关缓存，这里仅用于拉取库外变更
+            clear_cache()
             st.success("数据已刷新！")
         
         # 登出按钮
@@ -478,93 +489,54 @@ def show_feature_cards(user_role):
 def show_system_overview():
     """显示系统状态概览"""
     try:
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            try:
-                total_molds = execute_query("SELECT COUNT(*) as count FROM molds", fetch_one=True)
-                count = total_molds['count'] if total_molds else 0
-                st.markdown(f"""
-                <div class="metric-container">
-                    <h2 style='color: #1f77b4; margin: 0; font-size: 2rem;'>{count}</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>模具总数</p>
-                </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                logger.error(f"获取模具总数失败: {e}")
-                st.markdown("""
-                <div class="metric-container">
-                    <h2 style='color: #999; margin: 0; font-size: 2rem;'>--</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>模具总数</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col2:
-            try:
-                active_loans = execute_query(
-                    """SELECT COUNT(*) as count FROM mold_loan_records 
-                       WHERE loan_status_id IN (
-                           SELECT status_id FROM loan_statuses 
-                           WHERE status_name IN ('已借出', '已批准')
-                       )""", 
-                    fetch_one=True
-                )
-                count = active_loans['count'] if active_loans else 0
-                st.markdown(f"""
-                <div class="metric-container">
-                    <h2 style='color: #ff6b6b; margin: 0; font-size: 2rem;'>{count}</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>当前借用</p>
-                </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                logger.error(f"获取当前借用失败: {e}")
-                st.markdown("""
-                <div class="metric-container">
-                    <h2 style='color: #999; margin: 0; font-size: 2rem;'>--</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>当前借用</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col3:
-            try:
-                maintenance_count = execute_query(
-                    "SELECT COUNT(*) as count FROM mold_maintenance_logs WHERE maintenance_end_timestamp IS NULL", 
-                    fetch_one=True
-                )
-                count = maintenance_count['count'] if maintenance_count else 0
-                st.markdown(f"""
-                <div class="metric-container">
-                    <h2 style='color: #4ecdc4; margin: 0; font-size: 2rem;'>{count}</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>维修中</p>
-                </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                logger.error(f"获取维修中失败: {e}")
-                st.markdown("""
-                <div class="metric-container">
-                    <h2 style='color: #999; margin: 0; font-size: 2rem;'>--</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>维修中</p>
-                </div>
-                """, unsafe_allow_html=True)
-        
-        with col4:
-            try:
-                active_users = execute_query("SELECT COUNT(*) as count FROM users WHERE is_active = true", fetch_one=True)
-                count = active_users['count'] if active_users else 0
-                st.markdown(f"""
-                <div class="metric-container">
-                    <h2 style='color: #45b7d1; margin: 0; font-size: 2rem;'>{count}</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>活跃用户</p>
-                </div>
-                """, unsafe_allow_html=True)
-            except Exception as e:
-                logger.error(f"获取活跃用户失败: {e}")
-                st.markdown("""
-                <div class="metric-container">
-                    <h2 style='color: #999; margin: 0; font-size: 2rem;'>--</h2>
-                    <p style='margin: 0.5rem 0 0 0; color: #666;'>活跃用户</p>
-                </div>
-                """, unsafe_allow_html=True)
+        # 四个统计互不依赖，并发查询，耗时取决于最慢的一条
+        overview = gather_queries({
+            'total_molds': {
+                'query': "SELECT COUNT(*) as count FROM molds",
+                'fetch_one': True
+            },
+            'active_loans': {
+                'query': """SELECT COUNT(*) as count FROM mold_loan_records 
+                   WHERE loan_status_id = ANY(%s)""",
+                'params': (lookup_ids('loan_statuses', ('已借出', '已批准')),),
+                'fetch_one': True
+            },
+            'maintenance_count': {
+                'query': "SELECT COUNT(*) as count FROM mold_maintenance_logs WHERE maintenance_end_timestamp IS NULL",
+                'fetch_one': True
+            },
+            'active_users': {
+                'query': "SELECT COUNT(*) as count FROM users WHERE is_active = true",
+                'fetch_one': True
+            },
+        })
+        
+        metrics = [
+            ('total_molds', '模具总数', '#1f77b4'),
+            ('active_loans', '当前借用', '#ff6b6b'),
+            ('maintenance_count', '维修中', '#4ecdc4'),
+            ('active_users', '活跃用户', '#45b7d1'),
+        ]
+        
+        for col, (key, label, color) in zip(st.columns(4), metrics):
+            with col:
+                result = overview.get(key)
+                if isinstance(result, Exception):
+                    logger.error(f"获取{label}失败: {result}")
+                    st.markdown(f"""
+                    <div class="metric-container">
+                        <h2 style='color: #999; margin: 0; font-size: 2rem;'>--</h2>
+                        <p style='margin: 0.5rem 0 0 0; color: #666;'>{label}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    count = result['count'] if result else 0
+                    st.markdown(f"""
+                    <div class="metric-container">
+                        <h2 style='color: {color}; margin: 0; font-size: 2rem;'>{count}</h2>
+                        <p style='margin: 0.5rem 0 0 0; color: #666;'>{label}</p>
+                    </div>
+                    """, unsafe_allow_html=True)
         
     except Exception as e:
         logger.error(f"系统概览加载失败: {e}")
@@ -797,6 +769,11 @@ def show_recent_activities():
 # --- 主程序入口 ---
 def main():
     """主程序入口"""
+    # 后台预热连接池，不阻塞首屏渲染
+    warm_up_database()
+    # system_logs月分区：预建未来分区、按保留期删除旧分区（后台线程）
+    start_log_partition_maintenance()
+    
     # 加载自定义样式
     load_custom_css()
     
@@ -1,8 +1,8 @@
 ﻿# app/pages/1_模具管理.py (带诊断信息版)
 import streamlit as st
 import pandas as pd
-from app.utils.database import execute_query
-from app.utils.auth import has_permission
+from utils.database import cached_query
+from utils.auth import has_permission
 
 st.write("--- DEBUG: 脚本开始执行 ---") # <-- 航点 1
 
@@ -16,12 +16,14 @@ else:
     st.write("--- DEBUG: 登录检查通过。 ---") # <-- 航点 2B
 
 # --- 数据获取函数 ---
-@st.cache_data(ttl=300)
+# 结果按molds表缓存，模具数据写入时自动失效；TTL作为兜底（如缓存失效监听未启用或断线）
+MOLDS_CACHE_TTL = 300
+
 def fetch_molds_data():
     st.write("--- DEBUG: 正在执行fetch_molds_data函数... ---") # <-- 航点 3
     query = "SELECT * FROM molds ORDER BY created_at DESC"
     try:
-        data = execute_query(query, fetch_all=True)
+        data = cached_query(query, ttl=MOLDS_CACHE_TTL)
         if data:
             st.write(f"--- DEBUG: 从数据库获取到 {len(data)} 条数据。 ---") # <-- 航点 4
             return pd.DataFrame(data)
@@ -6,9 +6,13 @@ import logging
 from datetime import datetime, timedelta, date
 from utils.database import (
     execute_query, 
-    get_db_connection,
     get_loan_statuses, 
-    convert_numpy_types 
+    convert_numpy_types,
+    fetch_keyset_page,
+    run_in_transaction,
+    lookup_id,
+    lookup_name,
+    PAGE_SIZE
 )
 
 # Configure logging
@@ -16,20 +20,17 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # --- Helper Functions ---
 def get_status_id_by_name(status_name, table_name="loan_statuses", name_column="status_name", id_column="status_id"):
-    """Fetches the ID of a status by its name from a given status table."""
-    query = f"SELECT {id_column} FROM {table_name} WHERE {name_column} = %s"
+    """Fetches the ID of a status by its name from the in-process lookup map of a status table."""
     try:
-        result = execute_query(query, params=(status_name,), fetch_all=True)
-        if result and len(result) > 0:
-            return result[0][id_column]
-        else:
-            logging.error(f"Status '{status_name}' not found in table '{table_name}'.")
-            st.error(f"系统错误：无法找到状态 '{status_name}'。请联系管理员。")
-            return None
+        status_id = lookup_id(table_name, status_name)
     except Exception as e:
         logging.error(f"Error fetching status ID for '{status_name}' from '{table_name}': {e}")
         st.error(f"数据库错误：获取状态ID失败。详情：{e}")
         return None
+    if status_id is None:
+        logging.error(f"Status '{status_name}' not found in table '{table_name}'.")
+        st.error(f"系统错误：无法找到状态 '{status_name}'。请联系管理员。")
+    return status_id
 
 def search_available_molds(search_keyword=""):
     """搜索可用模具（状态为'闲置'）"""
@@ -296,76 +297,69 @@ def create_loan_application():
 def submit_loan_application(mold_id, applicant_id, expected_return_date, destination_equipment, 
                           production_order=None, estimated_strokes=None, remarks=None):
     """提交借用申请"""
-    try:
-        with get_db_connection() as conn:
-            conn.autocommit = False
-            cursor = conn.cursor()
-
-            # 获取待审批状态ID
-            pending_status_id = get_status_id_by_name("待审批", table_name="loan_statuses")
-            if not pending_status_id:
-                st.error("系统配置错误：无法获取借用状态。")
-                return
-
-            # 再次验证模具状态（防止并发问题）
-            cursor.execute(
-                "SELECT current_status_id FROM molds WHERE mold_id = %s", 
-                (mold_id,)
-            )
-            mold_status_result = cursor.fetchone()
-            
-            idle_status_id = get_status_id_by_name("闲置", table_name="mold_statuses")
-            if not mold_status_result or mold_status_result[0] != idle_status_id:
-                st.error("模具状态已改变，无法申请借用。请重新搜索选择。")
-                conn.rollback()
-                return
-
-            # 构建完整的备注信息
-            full_remarks = []
-            if production_order:
-                full_remarks.append(f"生产订单: {production_order}")
-            if estimated_strokes:
-                full_remarks.append(f"预计冲次: {estimated_strokes:,}")
-            if remarks:
-                full_remarks.append(f"备注: {remarks}")
-            
-            final_remarks = "; ".join(full_remarks) if full_remarks else None
-
-            # 插入借用申请
-            insert_query = """
-            INSERT INTO mold_loan_records (
-                mold_id, applicant_id, application_timestamp, 
-                expected_return_timestamp, destination_equipment, 
-                remarks, loan_status_id
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING loan_id
-            """
-            
-            cursor.execute(insert_query, (
-                mold_id, applicant_id, datetime.now(),
-                expected_return_date, destination_equipment,
-                final_remarks, pending_status_id
-            ))
-            
-            loan_id = cursor.fetchone()[0]
-            conn.commit()
-            
-            st.success("🎉 借用申请提交成功！")
-            st.info(f"申请编号: {loan_id}，状态: 待审批")
-            
-            # 清除选择状态
-            st.session_state.selected_mold_id = None
-            st.session_state.selected_mold_info = None
-            st.session_state.mold_search_results = []
-            
-            st.balloons()
-            
-            # 提示后续流程
-            st.info("📋 申请已提交，请等待模具库管理员审批。您可以在'查看与管理申请'页面查看申请状态。")
+    # 构建完整的备注信息
+    full_remarks = []
+    if production_order:
+        full_remarks.append(f"生产订单: {production_order}")
+    if estimated_strokes:
+        full_remarks.append(f"预计冲次: {estimated_strokes:,}")
+    if remarks:
+        full_remarks.append(f"备注: {remarks}")
+    
+    final_remarks = "; ".join(full_remarks) if full_remarks else None
 
+    pending_status_id = get_status_id_by_name("待审批", table_name="loan_statuses")
+    idle_status_id = get_status_id_by_name("闲置", table_name="mold_statuses")
+    if not pending_status_id or not idle_status_id:
+        st.error("系统配置错误：无法获取借用状态。")
+        return
+
+    # 校验模具仍为闲置与插入申请合为一条语句（防止并发问题）
+    insert_query = """
+    INSERT INTO mold_loan_records (
+        mold_id, applicant_id, application_timestamp, 
+        expected_return_timestamp, destination_equipment, 
+        remarks, loan_status_id
+    )
+    SELECT mold_id, %(applicant_id)s, %(now)s, %(expected_return)s, %(destination)s, %(remarks)s, %(pending)s
+    FROM molds
+    WHERE mold_id = %(mold_id)s AND current_status_id = %(idle)s
+    RETURNING loan_id
+    """
+    params = {
+        'mold_id': mold_id,
+        'applicant_id': applicant_id,
+        'now': datetime.now(),
+        'expected_return': expected_return_date,
+        'destination': destination_equipment,
+        'remarks': final_remarks,
+        'pending': pending_status_id,
+        'idle': idle_status_id,
+    }
+
+    try:
+        inserted = run_in_transaction(lambda uow: uow.fetch_one(insert_query, params))
     except Exception as e:
         logging.error(f"Loan application submission failed: {e}", exc_info=True)
         st.error(f"提交申请失败：{e}")
+        return
+
+    if not inserted:
+        st.error("模具状态已改变，无法申请借用。请重新搜索选择。")
+        return
+
+    st.success("🎉 借用申请提交成功！")
+    st.info(f"申请编号: {inserted['loan_id']}，状态: 待审批")
+    
+    # 清除选择状态
+    st.session_state.selected_mold_id = None
+    st.session_state.selected_mold_info = None
+    st.session_state.mold_search_results = []
+    
+    st.balloons()
+    
+    # 提示后续流程
+    st.info("📋 申请已提交，请等待模具库管理员审批。您可以在'查看与管理申请'页面查看申请状态。")
 
 # 修复后的借用管理查询部分
 # 替换 pages/loan_management.py 中的 view_loan_applications 函数
@@ -444,12 +438,24 @@ def view_loan_applications():
             query_base += " WHERE mlr.loan_status_id = %s"
             params.append(selected_status_id)
 
-        query_base += " ORDER BY mlr.application_timestamp DESC"
+        # 键集分页：按 (application_timestamp, loan_id) 倒序定位，筛选条件变化时回到第一页
+        page_state = st.session_state.get('loan_page_state')
+        if not page_state or page_state['status_id'] != selected_status_id:
+            page_state = {'status_id': selected_status_id, 'cursors': [None]}
+            st.session_state['loan_page_state'] = page_state
         
         # 执行查询并显示调试信息
         st.write(f"🔍 执行查询，状态ID筛选: {selected_status_id if selected_status_id != 0 else '全部'}")
         
-        loan_apps_result = execute_query(query_base, params=tuple(params), fetch_all=True)
+        page = fetch_keyset_page(
+            query_base, ('application_timestamp', 'loan_id'), params=params,
+            after=page_state['cursors'][-1], limit=PAGE_SIZE
+        )
+        loan_apps_result = page['rows']
+        if not loan_apps_result and len(page_state['cursors']) > 1:
+            # 当前页记录已全部移出筛选范围（如已审批完），回到第一页
+            page_state['cursors'] = [None]
+            st.rerun()
         
         # 显示查询结果统计
         if loan_apps_result:
@@ -460,20 +466,32 @@ def view_loan_applications():
             # 如果筛选条件下没有记录，显示所有记录用于调试
             if selected_status_id != 0:
                 st.write("🔧 显示所有记录用于调试:")
-                all_records = execute_query(
-                    query_base.replace(" WHERE mlr.loan_status_id = %s", ""), 
-                    fetch_all=True
-                )
+                all_records = fetch_keyset_page(
+                    query_base.replace(" WHERE mlr.loan_status_id = %s", ""),
+                    ('application_timestamp', 'loan_id')
+                )['rows']
                 if all_records:
                     for record in all_records:
                         st.write(f"- 申请ID: {record.get('loan_id')}, 状态: {record.get('loan_status')} (ID: {record.get('loan_status_id')})")
             return
 
-        # 显示统计信息
-        total_apps = len(loan_apps_result)
-        pending_count = len([app for app in loan_apps_result if app.get('loan_status') == '待审批'])
-        approved_count = len([app for app in loan_apps_result if app.get('loan_status') in ['已批准', '已借出']])
-        returned_count = len([app for app in loan_apps_result if app.get('loan_status') == '已归还'])
+        # 显示统计信息（按状态聚合全部记录，而不只是当前页）
+        count_query = """
+        SELECT ls.status_name, COUNT(*) AS count
+        FROM mold_loan_records mlr
+        JOIN loan_statuses ls ON mlr.loan_status_id = ls.status_id
+        """
+        if selected_status_id != 0:
+            count_query += " WHERE mlr.loan_status_id = %s"
+        count_query += " GROUP BY ls.status_name"
+        status_counts = {
+            row['status_name']: row['count']
+            for row in execute_query(count_query, params=tuple(params), fetch_all=True) or []
+        }
+        total_apps = sum(status_counts.values())
+        pending_count = status_counts.get('待审批', 0)
+        approved_count = status_counts.get('已批准', 0) + status_counts.get('已借出', 0)
+        returned_count = status_counts.get('已归还', 0)
 
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -553,11 +571,33 @@ def view_loan_applications():
                             if mark_as_returned(app_id, mold_id, current_user_id):
                                 st.rerun()
 
+        # 翻页
+        page_number = len(page_state['cursors'])
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("⬅️ 上一页", key="loan_prev_page", disabled=page_number == 1):
+                page_state['cursors'].pop()
+                st.rerun()
+        with info_col:
+            st.caption(f"第 {page_number} 页，每页 {PAGE_SIZE} 条，共 {total_apps} 条")
+        with next_col:
+            if st.button("下一页 ➡️", key="loan_next_page", disabled=page['next_cursor'] is None):
+                page_state['cursors'].append(page['next_cursor'])
+                st.rerun()
+
     except Exception as e:
         logging.error(f"Failed to load loan applications: {e}")
         st.error(f"加载借用申请列表失败：{e}")
         st.exception(e)  # 显示详细错误用于调试
 
+LOCK_LOAN_AND_MOLD_QUERY = """
+SELECT mlr.loan_status_id, m.current_status_id
+FROM mold_loan_records mlr
+JOIN molds m ON m.mold_id = mlr.mold_id
+WHERE mlr.loan_id = %s AND mlr.mold_id = %s
+FOR UPDATE OF mlr, m
+"""
+
 def _update_loan_and_mold_status(loan_id, mold_id,
                                  current_loan_status_name, target_loan_status_name,
                                  current_mold_status_name, target_mold_status_name,
@@ -565,71 +605,80 @@ def _update_loan_and_mold_status(loan_id, mold_id,
                                  loan_timestamp_field=None,
                                  loan_operator_field=None,
                                  remarks_field=None, remarks_value=None):
-    """Generic function to update loan and mold statuses within a transaction."""
-    try:
-        with get_db_connection() as conn:
-            conn.autocommit = False
-            cursor = conn.cursor()
-
-            # Get status IDs
-            current_loan_status_id = get_status_id_by_name(current_loan_status_name, table_name="loan_statuses")
-            target_loan_status_id = get_status_id_by_name(target_loan_status_name, table_name="loan_statuses")
-            current_mold_status_id = get_status_id_by_name(current_mold_status_name, table_name="mold_statuses")
-            target_mold_status_id = get_status_id_by_name(target_mold_status_name, table_name="mold_statuses")
-
-            if not all([current_loan_status_id, target_loan_status_id, current_mold_status_id, target_mold_status_id]):
-                st.error("系统配置错误：无法获取操作所需的状态ID。")
-                conn.rollback()
-                return False
-
-            # Verify current loan application status
-            cursor.execute("SELECT loan_status_id, mold_id FROM mold_loan_records WHERE loan_id = %s", (loan_id,))
-            app_data = cursor.fetchone()
-            if not app_data or app_data[0] != current_loan_status_id or app_data[1] != mold_id:
-                st.warning(f"操作失败：申请状态不正确。请刷新页面。")
-                conn.rollback()
-                return False
-
-            # Update loan application
-            update_loan_q = "UPDATE mold_loan_records SET loan_status_id = %s"
-            params_loan = [target_loan_status_id]
-            
-            now_timestamp = datetime.now()
-            if loan_timestamp_field:
-                update_loan_q += f", {loan_timestamp_field} = %s"
-                params_loan.append(now_timestamp)
-            if loan_operator_field:
-                update_loan_q += f", {loan_operator_field} = %s"
-                params_loan.append(operator_user_id)
-            if remarks_field and remarks_value is not None:
-                update_loan_q += f", {remarks_field} = %s"
-                params_loan.append(remarks_value)
-            
-            update_loan_q += " WHERE loan_id = %s AND loan_status_id = %s"
-            params_loan.extend([loan_id, current_loan_status_id])
-            
-            cursor.execute(update_loan_q, tuple(params_loan))
-            if cursor.rowcount == 0:
-                st.warning("操作失败：申请记录更新失败。")
-                conn.rollback()
-                return False
-
-            # Update mold status
-            update_mold_q = """
-                UPDATE molds SET current_status_id = %s, updated_at = %s
-                WHERE mold_id = %s AND current_status_id = %s
-            """
-            cursor.execute(update_mold_q, (target_mold_status_id, now_timestamp, mold_id, current_mold_status_id))
-
-            conn.commit()
-            st.success(f"操作成功：申请状态已更新为 {target_loan_status_name}。")
-            return True
+    """
+    Generic function to update loan and mold statuses within a transaction.
+
+    One short unit of work: lock the loan and mold rows, verify both statuses,
+    then update both tables in a single statement. Status IDs come from the
+    in-process lookup maps, so the whole operation is BEGIN + 2 statements + COMMIT.
+    Deadlocks between concurrent operations on the same mold are retried.
+    """
+    status_ids = {
+        'current_loan': get_status_id_by_name(current_loan_status_name, table_name="loan_statuses"),
+        'target_loan': get_status_id_by_name(target_loan_status_name, table_name="loan_statuses"),
+        'current_mold': get_status_id_by_name(current_mold_status_name, table_name="mold_statuses"),
+        'target_mold': get_status_id_by_name(target_mold_status_name, table_name="mold_statuses"),
+    }
+    if not all(status_ids.values()):
+        st.error("系统配置错误：无法获取操作所需的状态ID。")
+        return False
+    mold_changes = status_ids['current_mold'] != status_ids['target_mold']
+
+    update_loan_q = "UPDATE mold_loan_records SET loan_status_id = %(target_loan)s"
+    params = {
+        'loan_id': loan_id,
+        'mold_id': mold_id,
+        'target_loan': status_ids['target_loan'],
+        'target_mold': status_ids['target_mold'],
+        'now': datetime.now(),
+        'operator': operator_user_id,
+        'remarks': remarks_value,
+    }
+    if loan_timestamp_field:
+        update_loan_q += f", {loan_timestamp_field} = %(now)s"
+    if loan_operator_field:
+        update_loan_q += f", {loan_operator_field} = %(operator)s"
+    if remarks_field and remarks_value is not None:
+        update_loan_q += f", {remarks_field} = %(remarks)s"
+    update_loan_q += " WHERE loan_id = %(loan_id)s"
+
+    if mold_changes:
+        update_q = f"""
+        WITH loan_update AS ({update_loan_q})
+        UPDATE molds SET current_status_id = %(target_mold)s, updated_at = %(now)s
+        WHERE mold_id = %(mold_id)s
+        """
+    else:
+        update_q = update_loan_q
+
+    def work(uow):
+        # 行锁保证校验与更新之间状态不被其他会话修改
+        locked = uow.fetch_one(LOCK_LOAN_AND_MOLD_QUERY, (loan_id, mold_id))
+        if not locked or locked['loan_status_id'] != status_ids['current_loan']:
+            uow.set_rollback_only()
+            return "操作失败：申请状态不正确。请刷新页面。"
+        # 只有需要改变模具状态的操作才要求模具处于预期状态（例如审批时模具已被其他申请借出）
+        if mold_changes and locked['current_status_id'] != status_ids['current_mold']:
+            mold_status = lookup_name('mold_statuses', locked['current_status_id'])
+            uow.set_rollback_only()
+            return f"操作失败：模具当前状态为 {mold_status}，请刷新页面。"
+        uow.execute(update_q, params)
+        return None
 
+    try:
+        failure = run_in_transaction(work)
     except Exception as e:
         logging.error(f"Error during status update for loan {loan_id}: {e}", exc_info=True)
         st.error(f"操作失败：{e}")
         return False
 
+    if failure:
+        st.warning(failure)
+        return False
+
+    st.success(f"操作成功：申请状态已更新为 {target_loan_status_name}。")
+    return True
+
 def approve_loan_application(loan_id, mold_id, approver_user_id):
     return _update_loan_and_mold_status(
         loan_id, mold_id,
@@ -6,11 +6,16 @@ import logging
 from datetime import datetime, timedelta, date
 from utils.database import (
     execute_query, 
+    query_frame,
     get_db_connection,
     convert_numpy_types,
     get_all_molds,
-    get_mold_by_id
+    get_mold_by_id,
+    lookup_id,
+    lookup_ids,
+    lookup_name
 )
+from utils.pipeline import run_pipeline
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -51,7 +56,7 @@ def get_molds_needing_maintenance():
         CASE 
             WHEN m.maintenance_cycle_strokes > 0 AND m.accumulated_strokes >= m.maintenance_cycle_strokes 
             THEN '需要保养'
-            WHEN m.current_status_id IN (SELECT status_id FROM mold_statuses WHERE status_name IN ('待维修', '待保养'))
+            WHEN m.current_status_id = ANY(%s)
             THEN '等待维修/保养'
             WHEN m.theoretical_lifespan_strokes > 0 AND m.accumulated_strokes >= m.theoretical_lifespan_strokes * 0.9
             THEN '即将到期'
@@ -68,18 +73,21 @@ def get_molds_needing_maintenance():
     LEFT JOIN storage_locations sl ON m.current_location_id = sl.location_id
     WHERE 
         (m.maintenance_cycle_strokes > 0 AND m.accumulated_strokes >= m.maintenance_cycle_strokes)
-        OR m.current_status_id IN (SELECT status_id FROM mold_statuses WHERE status_name IN ('待维修', '待保养'))
+        OR m.current_status_id = ANY(%s)
         OR (m.theoretical_lifespan_strokes > 0 AND m.accumulated_strokes >= m.theoretical_lifespan_strokes * 0.9)
     ORDER BY 
         CASE 
-            WHEN ms.status_name IN ('待维修', '待保养') THEN 1
+            WHEN m.current_status_id = ANY(%s) THEN 1
             WHEN m.maintenance_cycle_strokes > 0 AND m.accumulated_strokes >= m.maintenance_cycle_strokes THEN 2
             ELSE 3
         END,
         m.mold_code
     """
+    # 状态名称在进程内映射中解析为id，查询只做整数比较
+    waiting_status_ids = lookup_ids('mold_statuses', ('待维修', '待保养'))
+    params = (waiting_status_ids, waiting_status_ids, waiting_status_ids)
     try:
-        return execute_query(query, fetch_all=True) or []
+        return execute_query(query, params, fetch_all=True, prepare=True) or []
     except Exception as e:
         st.error(f"获取维修需求失败: {e}")
         return []
@@ -442,90 +450,76 @@ def save_maintenance_record(mold_id, maintenance_type_id, maintained_by_id, star
                           notes=None):
     """保存维修保养记录"""
     try:
-        with get_db_connection() as conn:
-            conn.autocommit = False
-            cursor = conn.cursor()
+        # 如果没有提供结果状态，使用默认状态
+        if not result_status_id:
+            # 尝试多个可能的默认状态
+            default_status_names = ['待开始', '进行中', '已创建', '待执行']
+            
+            for status_name in default_status_names:
+                result_status_id = lookup_id('maintenance_result_statuses', status_name)
+                if result_status_id:
+                    break
             
-            # 如果没有提供结果状态，使用默认状态
             if not result_status_id:
-                # 尝试多个可能的默认状态
-                default_status_names = ['待开始', '进行中', '已创建', '待执行']
-                
-                for status_name in default_status_names:
-                    cursor.execute(
-                        "SELECT status_id FROM maintenance_result_statuses WHERE status_name = %s",
-                        (status_name,)
-                    )
-                    default_status = cursor.fetchone()
-                    if default_status:
-                        result_status_id = default_status[0]
-                        break
+                # 如果还是找不到，检查是否有任何状态记录
+                available_statuses = execute_query(
+                    "SELECT status_id, status_name FROM maintenance_result_statuses LIMIT 5",
+                    fetch_all=True
+                )
                 
-                if not result_status_id:
-                    # 如果还是找不到，检查是否有任何状态记录
-                    cursor.execute("SELECT status_id, status_name FROM maintenance_result_statuses LIMIT 5")
-                    available_statuses = cursor.fetchall()
-                    
-                    if available_statuses:
-                        # 使用第一个可用状态
-                        result_status_id = available_statuses[0][0]
-                        st.warning(f"使用默认状态: {available_statuses[0][1]}")
-                    else:
-                        st.error("❌ 数据库中没有维修状态数据！")
-                        st.error("🔧 解决方案:")
-                        st.code("python fix_maintenance_status.py")
-                        st.info("或者联系管理员执行数据库初始化脚本")
-                        return False
-            
-            # 插入维修记录
-            insert_query = """
-            INSERT INTO mold_maintenance_logs (
-                mold_id, maintenance_type_id, maintained_by_id,
-                maintenance_start_timestamp, maintenance_end_timestamp,
-                problem_description, actions_taken, maintenance_cost,
-                result_status_id, replaced_parts_info, notes
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING log_id
-            """
-            
-            # 将 replaced_parts_info 转换为 JSON 字符串
-            import json
-            replaced_parts_json = json.dumps(replaced_parts_info) if replaced_parts_info else None
-            
-            cursor.execute(insert_query, (
+                if available_statuses:
+                    # 使用第一个可用状态
+                    result_status_id = available_statuses[0]['status_id']
+                    st.warning(f"使用默认状态: {available_statuses[0]['status_name']}")
+                else:
+                    st.error("❌ 数据库中没有维修状态数据！")
+                    st.error("🔧 解决方案:")
+                    st.code("python fix_maintenance_status.py")
+                    st.info("或者联系管理员执行数据库初始化脚本")
+                    return False
+        
+        # 插入维修记录
+        insert_query = """
+        INSERT INTO mold_maintenance_logs (
+            mold_id, maintenance_type_id, maintained_by_id,
+            maintenance_start_timestamp, maintenance_end_timestamp,
+            problem_description, actions_taken, maintenance_cost,
+            result_status_id, replaced_parts_info, notes
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING log_id
+        """
+        
+        # 将 replaced_parts_info 转换为 JSON 字符串
+        import json
+        replaced_parts_json = json.dumps(replaced_parts_info) if replaced_parts_info else None
+        
+        statements = [{
+            'query': insert_query,
+            'params': (
                 mold_id, maintenance_type_id, maintained_by_id,
                 start_timestamp, end_timestamp,
                 problem_description, actions_taken, maintenance_cost,
                 result_status_id, replaced_parts_json, notes
-            ))
-            
-            log_id = cursor.fetchone()[0]
-            
-            # 如果任务已完成，更新模具状态
-            if end_timestamp and result_status_id:
-                # 获取结果状态名称
-                cursor.execute(
-                    "SELECT status_name FROM maintenance_result_statuses WHERE status_id = %s",
-                    (result_status_id,)
-                )
-                status_result = cursor.fetchone()
-                
-                if status_result and status_result[0] in ['合格可用', '完成待检']:
-                    # 更新模具状态为闲置
-                    cursor.execute(
-                        "SELECT status_id FROM mold_statuses WHERE status_name = '闲置'",
-                    )
-                    idle_status_result = cursor.fetchone()
-                    
-                    if idle_status_result:
-                        cursor.execute(
-                            "UPDATE molds SET current_status_id = %s, updated_at = %s WHERE mold_id = %s",
-                            (idle_status_result[0], datetime.now(), mold_id)
-                        )
+            ),
+            'fetch_one': True
+        }]
+        
+        # 如果任务已完成，同时更新模具状态（状态名称在进程内映射中解析，无需先查询）
+        if end_timestamp and result_status_id:
+            result_status_name = lookup_name('maintenance_result_statuses', result_status_id)
+            idle_status_id = lookup_id('mold_statuses', '闲置')
             
-            conn.commit()
-            logging.info(f"Maintenance record created successfully: log_id={log_id}")
-            return True
+            if result_status_name in ['合格可用', '完成待检'] and idle_status_id:
+                # 更新模具状态为闲置
+                statements.append((
+                    "UPDATE molds SET current_status_id = %s, updated_at = %s WHERE mold_id = %s",
+                    (idle_status_id, datetime.now(), mold_id)
+                ))
+        
+        # 插入与状态更新在同一事务中一次往返发送
+        inserted = run_pipeline(statements)[0]
+        logging.info(f"Maintenance record created successfully: log_id={inserted['log_id']}")
+        return True
             
     except Exception as e:
         logging.error(f"Failed to save maintenance record: {e}", exc_info=True)
@@ -917,23 +911,13 @@ def update_maintenance_task():
                             
                             # 如果任务完成且状态为合格，更新模具状态
                             if task_completed and new_status_id:
-                                cursor.execute(
-                                    "SELECT status_name FROM maintenance_result_statuses WHERE status_id = %s",
-                                    (new_status_id,)
-                                )
-                                status_result = cursor.fetchone()
+                                idle_status_id = lookup_id('mold_statuses', '闲置')
                                 
-                                if status_result and status_result[0] in ['合格可用']:
+                                if lookup_name('maintenance_result_statuses', new_status_id) in ['合格可用'] and idle_status_id:
                                     cursor.execute(
-                                        "SELECT status_id FROM mold_statuses WHERE status_name = '闲置'",
+                                        "UPDATE molds SET current_status_id = %s, updated_at = %s WHERE mold_id = %s",
+                                        (idle_status_id, datetime.now(), task['mold_id'])
                                     )
-                                    idle_status_result = cursor.fetchone()
-                                    
-                                    if idle_status_result:
-                                        cursor.execute(
-                                            "UPDATE molds SET current_status_id = %s, updated_at = %s WHERE mold_id = %s",
-                                            (idle_status_result[0], datetime.now(), task['mold_id'])
-                                        )
                             
                             conn.commit()
                             st.success("✅ 任务状态已更新！")
@@ -1021,10 +1005,9 @@ def maintenance_statistics():
         ORDER BY record_count DESC
         """
         
-        type_stats = execute_query(type_stats_query, params=(start_datetime, end_datetime), fetch_all=True)
+        df_type_stats = query_frame(type_stats_query, params=(start_datetime, end_datetime))
         
-        if type_stats:
-            df_type_stats = pd.DataFrame(type_stats)
+        if not df_type_stats.empty:
             df_type_stats['类型'] = df_type_stats.apply(
                 lambda row: f"{row['type_name']} ({'维修' if row['is_repair'] else '保养'})", 
                 axis=1
@@ -1084,10 +1067,9 @@ def maintenance_statistics():
         ORDER BY month
         """
         
-        trend_stats = execute_query(trend_query, params=(start_datetime,), fetch_all=True)
+        df_trend = query_frame(trend_query, params=(start_datetime,))
         
-        if trend_stats:
-            df_trend = pd.DataFrame(trend_stats)
+        if not df_trend.empty:
             df_trend['月份'] = pd.to_datetime(df_trend['month']).dt.strftime('%Y-%m')
             
             # 趋势图
@@ -15,11 +15,28 @@ import numpy as np
 import os
 import logging
 from utils.auth import (
-    has_permission, get_all_users, create_user, update_user_status,
+    has_permission, get_all_users, get_users_page, count_users, get_user_stats,
+    get_user_by_id, get_user_options, username_exists, create_user, update_user_status,
     get_user_activity_log, get_all_roles, validate_password_strength,
-    update_user_password, log_user_action
+    update_user_password, log_user_action, set_role_permissions,
+    PERMISSION_LABELS
 )
-from utils.database import execute_query, test_connection
+from utils.database import (
+    execute_query, test_connection, get_pool_stats, get_prepared_stats, get_replica_stats,
+    get_inflight_query_count, get_unit_of_work_stats, clear_cache, get_role_permissions,
+    STATEMENT_TIMEOUTS
+)
+from utils.query_metrics import (
+    SLOW_QUERY_THRESHOLD_MS, get_overall_percentiles, get_query_stats,
+    get_recent_samples, get_slow_queries, get_cancel_stats
+)
+from utils.audit_log import get_audit_log_stats, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL
+from utils.log_partitions import get_log_partition_stats
+from utils.password_hashing import get_password_hash_stats, BCRYPT_ROUNDS
+from utils.rate_limit import get_rate_limit_stats
+
+# 用户列表每页卡片数
+USER_PAGE_SIZE = 20
 
 def show():
     """系统管理主页面"""
@@ -134,8 +151,7 @@ def show_user_list():
     with col4:
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("🔄 刷新", key="refresh_users"):
-            if hasattr(st, 'cache_data'):
-                st.cache_data.clear()
+            clear_cache(['users', 'roles'])
             st.rerun()
     
     # 如果有新用户需要高亮显示
@@ -146,10 +162,27 @@ def show_user_list():
             del st.session_state['show_new_user']
             st.rerun()
     
+    # 筛选在SQL中完成，键集分页；筛选条件变化时回到第一页
+    filters = {
+        'search': search_term.strip() or None,
+        'role_name': None if role_filter == "全部" else role_filter,
+        'is_active': None if status_filter == "全部" else status_filter == "启用",
+    }
+    page_state = st.session_state.get('user_page_state')
+    if not page_state or page_state['filters'] != filters:
+        page_state = {'filters': filters, 'cursors': [None]}
+        st.session_state['user_page_state'] = page_state
+    
     # 获取用户列表
     try:
-        users = get_all_users()
-        if not users:
+        page = get_users_page(after=page_state['cursors'][-1], limit=USER_PAGE_SIZE, **filters)
+        users = page['rows']
+        stats = get_user_stats()
+        if not users and len(page_state['cursors']) > 1:
+            # 当前页的用户已不再符合条件，回到第一页
+            page_state['cursors'] = [None]
+            st.rerun()
+        if not users and stats['total'] == 0:
             st.warning("⚠️ 未获取到用户数据，请检查数据库连接")
             if st.button("重试获取数据"):
                 st.rerun()
@@ -160,30 +193,18 @@ def show_user_list():
             st.rerun()
         return
     
-    # 应用筛选
-    original_count = len(users)
-    
-    if search_term:
-        users = [u for u in users if search_term.lower() in u.get('username', '').lower() 
-                 or search_term.lower() in u.get('full_name', '').lower()]
-    if role_filter != "全部":
-        users = [u for u in users if u.get('role_name') == role_filter]
-    if status_filter != "全部":
-        is_active = status_filter == "启用"
-        users = [u for u in users if u.get('is_active') == is_active]
+    filtered_count = count_users(**filters) if any(v is not None for v in filters.values()) else stats['total']
     
-    # 统计信息
+    # 统计信息（SQL聚合全部用户，而不只是当前页）
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        all_users = get_all_users()
-        st.metric("总用户数", len(all_users))
+        st.metric("总用户数", stats['total'])
     with col2:
-        active_count = len([u for u in all_users if u.get('is_active', True)])
-        st.metric("活跃用户", active_count)
+        st.metric("活跃用户", stats['active'])
     with col3:
-        st.metric("筛选结果", len(users))
-        if len(users) != original_count:
-            st.caption(f"从 {original_count} 个用户中筛选")
+        st.metric("筛选结果", filtered_count)
+        if filtered_count != stats['total']:
+            st.caption(f"从 {stats['total']} 个用户中筛选")
     with col4:
         st.metric("系统角色", len(get_all_roles()))
     
@@ -199,6 +220,20 @@ def show_user_list():
                     user = users[i + j]
                     with cols[j]:
                         display_user_card(user)
+        
+        # 翻页
+        page_number = len(page_state['cursors'])
+        prev_col, info_col, next_col = st.columns([1, 2, 1])
+        with prev_col:
+            if st.button("⬅️ 上一页", key="user_prev_page", disabled=page_number == 1):
+                page_state['cursors'].pop()
+                st.rerun()
+        with info_col:
+            st.caption(f"第 {page_number} 页，每页 {USER_PAGE_SIZE} 个，共 {filtered_count} 个")
+        with next_col:
+            if st.button("下一页 ➡️", key="user_next_page", disabled=page['next_cursor'] is None):
+                page_state['cursors'].append(page['next_cursor'])
+                st.rerun()
     else:
         if search_term or role_filter != "全部" or status_filter != "全部":
             st.info("😔 没有找到符合筛选条件的用户")
@@ -350,8 +385,7 @@ def show_create_user():
                 errors.append("用户名只能包含字母、数字和下划线")
             
             # 检查用户名是否重复
-            existing_users = get_all_users()
-            if any(u['username'] == username for u in existing_users):
+            if username and username_exists(username):
                 errors.append(f"用户名 '{username}' 已存在，请选择其他用户名")
             
             # 密码验证
@@ -407,19 +441,17 @@ def show_role_management():
     # 获取所有角色
     roles = get_all_roles()
     
-    # 角色统计
+    # 角色统计（按角色聚合全部用户）
+    role_counts = get_user_stats()['by_role']
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("系统角色数", len(roles))
     with col2:
-        admin_count = len([u for u in get_all_users() if u['role_name'] == '超级管理员'])
-        st.metric("超级管理员", admin_count)
+        st.metric("超级管理员", role_counts.get('超级管理员', 0))
     with col3:
-        manager_count = len([u for u in get_all_users() if u['role_name'] == '模具库管理员'])
-        st.metric("模具库管理员", manager_count)
+        st.metric("模具库管理员", role_counts.get('模具库管理员', 0))
     with col4:
-        operator_count = len([u for u in get_all_users() if u['role_name'] == '冲压操作工'])
-        st.metric("冲压操作工", operator_count)
+        st.metric("冲压操作工", role_counts.get('冲压操作工', 0))
     
     st.markdown("---")
     
@@ -432,24 +464,46 @@ def show_role_management():
                 st.markdown(f"**角色ID**: {role['role_id']}")
                 st.markdown(f"**描述**: {role['description']}")
                 
-                # 获取该角色的用户数
-                role_users = [u for u in get_all_users() if u['role_name'] == role['role_name']]
-                st.markdown(f"**用户数**: {len(role_users)} 人")
+                # 获取该角色的用户数，右侧只列出最近的5个用户
+                role_user_count = role_counts.get(role['role_name'], 0)
+                role_users = get_users_page(role_name=role['role_name'], limit=5)['rows']
+                st.markdown(f"**用户数**: {role_user_count} 人")
                 
                 # 显示权限列表
                 st.markdown("**主要权限**:")
                 permissions = get_role_permissions_list(role['role_name'])
                 for perm in permissions:
                     st.markdown(f"- {perm}")
+                
+                # 权限配置：保存后各进程的权限缓存随role_permissions表变更失效
+                current = sorted(get_role_permissions(role['role_id']))
+                selected = st.multiselect(
+                    "权限配置",
+                    options=sorted(set(PERMISSION_LABELS) | set(current)),
+                    default=current,
+                    format_func=lambda p: f"{PERMISSION_LABELS.get(p, p)} ({p})",
+                    key=f"role_permissions_{role['role_id']}"
+                )
+                if st.button("保存权限", key=f"save_role_permissions_{role['role_id']}",
+                             disabled=set(selected) == set(current)):
+                    success, msg = set_role_permissions(role['role_id'], selected)
+                    if success:
+                        log_user_action('UPDATE_ROLE_PERMISSIONS', 'roles', str(role['role_id']), {
+                            'before': current, 'after': sorted(selected)
+                        })
+                        st.success(msg)
+                        st.rerun()
+                    else:
+                        st.error(msg)
             
             with col2:
                 # 显示该角色的用户列表
                 if role_users:
                     st.markdown("**该角色用户**:")
-                    for user in role_users[:5]:  # 最多显示5个
+                    for user in role_users:
                         st.markdown(f"- {user['full_name']} ({user['username']})")
-                    if len(role_users) > 5:
-                        st.markdown(f"... 还有 {len(role_users) - 5} 个用户")
+                    if role_user_count > len(role_users):
+                        st.markdown(f"... 还有 {role_user_count - len(role_users)} 个用户")
     
     # 权限说明
     with st.expander("📖 权限详细说明", expanded=False):
@@ -488,7 +542,7 @@ def show_activity_logs():
     # 查看特定用户的日志
     if 'view_user_logs' in st.session_state:
         user_id = st.session_state['view_user_logs']
-        user = next((u for u in get_all_users() if u['user_id'] == user_id), None)
+        user = get_user_by_id(user_id)
         if user:
             st.info(f"正在查看用户 **{user['full_name']} ({user['username']})** 的操作日志")
             if st.button("🔙 返回全部日志"):
@@ -502,8 +556,7 @@ def show_activity_logs():
         if 'view_user_logs' not in st.session_state:
             user_filter = st.selectbox(
                 "用户筛选",
-                ["全部"] + [(u['user_id'], f"{u['full_name']} ({u['username']})") 
-                           for u in get_all_users()],
+                ["全部"] + get_user_options(),
                 format_func=lambda x: "全部" if x == "全部" else x[1],
                 key="log_user_filter"
             )
@@ -927,6 +980,151 @@ def show_realtime_monitor():
             st.markdown(f"**发送包数**: {net_io.packets_sent:,}")
             st.markdown(f"**接收包数**: {net_io.packets_recv:,}")
     
+    # 数据库连接池监控
+    with st.expander("数据库连接池", expanded=True):
+        pool_stats = get_pool_stats()
+        if pool_stats.get('max'):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("在用连接", f"{pool_stats['in_use']}/{pool_stats['max']}")
+            with col2:
+                st.metric("空闲连接", pool_stats['idle'])
+            with col3:
+                st.metric("等待中请求", pool_stats['waiting'])
+            with col4:
+                st.metric("借出次数/秒", pool_stats['checkouts_per_sec'])
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("平均等待(ms)", pool_stats['avg_wait_ms'])
+            with col2:
+                st.metric("最长等待(ms)", pool_stats['max_wait_ms'])
+            with col3:
+                st.metric("等待超时", pool_stats['timeouts'])
+            with col4:
+                st.metric("回收连接", pool_stats['recycled'])
+        else:
+            st.warning("连接池未初始化")
+        st.caption(f"备用直连次数: {pool_stats.get('fallback_connects', 0)}")
+        
+        # 语句超时与取消：被放弃的报表不应长期占用连接
+        cancel_stats = get_cancel_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("执行中查询", get_inflight_query_count())
+        with col2:
+            st.metric("超时取消", cancel_stats['by_reason'].get('timeout', 0))
+        with col3:
+            st.metric("会话重跑取消", cancel_stats['by_reason'].get('rerun', 0))
+        with col4:
+            st.metric("会话断开取消", cancel_stats['by_reason'].get('disconnect', 0))
+        st.caption(
+            "语句超时: " + " / ".join(
+                f"{category} {seconds:g}s" if seconds else f"{category} 不限"
+                for category, seconds in STATEMENT_TIMEOUTS.items()
+            )
+        )
+        
+        # 工作单元：冲突重试次数持续升高说明存在热点行
+        uow_stats = get_unit_of_work_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("事务提交", uow_stats['commits'])
+        with col2:
+            st.metric("业务回滚", uow_stats['rollbacks'])
+        with col3:
+            st.metric("冲突重试", uow_stats['retries'])
+        with col4:
+            st.metric("事务失败", uow_stats['failures'])
+    
+    # 只读副本
+    replica_stats = get_replica_stats()
+    if replica_stats['nodes']:
+        with st.expander("只读副本", expanded=False):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("副本读取", replica_stats['replica_reads'])
+            with col2:
+                st.metric("读己之写回主库", replica_stats['sticky_reads'])
+            with col3:
+                st.metric("无可用副本回主库", replica_stats['primary_fallbacks'])
+            with col4:
+                st.metric("延迟上限(s)", replica_stats['max_lag'])
+            df = pd.DataFrame(replica_stats['nodes']).drop(columns=['checked_at']).rename(columns={
+                'address': '地址', 'healthy': '可路由', 'lag_seconds': '复制延迟(s)',
+                'reads': '读取次数', 'error': '状态说明'
+            })
+            st.dataframe(df, hide_index=True, use_container_width=True)
+    
+    # 预编译语句缓存
+    with st.expander("预编译语句缓存", expanded=False):
+        prepared_stats = get_prepared_stats()
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("命中率", f"{prepared_stats['hit_rate'] * 100:.1f}%")
+        with col2:
+            st.metric("命中/未命中", f"{prepared_stats['hits']}/{prepared_stats['misses']}")
+        with col3:
+            st.metric("LRU淘汰", prepared_stats['evictions'])
+        if prepared_stats['queries']:
+            df = pd.DataFrame(prepared_stats['queries']).rename(columns={
+                'query': '查询', 'hits': '命中', 'misses': '未命中', 'hit_rate': '命中率',
+                'avg_hit_ms': '命中均耗时(ms)', 'avg_miss_ms': '未命中均耗时(ms)',
+                'saved_ms_per_hit': '单次节省(ms)', 'saved_ms_total': '累计节省(ms)'
+            })
+            st.dataframe(df, hide_index=True, use_container_width=True)
+    
+    # 操作日志异步写入：积压持续增长或出现同步写入说明写入跟不上
+    with st.expander("操作日志写入", expanded=False):
+        audit_stats = get_audit_log_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("队列积压", audit_stats['queued'])
+        with col2:
+            st.metric("已写入/批次", f"{audit_stats['written']}/{audit_stats['batches']}")
+        with col3:
+            st.metric("队列满同步写入", audit_stats['sync_writes'])
+        with col4:
+            st.metric("写入失败", audit_stats['failed'] + audit_stats['skipped'])
+        st.caption(
+            f"后台线程: {'运行中' if audit_stats['running'] else '未启动'} · "
+            f"每批至多 {AUDIT_BATCH_SIZE} 条 / {AUDIT_FLUSH_INTERVAL:g}s · "
+            f"最近一批耗时 {audit_stats['last_batch_ms']} ms"
+        )
+        partition_stats = get_log_partition_stats()
+        st.caption(
+            f"月分区维护: {'运行中' if partition_stats['running'] else '未启动'} · "
+            f"预建 {partition_stats['months_ahead']} 个月 · "
+            f"保留期 {partition_stats['retention_months'] or '不限'}{' 个月' if partition_stats['retention_months'] else ''} · "
+            f"已新建 {partition_stats['created']} / 已删除 {partition_stats['dropped']} 个分区"
+            + (f"（{partition_stats['deferred']} 次等锁超时推迟）" if partition_stats['deferred'] else "")
+            + (f" · 最近错误: {partition_stats['last_error']}" if partition_stats['errors'] else "")
+        )
+    
+    # 密码计算线程池：平均排队时间接近计算耗时说明线程数不足
+    with st.expander("密码计算线程池", expanded=False):
+        hash_stats = get_password_hash_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("计算中/线程数", f"{hash_stats['running']}/{hash_stats['workers']}")
+        with col2:
+            st.metric("排队中(峰值)", f"{hash_stats['pending']} ({hash_stats['max_pending']})")
+        with col3:
+            st.metric("平均排队(ms)", hash_stats['avg_wait_ms'])
+        with col4:
+            st.metric("平均计算(ms)", hash_stats['avg_work_ms'])
+        st.caption(
+            f"work factor {BCRYPT_ROUNDS} · 已完成 {hash_stats['completed']} 次 · "
+            f"最长排队 {hash_stats['max_wait_ms']} ms · 排队超时拒绝 {hash_stats['rejected']} 次 · "
+            f"登录时升级哈希 {hash_stats['rehashes']} 次"
+        )
+        # 登录限流在bcrypt之前拦截；被拒次数高说明存在暴力尝试
+        limit_stats = get_rate_limit_stats()
+        st.caption(
+            f"登录限流: 检查 {limit_stats['checks']} 次 · 拒绝 {limit_stats['limited']} 次 · "
+            f"检查失败放行 {limit_stats['errors']} 次 · 已清理桶 {limit_stats['swept']} 个"
+        )
+    
     # 在线用户监控
     with st.expander("在线用户", expanded=True):
         # 模拟在线用户数据
@@ -938,47 +1136,103 @@ def show_realtime_monitor():
             st.info("当前没有在线用户")
 
 def show_performance_analysis():
-    """性能分析"""
-    st.markdown("### 系统性能分析")
+    """性能分析 - 数据库查询耗时分位数"""
+    st.markdown("### 数据库查询性能分析")
     
     # 时间范围选择
     col1, col2, col3 = st.columns([2, 2, 1])
     with col1:
-        time_range = st.selectbox("时间范围", ["最近1小时", "最近24小时", "最近7天", "最近30天"])
+        time_range = st.selectbox("时间范围", ["最近1小时", "最近24小时", "全部"])
     with col2:
-        metric_type = st.selectbox("指标类型", ["CPU", "内存", "磁盘IO", "网络IO"])
+        kind_filter = st.selectbox("统计对象", ["查询", "事务", "连接占用"])
     with col3:
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("刷新数据"):
             st.rerun()
     
-    # 性能趋势图
-    fig = create_performance_chart(metric_type, time_range)
-    st.plotly_chart(fig, use_container_width=True)
+    since_seconds = {"最近1小时": 3600, "最近24小时": 86400}.get(time_range)
+    kind = {"查询": "query", "事务": "transaction", "连接占用": "connection"}[kind_filter]
     
-    # 性能统计
+    # 总体分位数
+    overall = get_overall_percentiles(since_seconds)
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("平均值", "45.2%")
+        st.metric("P50 (ms)", overall['p50'])
     with col2:
-        st.metric("峰值", "78.9%")
+        st.metric("P95 (ms)", overall['p95'])
     with col3:
-        st.metric("谷值", "12.3%")
+        st.metric("P99 (ms)", overall['p99'])
     with col4:
-        st.metric("当前值", "42.7%")
-    
-    # API响应时间分析
-    with st.expander("API响应时间分析"):
-        api_stats = get_api_statistics()
-        if api_stats:
-            df = pd.DataFrame(api_stats)
-            
-            # 创建响应时间分布图
-            fig = px.bar(df, x='接口', y='平均响应时间(ms)', title='API平均响应时间')
+        st.metric("样本数", overall['count'], delta=f"最大 {overall['max']} ms", delta_color="off")
+    
+    # 耗时趋势图
+    samples = get_recent_samples(since_seconds)
+    if samples:
+        df_samples = pd.DataFrame(samples)
+        df_samples['时间'] = pd.to_datetime(df_samples['timestamp'], unit='s')
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=df_samples['时间'], y=df_samples['duration_ms'],
+            mode='markers',
+            marker=dict(size=4, color='rgb(31, 119, 180)'),
+            name='耗时'
+        ))
+        fig.add_hline(y=SLOW_QUERY_THRESHOLD_MS, line_dash="dash", line_color="red",
+                      annotation_text="慢查询阈值")
+        fig.update_layout(
+            title='查询耗时分布',
+            xaxis_title='时间',
+            yaxis_title='耗时 (ms)',
+            showlegend=False
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.info("暂无查询耗时样本")
+    
+    # 按查询指纹统计
+    with st.expander("按查询统计（按P95降序）", expanded=True):
+        query_stats = get_query_stats(kind)
+        if query_stats:
+            df = pd.DataFrame(query_stats)
+            fig = px.bar(df.head(15), x='id', y=['p50', 'p95', 'p99'], barmode='group',
+                         title='耗时最高的查询 (ms)')
             st.plotly_chart(fig, use_container_width=True)
-            
-            # 显示详细统计
-            st.dataframe(df, hide_index=True, use_container_width=True)
+            st.dataframe(
+                df[['id', 'callers', 'count', 'p50', 'p95', 'p99', 'max', 'avg_rows', 'avg_pool_wait_ms', 'query']],
+                column_config={
+                    'id': '指纹',
+                    'callers': '调用位置',
+                    'count': '次数',
+                    'avg_rows': '平均行数',
+                    'avg_pool_wait_ms': '平均连接等待(ms)',
+                    'query': '查询'
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.info("暂无统计数据")
+    
+    # 慢查询
+    with st.expander(f"慢查询（>{SLOW_QUERY_THRESHOLD_MS:.0f}ms）"):
+        slow_queries = get_slow_queries()
+        if slow_queries:
+            df = pd.DataFrame(slow_queries)
+            df['时间'] = pd.to_datetime(df['timestamp'], unit='s').dt.strftime('%Y-%m-%d %H:%M:%S')
+            st.dataframe(
+                df[['时间', 'duration_ms', 'caller', 'rows', 'pool_wait_ms', 'query']],
+                column_config={
+                    'duration_ms': '耗时(ms)',
+                    'caller': '调用位置',
+                    'rows': '行数',
+                    'pool_wait_ms': '连接等待(ms)',
+                    'query': '查询'
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.success("暂无慢查询")
 
 def show_error_logs():
     """错误日志"""
@@ -1216,43 +1470,6 @@ def get_online_users():
         {"用户名": "mold_admin", "姓名": "模具库管理员", "登录时间": "2024-06-12 08:30:00", "最后活动": "5分钟前"},
     ]
 
-def create_performance_chart(metric_type, time_range):
-    """创建性能趋势图"""
-    # 模拟数据
-    import numpy as np
-    
-    hours = 24 if "24小时" in time_range else 168 if "7天" in time_range else 1
-    x = pd.date_range(end=datetime.now(), periods=hours, freq='H')
-    y = np.random.randint(20, 80, size=hours) + np.sin(np.arange(hours) * 0.1) * 10
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(
-        x=x, y=y,
-        mode='lines+markers',
-        name=metric_type,
-        line=dict(color='rgb(31, 119, 180)', width=2),
-        marker=dict(size=4)
-    ))
-    
-    fig.update_layout(
-        title=f'{metric_type}使用率趋势',
-        xaxis_title='时间',
-        yaxis_title='使用率 (%)',
-        hovermode='x unified',
-        showlegend=False
-    )
-    
-    return fig
-
-def get_api_statistics():
-    """获取API统计信息（模拟数据）"""
-    return [
-        {"接口": "/api/molds", "调用次数": 1234, "平均响应时间(ms)": 45, "成功率": "99.8%"},
-        {"接口": "/api/loans", "调用次数": 567, "平均响应时间(ms)": 38, "成功率": "99.9%"},
-        {"接口": "/api/maintenance", "调用次数": 890, "平均响应时间(ms)": 52, "成功率": "99.5%"},
-        {"接口": "/api/users", "调用次数": 234, "平均响应时间(ms)": 31, "成功率": "100%"},
-    ]
-
 def get_error_logs(level, module, days):
     """获取错误日志（模拟数据）"""
     logs = [
@@ -1380,8 +1597,8 @@ def debug_user_creation():
     # 测试 get_all_users() 函数
     st.markdown("#### 2. 用户数据获取测试")
     try:
-        users = get_all_users()
-        st.success(f"✅ 成功获取 {len(users)} 个用户")
+        users = get_all_users(limit=5)
+        st.success(f"✅ 成功获取用户数据，共 {get_user_stats()['total']} 个用户")
         
         if users:
             # 显示最近的几个用户
@@ -1457,8 +1674,7 @@ def verify_create_user_function():
         if st.form_submit_button("创建测试用户") and test_role_id:
             try:
                 # 记录创建前的用户数量
-                users_before = get_all_users()
-                count_before = len(users_before)
+                count_before = get_user_stats()['total']
                 st.info(f"创建前用户数量: {count_before}")
                 
                 # 创建用户
@@ -1472,14 +1688,14 @@ def verify_create_user_function():
                     time.sleep(1)
                     
                     # 记录创建后的用户数量
-                    users_after = get_all_users()
-                    count_after = len(users_after)
+                    count_after = get_user_stats()['total']
                     st.info(f"创建后用户数量: {count_after}")
                     
                     if count_after > count_before:
                         st.success("✅ 用户数量增加，创建成功")
                         # 查找新创建的用户
-                        new_user = next((u for u in users_after if u['username'] == test_username), None)
+                        new_user = next((u for u in get_users_page(search=test_username, limit=20)['rows']
+                                         if u['username'] == test_username), None)
                         if new_user:
                             st.success(f"✅ 在用户列表中找到新用户: {new_user['full_name']}")
                         else:
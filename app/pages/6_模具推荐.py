@@ -3,7 +3,7 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from utils.database import execute_query
+from utils.database import execute_query, query_frame
 from utils.auth import require_permission
 
 @require_permission('view_molds')
@@ -405,12 +405,12 @@ def show_recommendation_history():
     """
     
     try:
-        results = execute_query(query, params=(start_date, end_date), fetch_all=True)
+        df = query_frame(query, params=(start_date, end_date))
         
-        if results:
+        if not df.empty:
             # 统计信息
-            total_recommendations = len(results)
-            selected_count = len([r for r in results if r['is_selected']])
+            total_recommendations = len(df)
+            selected_count = int(df['is_selected'].fillna(False).astype(bool).sum())
             acceptance_rate = (selected_count / total_recommendations * 100) if total_recommendations > 0 else 0
             
             col1, col2, col3 = st.columns(3)
@@ -424,7 +424,6 @@ def show_recommendation_history():
             # 显示历史记录
             st.markdown("---")
             
-            df = pd.DataFrame(results)
             df['推荐时间'] = pd.to_datetime(df['created_at']).dt.strftime('%Y-%m-%d %H:%M')
             df['是否采纳'] = df['is_selected'].map({True: '✅ 已采纳', False: '❌ 未采纳'})
             df['推荐分数'] = df['recommendation_score'].apply(lambda x: f"{x:.1f}")
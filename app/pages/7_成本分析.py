@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta
 from utils.database import execute_query
+from utils.async_database import gather_queries
 from utils.auth import require_permission
 
 @require_permission('view_reports')
@@ -63,6 +64,7 @@ def show():
     
     # 获取成本数据
     cost_data = get_cost_summary(start_date, end_date)
+    trend_data, composition = load_cost_analysis_data(start_date, end_date)
     
     # 显示关键指标
     st.markdown("### 📊 成本概览")
@@ -110,7 +112,7 @@ def show():
     ])
     
     with tab1:
-        show_cost_trends(start_date, end_date)
+        show_cost_trends(trend_data, composition)
     
     with tab2:
         show_mold_cost_details(start_date, end_date)
@@ -121,13 +123,10 @@ def show():
     with tab4:
         show_cost_optimization_suggestions()
 
-def show_cost_trends(start_date, end_date):
+def show_cost_trends(trend_data, current_composition):
     """显示成本趋势"""
     st.subheader("📈 成本趋势分析")
     
-    # 获取趋势数据
-    trend_data = get_cost_trend_data(start_date, end_date)
-    
     if trend_data:
         df = pd.DataFrame(trend_data)
         
@@ -178,8 +177,6 @@ def show_cost_trends(start_date, end_date):
         
         with col1:
             # 当期成本构成
-            current_composition = get_cost_composition(start_date, end_date)
-            
             fig_pie = px.pie(
                 values=current_composition['values'],
                 names=current_composition['names'],
@@ -532,60 +529,60 @@ def get_cost_summary(start_date, end_date):
         'avg_change': -10.1
     }
 
-def get_cost_trend_data(start_date, end_date):
-    """获取成本趋势数据"""
-    query = """
-    SELECT 
-        DATE_TRUNC('day', cost_date) as date,
-        SUM(CASE WHEN cost_type = '维修成本' THEN amount ELSE 0 END) as maintenance_cost,
-        SUM(CASE WHEN cost_type = '停机损失' THEN amount ELSE 0 END) as downtime_cost,
-        SUM(amount) as total_cost
-    FROM cost_records
-    WHERE cost_date BETWEEN %s AND %s
-    GROUP BY DATE_TRUNC('day', cost_date)
-    ORDER BY date
-    """
-    
-    try:
-        results = execute_query(query, params=(start_date, end_date), fetch_all=True)
-        return [dict(r) for r in results] if results else []
-    except Exception as e:
-        st.error(f"获取趋势数据失败: {e}")
-        return []
+def load_cost_analysis_data(start_date, end_date):
+    """并发获取成本趋势与成本构成"""
+    results = gather_queries({
+        'trend': ("""
+        SELECT 
+            DATE_TRUNC('day', cost_date) as date,
+            SUM(CASE WHEN cost_type = '维修成本' THEN amount ELSE 0 END) as maintenance_cost,
+            SUM(CASE WHEN cost_type = '停机损失' THEN amount ELSE 0 END) as downtime_cost,
+            SUM(amount) as total_cost
+        FROM cost_records
+        WHERE cost_date BETWEEN %s AND %s
+        GROUP BY DATE_TRUNC('day', cost_date)
+        ORDER BY date
+        """, (start_date, end_date)),
+        'composition': ("""
+        SELECT 
+            cost_type,
+            SUM(amount) as total_amount
+        FROM cost_records
+        WHERE cost_date BETWEEN %s AND %s
+        GROUP BY cost_type
+        """, (start_date, end_date)),
+    })
+    
+    trend = results['trend']
+    if isinstance(trend, Exception):
+        st.error(f"获取趋势数据失败: {trend}")
+        trend = []
+    
+    composition = results['composition']
+    if isinstance(composition, Exception):
+        st.error(f"获取成本构成失败: {composition}")
+        composition = []
+    
+    return [dict(r) for r in trend], build_cost_composition(composition)
 
-def get_cost_composition(start_date, end_date):
-    """获取成本构成"""
-    query = """
-    SELECT 
-        cost_type,
-        SUM(amount) as total_amount
-    FROM cost_records
-    WHERE cost_date BETWEEN %s AND %s
-    GROUP BY cost_type
-    """
-    
-    try:
-        results = execute_query(query, params=(start_date, end_date), fetch_all=True)
-        
-        if results:
-            total = sum(r['total_amount'] for r in results)
-            
-            return {
-                'names': [r['cost_type'] for r in results],
-                'values': [r['total_amount'] for r in results],
-                'changes': [
-                    {
-                        'name': r['cost_type'],
-                        'percentage': (r['total_amount'] / total * 100) if total > 0 else 0,
-                        'change': -5.2  # 示例数据，实际需要计算
-                    }
-                    for r in results
-                ]
-            }
-        return {'names': [], 'values': [], 'changes': []}
-    except Exception as e:
-        st.error(f"获取成本构成失败: {e}")
-        return {'names': [], 'values': [], 'changes': []}
+def build_cost_composition(results):
+    """汇总成本构成"""
+    if results:
+        total = sum(r['total_amount'] for r in results)
+        
+        return {
+            'names': [r['cost_type'] for r in results],
+            'values': [r['total_amount'] for r in results],
+            'changes': [
+                {
+                    'name': r['cost_type'],
+                    'percentage': (r['total_amount'] / total * 100) if total > 0 else 0,
+                    'change': -5.2  # 示例数据，实际需要计算
+                }
+                for r in results
+            ]
+        }
+    return {'names': [], 'values': [], 'changes': []}
 
 def get_mold_cost_details(start_date, end_date, cost_type_filter, sort_by, top_n):
     """获取模具成本明细"""
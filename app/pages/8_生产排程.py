@@ -5,6 +5,7 @@ import plotly.graph_objects as go
 import plotly.express as px
 from datetime import datetime, timedelta, time
 from utils.database import execute_query
+from utils.async_database import gather_queries
 from utils.auth import require_permission
 import json
 
@@ -202,12 +203,14 @@ def show_create_schedule():
 
 def create_single_schedule():
     """创建单个排程"""
+    # 订单、设备、操作工三组下拉数据互不依赖，并发加载
+    orders, equipment_list, operators = load_schedule_form_data()
+    
     with st.form("single_schedule_form"):
         col1, col2 = st.columns(2)
         
         with col1:
             # 订单选择
-            orders = get_pending_orders()
             if orders:
                 order_options = {o['order_id']: f"{o['order_code']} - {o['product_name']}" 
                                for o in orders}
@@ -261,7 +264,6 @@ def create_single_schedule():
                     selected_mold_id = None
             
             # 设备选择
-            equipment_list = get_available_equipment()
             equipment_options = {e['equipment_id']: f"{e['equipment_code']} - {e['equipment_name']}"
                                for e in equipment_list}
             selected_equipment_id = st.selectbox(
@@ -271,7 +273,6 @@ def create_single_schedule():
             )
             
             # 操作工选择
-            operators = get_available_operators()
             operator_options = {o['user_id']: o['full_name'] for o in operators}
             selected_operator_id = st.selectbox(
                 "选择操作工",
@@ -820,33 +821,66 @@ def create_gantt_chart(schedules, view_mode):
     
     return fig
 
+PENDING_ORDERS_QUERY = """
+SELECT 
+    po.order_id,
+    po.order_code,
+    po.quantity,
+    po.due_date,
+    po.priority,
+    p.product_name,
+    COALESCE(SUM(ps.quantity), 0) as scheduled_quantity
+FROM production_orders po
+JOIN products p ON po.product_id = p.product_id
+LEFT JOIN production_schedules ps ON po.order_id = ps.order_id
+WHERE po.status = '待排程' OR po.status = '部分排程'
+GROUP BY po.order_id, po.order_code, po.quantity, po.due_date, po.priority, p.product_name
+HAVING po.quantity > COALESCE(SUM(ps.quantity), 0)
+ORDER BY po.priority DESC, po.due_date
+"""
+
+AVAILABLE_EQUIPMENT_QUERY = """
+SELECT equipment_id, equipment_code, equipment_name, equipment_type, tonnage
+FROM production_equipment
+WHERE is_active = true
+ORDER BY equipment_code
+"""
+
+AVAILABLE_OPERATORS_QUERY = """
+SELECT u.user_id, u.full_name
+FROM users u
+JOIN roles r ON u.role_id = r.role_id
+WHERE r.role_name = '冲压操作工' AND u.is_active = true
+ORDER BY u.full_name
+"""
+
 def get_pending_orders():
     """获取待排程订单"""
-    query = """
-    SELECT 
-        po.order_id,
-        po.order_code,
-        po.quantity,
-        po.due_date,
-        po.priority,
-        p.product_name,
-        COALESCE(SUM(ps.quantity), 0) as scheduled_quantity
-    FROM production_orders po
-    JOIN products p ON po.product_id = p.product_id
-    LEFT JOIN production_schedules ps ON po.order_id = ps.order_id
-    WHERE po.status = '待排程' OR po.status = '部分排程'
-    GROUP BY po.order_id, po.order_code, po.quantity, po.due_date, po.priority, p.product_name
-    HAVING po.quantity > COALESCE(SUM(ps.quantity), 0)
-    ORDER BY po.priority DESC, po.due_date
-    """
-    
     try:
-        results = execute_query(query, fetch_all=True)
+        results = execute_query(PENDING_ORDERS_QUERY, fetch_all=True)
         return [dict(r) for r in results] if results else []
     except Exception as e:
         st.error(f"获取待排程订单失败: {e}")
         return []
 
+def load_schedule_form_data():
+    """并发获取待排程订单、可用设备和操作工"""
+    results = gather_queries({
+        'orders': PENDING_ORDERS_QUERY,
+        'equipment': AVAILABLE_EQUIPMENT_QUERY,
+        'operators': AVAILABLE_OPERATORS_QUERY,
+    })
+    
+    labels = {'orders': '待排程订单', 'equipment': '可用设备', 'operators': '操作工'}
+    loaded = []
+    for key in ('orders', 'equipment', 'operators'):
+        result = results[key]
+        if isinstance(result, Exception):
+            st.error(f"获取{labels[key]}失败: {result}")
+            result = []
+        loaded.append([dict(r) for r in result])
+    return tuple(loaded)
+
 def generate_auto_schedule(orders, start_date, days, shifts, target, 
                          consider_maintenance, consider_skill, min_batch):
     """生成自动排程方案"""
@@ -0,0 +1,242 @@
+# utils/async_database.py - 异步数据库访问（页面内独立查询并发执行）
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Union, Tuple
+
+from utils.database import get_connection_args, execute_query, convert_numpy_types, POOL_TIMEOUT
+from utils.query_metrics import record_query, get_caller
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.numeric import FloatLoader
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# 异步连接池大小（与同步连接池相互独立）
+ASYNC_POOL_MIN_CONN = int(os.getenv('DB_ASYNC_POOL_MIN', '1'))
+ASYNC_POOL_MAX_CONN = int(os.getenv('DB_ASYNC_POOL_MAX', '10'))
+# 一组并发查询的默认总超时（秒）
+GATHER_TIMEOUT = float(os.getenv('DB_GATHER_TIMEOUT', '30'))
+
+QuerySpec = Union[str, Tuple, Dict[str, Any]]
+
+def _normalize_spec(spec: QuerySpec) -> Dict[str, Any]:
+    """
+    统一查询描述
+
+    支持三种写法：
+        "SELECT ..."                          -> 返回全部行
+        ("SELECT ... %s", params)             -> 返回全部行
+        {'query': ..., 'params': ..., 'fetch_one': True}
+    """
+    if isinstance(spec, str):
+        return {'query': spec, 'params': None, 'fetch_one': False}
+    if isinstance(spec, tuple):
+        query, params = spec
+        return {'query': query, 'params': params, 'fetch_one': False}
+    return {
+        'query': spec['query'],
+        'params': spec.get('params'),
+        'fetch_one': spec.get('fetch_one', False),
+    }
+
+def _get_conninfo_kwargs() -> Dict[str, Any]:
+    """把psycopg2连接参数转换为psycopg 3可用的libpq关键字"""
+    conn_args = get_connection_args()
+    conn_args.pop('cursor_factory', None)
+    conn_args.pop('connection_factory', None)
+    conn_args['dbname'] = conn_args.pop('database')
+    return conn_args
+
+async def _configure_connection(conn):
+    """新建连接的会话设置：只读、自动提交、NUMERIC直接解析为float"""
+    conn.adapters.register_loader('numeric', FloatLoader)
+    await conn.set_autocommit(True)
+    await conn.set_read_only(True)
+
+class AsyncQueryRunner:
+    """
+    运行在独立事件循环线程上的异步连接池
+
+    Streamlit脚本在同步线程中执行，每次rerun都新建事件循环会让连接池无法复用；
+    这里在后台线程常驻一个事件循环，同步代码通过gather_queries()提交协程并等待结果。
+    """
+
+    def __init__(self, min_size: int = ASYNC_POOL_MIN_CONN, max_size: int = ASYNC_POOL_MAX_CONN):
+        self.min_size = min_size
+        self.max_size = max_size
+        self._loop = asyncio.new_event_loop()
+        self._pool = None
+        self._pool_lock = None
+        self._thread = threading.Thread(
+            target=self._run_loop, name='async-db-loop', daemon=True
+        )
+        self._thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _get_pool(self) -> 'AsyncConnectionPool':
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+        async with self._pool_lock:
+            if self._pool is None:
+                pool = AsyncConnectionPool(
+                    kwargs={**_get_conninfo_kwargs(), 'row_factory': dict_row},
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    timeout=POOL_TIMEOUT,
+                    configure=_configure_connection,
+                    name='async-db',
+                    open=False,
+                )
+                await pool.open()
+                self._pool = pool
+                logger.info(f"异步连接池创建成功（{self.min_size}-{self.max_size}）")
+        return self._pool
+
+    async def fetch(self, query: str, params=None, fetch_one: bool = False, caller: Optional[str] = None):
+        """执行单条只读查询"""
+        pool = await self._get_pool()
+        start = time.perf_counter()
+        rows = None
+        pool_wait_ms = 0.0
+        try:
+            wait_start = time.perf_counter()
+            async with pool.connection() as conn:
+                pool_wait_ms = (time.perf_counter() - wait_start) * 1000
+                # psycopg 3不使用psycopg2的numpy适配器，参数在此转换
+                if isinstance(params, tuple):
+                    params = list(params)
+                cursor = await conn.execute(query, convert_numpy_types(params))
+                if fetch_one:
+                    result = await cursor.fetchone()
+                    rows = 1 if result else 0
+                else:
+                    result = await cursor.fetchall()
+                    rows = len(result)
+                return result
+        finally:
+            record_query(query, (time.perf_counter() - start) * 1000, rows=rows,
+                         pool_wait_ms=pool_wait_ms,
+                         caller=caller, kind='async')
+
+    async def gather(self, specs: Dict[str, Dict[str, Any]], caller: Optional[str] = None) -> Dict[str, Any]:
+        """并发执行一组查询，失败的查询以异常对象作为结果"""
+        names = list(specs)
+        results = await asyncio.gather(
+            *(self.fetch(caller=caller, **specs[name]) for name in names),
+            return_exceptions=True
+        )
+        return dict(zip(names, results))
+
+    def submit(self, coro, timeout: Optional[float] = None):
+        """从同步代码提交协程并阻塞等待结果"""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def get_stats(self) -> Dict[str, Any]:
+        """异步连接池状态"""
+        if self._pool is None:
+            return {'open': False, 'min_size': self.min_size, 'max_size': self.max_size}
+        return {'open': True, **self._pool.get_stats()}
+
+_runner = None
+_runner_lock = threading.Lock()
+_fallback_executor = None
+
+def get_async_runner() -> Optional[AsyncQueryRunner]:
+    """获取进程内唯一的异步执行器；未安装psycopg 3时返回None"""
+    global _runner
+    if psycopg is None:
+        return None
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = AsyncQueryRunner()
+    return _runner
+
+def _gather_with_threads(specs: Dict[str, Dict[str, Any]], timeout: float) -> Dict[str, Any]:
+    """未安装psycopg 3时的退化实现：在同步连接池上用线程并发"""
+    global _fallback_executor
+    if _fallback_executor is None:
+        with _runner_lock:
+            if _fallback_executor is None:
+                _fallback_executor = ThreadPoolExecutor(
+                    max_workers=ASYNC_POOL_MAX_CONN, thread_name_prefix='db-gather'
+                )
+
+    def run(spec):
+        return execute_query(spec['query'], spec['params'],
+                             fetch_one=spec['fetch_one'], fetch_all=not spec['fetch_one'])
+
+    futures = {name: _fallback_executor.submit(run, spec) for name, spec in specs.items()}
+    deadline = time.monotonic() + timeout
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(max(deadline - time.monotonic(), 0))
+        except Exception as e:
+            results[name] = e
+    return results
+
+def gather_queries(queries: Dict[str, QuerySpec], timeout: float = GATHER_TIMEOUT) -> Dict[str, Any]:
+    """
+    并发执行页面上相互独立的只读查询
+
+    页面耗时取决于最慢的一条查询，而不是所有查询耗时之和。
+
+    Args:
+        queries: 名称 -> 查询描述（见 _normalize_spec）
+        timeout: 整组查询的超时秒数
+
+    Returns:
+        名称 -> 结果（fetch_one为dict或None，否则为list[dict]）；
+        失败的查询结果为对应的异常对象，调用方按需降级显示
+    """
+    specs = {name: _normalize_spec(spec) for name, spec in queries.items()}
+    if not specs:
+        return {}
+
+    runner = get_async_runner()
+    if runner is None:
+        return _gather_with_threads(specs, timeout)
+
+    caller = get_caller()
+    try:
+        results = runner.submit(runner.gather(specs, caller=caller), timeout)
+    except Exception as e:
+        logger.error(f"并发查询失败: {e}")
+        return {name: e for name in specs}
+
+    for name, result in results.items():
+        if isinstance(result, Exception):
+            logger.error(f"并发查询 {name} 失败: {result}")
+    return results
+
+async def fetch_async(query: str, params=None, fetch_one: bool = False):
+    """
+    在异步执行器的事件循环中执行单条只读查询
+
+    仅供已运行在该事件循环上的协程使用；同步代码请使用gather_queries()。
+    """
+    return await get_async_runner().fetch(query, params, fetch_one=fetch_one, caller=get_caller())
+
+def get_async_pool_stats() -> Dict[str, Any]:
+    """异步连接池状态（供系统监控页展示）"""
+    if _runner is None:
+        return {'open': False, 'backend': 'psycopg3' if psycopg else 'threads'}
+    return {'backend': 'psycopg3', **_runner.get_stats()}
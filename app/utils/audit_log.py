@@ -0,0 +1,206 @@
+# utils/audit_log.py - 操作日志的异步批量写入
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from utils.database import execute_query, bulk_insert
+
+logger = logging.getLogger(__name__)
+
+# 设为false时在调用线程同步写入（用于排查或离线脚本）
+AUDIT_ASYNC = os.getenv('DB_AUDIT_ASYNC', 'true') == 'true'
+# 攒够多少条或距首条入队多少秒即写入一批
+AUDIT_BATCH_SIZE = int(os.getenv('DB_AUDIT_BATCH_SIZE', '200'))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('DB_AUDIT_FLUSH_INTERVAL', '1.0'))
+# 队列上限；写满时入队最多等待AUDIT_ENQUEUE_TIMEOUT秒，仍满则由调用线程同步写入
+AUDIT_QUEUE_SIZE = int(os.getenv('DB_AUDIT_QUEUE_SIZE', '10000'))
+AUDIT_ENQUEUE_TIMEOUT = float(os.getenv('DB_AUDIT_ENQUEUE_TIMEOUT', '0.05'))
+
+AUDIT_COLUMNS = ['user_id', 'action_type', 'target_resource', 'target_id', 'details', 'timestamp']
+
+# system_logs是否存在：进程内只查一次，写入失败时重置以便重新检查
+_table_exists = None
+
+_audit_stats = {
+    'enqueued': 0, 'written': 0, 'batches': 0, 'failed': 0,
+    'sync_writes': 0, 'skipped': 0, 'last_batch_ms': 0.0,
+}
+_audit_stats_lock = threading.Lock()
+
+def _count(key: str, amount: int = 1):
+    with _audit_stats_lock:
+        _audit_stats[key] += amount
+
+def system_logs_exists() -> bool:
+    """system_logs表是否存在（进程内缓存）"""
+    global _table_exists
+    if _table_exists is None:
+        row = execute_query("SELECT to_regclass('system_logs') IS NOT NULL AS exists", fetch_one=True)
+        _table_exists = bool(row and row.get('exists'))
+        if not _table_exists:
+            logger.warning("system_logs表不存在，操作日志将被丢弃")
+    return _table_exists
+
+def write_audit_records(records: List[List]) -> bool:
+    """一批日志用一次COPY写入（失败时bulk_insert回退为多行INSERT）"""
+    global _table_exists
+    if not records:
+        return True
+    try:
+        if not system_logs_exists():
+            _count('skipped', len(records))
+            return False
+    except Exception as e:
+        logger.error(f"检查system_logs表失败: {e}")
+        _count('failed', len(records))
+        return False
+
+    start = time.perf_counter()
+    ok = bulk_insert('system_logs', AUDIT_COLUMNS, records)
+    with _audit_stats_lock:
+        _audit_stats['last_batch_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        if ok:
+            _audit_stats['written'] += len(records)
+            _audit_stats['batches'] += 1
+        else:
+            _audit_stats['failed'] += len(records)
+    if not ok:
+        # 可能是表被删除或重建，下一批重新检查
+        _table_exists = None
+    return ok
+
+class AuditLogWriter(threading.Thread):
+    """
+    操作日志后台写入线程（每进程一个）
+
+    请求线程只把日志放入有界队列即返回；本线程攒批后一次写入。
+    队列写满时入队方短暂等待，仍满则在调用线程同步写入，以此
+    对产生日志过快的一方施加背压，而不是丢弃日志。
+    """
+
+    def __init__(self, batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 maxsize: int = AUDIT_QUEUE_SIZE):
+        super().__init__(name='audit-log-writer', daemon=True)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """请求线程写完队列中剩余日志后退出"""
+        self._stop_event.set()
+
+    def _next_batch(self) -> List[List]:
+        """等待首条日志，再在flush_interval内攒到batch_size条"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[List]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        # 退出前写完剩余日志
+        batch = self._drain()
+        while batch:
+            self._write(batch)
+            batch = self._drain()
+
+    def _write(self, batch: List[List]):
+        try:
+            write_audit_records(batch)
+        except Exception as e:
+            logger.error(f"写入操作日志失败（{len(batch)}条）: {e}")
+            _count('failed', len(batch))
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer() -> AuditLogWriter:
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        with _writer_lock:
+            if _writer is None or not _writer.is_alive():
+                pending = _writer.queue if _writer is not None else None
+                _writer = AuditLogWriter()
+                if pending is not None:
+                    # 线程意外退出时保留未写入的日志
+                    while not pending.empty():
+                        _writer.queue.put_nowait(pending.get_nowait())
+                _writer.start()
+    return _writer
+
+def enqueue_audit_record(user_id: int, action_type: str, target_resource: str,
+                         target_id: Optional[str], details: Optional[Dict[str, Any]] = None):
+    """
+    记录一条操作日志，不等待写入完成
+
+    时间戳在入队时取得，与实际写入时间无关。
+    """
+    record = [user_id, action_type, target_resource, target_id, details, datetime.now(timezone.utc)]
+    _count('enqueued')
+    if not AUDIT_ASYNC:
+        _count('sync_writes')
+        write_audit_records([record])
+        return
+    try:
+        _get_writer().queue.put(record, timeout=AUDIT_ENQUEUE_TIMEOUT)
+    except queue.Full:
+        logger.warning("操作日志队列已满，改为同步写入")
+        _count('sync_writes')
+        write_audit_records([record])
+
+def flush_audit_log(timeout: float = 5.0) -> bool:
+    """
+    停止后台线程并写完队列中的日志（进程退出时自动调用）
+
+    Returns:
+        是否在timeout内写完
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is None or not writer.is_alive():
+        return True
+    writer.stop()
+    writer.join(timeout)
+    if writer.is_alive():
+        logger.warning(f"操作日志未能在{timeout:g}s内写完，剩余约{writer.queue.qsize()}条")
+        return False
+    return True
+
+atexit.register(flush_audit_log)
+
+def get_audit_log_stats() -> Dict[str, Any]:
+    """获取操作日志写入统计"""
+    with _audit_stats_lock:
+        stats = dict(_audit_stats)
+    stats['queued'] = _writer.queue.qsize() if _writer is not None else 0
+    stats['running'] = _writer is not None and _writer.is_alive()
+    return stats
@@ -1,51 +1,63 @@
 # app/utils/auth.py - 完整修复版
 
+import functools
 import streamlit as st
-import bcrypt
-from utils.database import execute_query
+from utils.database import (
+    execute_query, fetch_keyset_page, run_in_transaction, lookup_id, PAGE_SIZE,
+    get_role_permissions, get_role_permissions_version, cache_role_permissions
+)
+from utils.audit_log import enqueue_audit_record, system_logs_exists
+from utils.password_hashing import HashPoolBusy, hash_password, verify_password, needs_rehash, rehash_in_background
+from utils.rate_limit import check_login_allowed, refund_login_attempt
 import logging
-import json
 import re  # 用于密码复杂度验证
-import time  # 用于登录尝试延迟
 
 # 配置日志，与database.py统一
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 角色权限映射（保持硬编码，未来可移到DB）
-ROLE_PERMISSIONS = {
-    '超级管理员': ['*'],
-    '模具库管理员': [
-        'view_molds', 'manage_molds', 'approve_loans', 
-        'view_reports', 'manage_schedule', 'manage_users'
-    ],
-    '模具工': [
-        'view_molds', 'manage_maintenance', 'view_own_tasks'
-    ],
-    '冲压操作工': [
-        'view_molds', 'create_loan', 'view_own_loans', 'view_schedule'
-    ]
+# 角色权限存放在role_permissions表（迁移 d4b7e2a9c5f1 写入初始值），按role_id缓存在进程内
+# 可分配的权限及说明，用于角色管理页面
+PERMISSION_LABELS = {
+    '*': '全部权限',
+    'view_molds': '查看模具',
+    'manage_molds': '管理模具台账',
+    'create_mold': '新增模具',
+    'approve_loans': '审批借用',
+    'create_loan': '申请借用',
+    'view_own_loans': '查看本人借用',
+    'manage_maintenance': '维修保养',
+    'view_own_tasks': '查看本人任务',
+    'view_reports': '查看报表',
+    'manage_schedule': '管理生产排程',
+    'view_schedule': '查看生产排程',
+    'manage_users': '管理用户',
 }
 
 def check_password(username: str, password: str):
     """验证用户密码 - 全bcrypt版本"""
     
-    # 查询用户
-    simple_query = """
+    # 用户、角色和权限一次查询取回
+    login_query = """
     SELECT 
-        user_id, 
-        password_hash, 
-        full_name, 
-        email,
-        is_active,
-        role_id
-    FROM users
-    WHERE username = %s AND is_active = true
+        u.user_id, 
+        u.password_hash, 
+        u.full_name, 
+        u.email,
+        u.role_id,
+        r.role_name,
+        COALESCE(array_agg(rp.permission) FILTER (WHERE rp.permission IS NOT NULL), '{}') AS permissions
+    FROM users u
+    LEFT JOIN roles r ON r.role_id = u.role_id
+    LEFT JOIN role_permissions rp ON rp.role_id = u.role_id
+    WHERE u.username = %s AND u.is_active = true
+    GROUP BY u.user_id, r.role_name
     """
     
     try:
         logger.info(f"执行登录查询，用户名: {username}")
-        user = execute_query(simple_query, params=(username,), fetch_one=True)
+        permissions_version = get_role_permissions_version()
+        user = execute_query(login_query, params=(username,), fetch_one=True, prepare=True)
         logger.debug(f"查询结果: {user}")
         
         if not user:
@@ -54,71 +66,127 @@ def check_password(username: str, password: str):
             
         logger.info(f"用户存在，检查密码...")
         
-        # 只用bcrypt验证
-        password_check = bcrypt.checkpw(password.encode('utf-8'), user['password_hash'].encode('utf-8'))
+        # bcrypt校验在专用线程池中执行，高峰期排队而不是挤占其他会话
+        password_check = verify_password(password, user['password_hash'])
         logger.debug(f"bcrypt密码验证结果: {password_check}")
         
         if password_check:
-            # 获取角色名称，从DB查询
-            role_name = None
-            if user.get('role_id'):
-                try:
-                    role_query = "SELECT role_name FROM roles WHERE role_id = %s"
-                    role_result = execute_query(role_query, params=(user['role_id'],), fetch_one=True)
-                    if role_result:
-                        role_name = role_result['role_name']
-                except Exception as e:
-                    logger.error(f"获取角色失败: {e}")
-                    return None  # 失败不登录
-            
+            role_name = user.get('role_name')
             if not role_name:
                 logger.warning(f"用户 {username} 无有效角色")
                 return None
             
+            # 顺带取得的权限写入进程内缓存，随后的权限检查不再查询数据库
+            cache_role_permissions(user['role_id'], user['permissions'], permissions_version)
+            
+            # work factor策略变更后，借登录时的明文透明升级哈希
+            if needs_rehash(user['password_hash']):
+                _schedule_rehash(user['user_id'], user['password_hash'], password)
+            
             return {
                 'user_id': user['user_id'],
                 'username': username,
                 'full_name': user.get('full_name', username),
                 'email': user.get('email', ''),
-                'role': role_name
+                'role': role_name,
+                'role_id': user['role_id'],
+                'permissions': frozenset(user['permissions'])
             }
         else:
             logger.warning(f"密码验证失败: {username}")
             return None
             
+    except HashPoolBusy:
+        # 交给login_user提示繁忙，不能当作密码错误
+        raise
     except Exception as e:
         logger.error(f"登录查询错误: {e}")
         return None
 
+def _schedule_rehash(user_id: int, old_hash: str, password: str):
+    """后台按当前cost重算哈希；仅当哈希未被并发修改时才覆盖"""
+    def save(new_hash: str):
+        execute_query(
+            "UPDATE users SET password_hash = %s WHERE user_id = %s AND password_hash = %s",
+            params=(new_hash, user_id, old_hash),
+            commit=True
+        )
+        logger.info(f"用户 {user_id} 的密码哈希已按新的work factor重算")
+    rehash_in_background(password, save)
+
+def _current_role_id():
+    """当前会话的role_id；只有角色名的会话（如页面调试入口）从字典表映射解析"""
+    role_id = st.session_state.get('user_role_id')
+    if role_id is None and st.session_state.get('user_role'):
+        role_id = lookup_id('roles', st.session_state['user_role'])
+    return role_id
+
 def has_permission(permission: str) -> bool:
-    """检查当前用户是否有指定权限"""
+    """检查当前用户是否有指定权限 - 读取进程内权限缓存"""
     if not st.session_state.get('logged_in'):
         return False
     
-    user_role = st.session_state.get('user_role', '')
-    permissions = ROLE_PERMISSIONS.get(user_role, [])
-    
-    if '*' in permissions:
-        return True
+    role_id = _current_role_id()
+    if role_id is None:
+        return False
     
-    return permission in permissions
+    permissions = get_role_permissions(role_id)
+    return '*' in permissions or permission in permissions
+
+def require_permission(permission: str):
+    """页面入口装饰器：未登录或缺少权限时提示并停止渲染"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not st.session_state.get('logged_in'):
+                st.error("🔒 请先登录以访问此页面。")
+                st.stop()
+            if not has_permission(permission):
+                st.error(f"❌ 权限不足：需要「{PERMISSION_LABELS.get(permission, permission)}」权限")
+                st.stop()
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _client_ip():
+    """
+    客户端IP：nginx设置的X-Real-IP优先，其次X-Forwarded-For的最后一跳；取不到时返回None
+
+    X-Forwarded-For前面的各跳由客户端自行填写，可随意伪造来绕开IP限流；
+    最后一跳是离应用最近的代理追加的对端地址。
+    """
+    context = getattr(st, 'context', None)
+    headers = getattr(context, 'headers', None)
+    if not headers:
+        return None
+    real_ip = headers.get('X-Real-Ip')
+    if real_ip:
+        return real_ip.strip()
+    forwarded = headers.get('X-Forwarded-For')
+    if forwarded:
+        return forwarded.split(',')[-1].strip() or None
+    return None
 
 def login_user(username: str, password: str):
-    """用户登录 - 加尝试限制"""
-    if 'login_attempts' not in st.session_state:
-        st.session_state['login_attempts'] = 0
-        st.session_state['last_attempt_time'] = time.time()
+    """用户登录 - 按用户名和客户端IP限流（跨会话、跨副本共享）"""
+    st.session_state.pop('login_retry_after', None)
+    st.session_state.pop('login_busy', None)
     
-    # 检查锁定
-    if st.session_state['login_attempts'] >= 5:
-        if time.time() - st.session_state['last_attempt_time'] < 300:  # 5分钟锁定
-            logger.warning(f"登录尝试过多，锁定: {username}")
-            return None
-        else:
-            # 超时重置
-            st.session_state['login_attempts'] = 0
+    # 限流在查询用户和bcrypt校验之前，暴力尝试不会消耗数据库查询和CPU
+    client_ip = _client_ip()
+    allowed, retry_after = check_login_allowed(username, client_ip)
+    if not allowed:
+        st.session_state['login_retry_after'] = retry_after
+        return None
     
-    user_info = check_password(username, password)
+    try:
+        user_info = check_password(username, password)
+    except HashPoolBusy:
+        # 密码未经校验，退还本次消耗的令牌，高峰期的重试不会把用户锁定
+        logger.warning(f"登录时密码计算线程池繁忙: {username}")
+        refund_login_attempt(username, client_ip)
+        st.session_state['login_busy'] = True
+        return None
     
     if user_info:
         logger.info(f"登录成功: {username}")
@@ -128,9 +196,7 @@ def login_user(username: str, password: str):
         st.session_state['username'] = user_info['username']
         st.session_state['full_name'] = user_info.get('full_name', user_info['username'])
         st.session_state['user_role'] = user_info['role']
-        
-        # 重置尝试
-        st.session_state['login_attempts'] = 0
+        st.session_state['user_role_id'] = user_info['role_id']
         
         # 记录日志
         try:
@@ -140,9 +206,7 @@ def login_user(username: str, password: str):
         
         return user_info
     else:
-        st.session_state['login_attempts'] += 1
-        st.session_state['last_attempt_time'] = time.time()
-        logger.warning(f"登录失败: {username}，尝试次数: {st.session_state['login_attempts']}")
+        logger.warning(f"登录失败: {username}")
         return None
 
 def logout_user():
@@ -162,98 +226,192 @@ def logout_user():
 
 def log_user_action(action_type: str, target_resource: str, 
                     target_id: str, details: dict = None):
-    """记录用户操作日志"""
+    """记录用户操作日志 - 入队后由后台线程批量写入，不阻塞当前操作"""
     user_id = st.session_state.get('user_id')
     if not user_id:
         return
     
     try:
-        # 检查表存在
-        check_query = """
-        SELECT EXISTS (
-            SELECT 1 FROM information_schema.tables 
-            WHERE table_name = 'system_logs'
-        )
-        """
-        
-        table_exists = execute_query(check_query, fetch_one=True)
-        if not table_exists or not table_exists.get('exists'):
-            logger.warning("system_logs表不存在，跳过日志记录")
-            return
-        
-        # 记录日志
-        query = """
-        INSERT INTO system_logs (user_id, action_type, target_resource, 
-                                 target_id, details, timestamp)
-        VALUES (%s, %s, %s, %s, %s, NOW())
-        """
-        
-        details_json = json.dumps(details) if details else None
-        execute_query(
-            query,
-            params=(user_id, action_type, target_resource, target_id, details_json),
-            commit=True
-        )
-        logger.info(f"日志记录成功: {action_type}")
+        enqueue_audit_record(user_id, action_type, target_resource, target_id, details)
+        logger.debug(f"日志已入队: {action_type}")
     except Exception as e:
         logger.error(f"记录操作日志失败: {e}")
 
-def get_all_users(offset: int = 0, limit: int = 100):
-    """获取所有用户列表，支持分页"""
+USER_LIST_QUERY = """
+SELECT 
+    u.user_id, 
+    u.username, 
+    u.full_name, 
+    u.email, 
+    u.is_active, 
+    r.role_name,
+    u.created_at
+FROM users u
+LEFT JOIN roles r ON u.role_id = r.role_id
+"""
+
+def _user_filters(search=None, role_name=None, is_active=None):
+    """用户列表筛选条件 -> (WHERE子句, 参数)，筛选在SQL中完成，不依赖已取回的页"""
+    conditions, params = [], []
+    if search:
+        conditions.append("(u.username ILIKE %s OR u.full_name ILIKE %s)")
+        # 按子串匹配，输入中的 % _ \ 不作为通配符
+        escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        pattern = f"%{escaped}%"
+        params.extend([pattern, pattern])
+    if role_name:
+        conditions.append("r.role_name = %s")
+        params.append(role_name)
+    if is_active is not None:
+        conditions.append("u.is_active = %s")
+        params.append(is_active)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_users_page(after=None, limit: int = PAGE_SIZE, search=None, role_name=None, is_active=None):
+    """
+    按条件分页获取用户（键集分页，按创建时间倒序）
+
+    Args:
+        after: 上一页返回的next_cursor，为空时取第一页
+        limit: 每页行数
+        search: 用户名或姓名包含的文字
+        role_name: 角色名
+        is_active: 是否启用，None为不限
+
+    Returns:
+        {'rows': 本页用户, 'next_cursor': 下一页游标，没有更多时为None}
+    """
     if not has_permission('manage_users'):
         logger.warning("用户没有manage_users权限")
-        return []
+        return {'rows': [], 'next_cursor': None}
     
+    where, params = _user_filters(search, role_name, is_active)
+    try:
+        return fetch_keyset_page(USER_LIST_QUERY + where, ('created_at', 'user_id'),
+                                 params=params, after=after, limit=limit)
+    except Exception as e:
+        logger.error(f"获取用户列表失败: {e}")
+        return {'rows': [], 'next_cursor': None}
+
+def get_all_users(*, limit: int = 100, after=None):
+    """
+    获取一页用户列表（最新的在前）
+
+    参数仅限关键字传入：旧签名为 (offset, limit)，按位置调用会被误解。
+
+    Args:
+        limit: 返回行数
+        after: 上一页最后一行的 (created_at, user_id)，为空时从最新开始
+    """
+    result = get_users_page(after=after, limit=limit)['rows']
+    logger.info(f"获取用户列表成功，共 {len(result)} 个用户")
+    return result
+
+def count_users(search=None, role_name=None, is_active=None) -> int:
+    """符合筛选条件的用户总数"""
+    if not has_permission('manage_users'):
+        return 0
+    where, params = _user_filters(search, role_name, is_active)
+    try:
+        row = execute_query(f"SELECT COUNT(*) AS count FROM ({USER_LIST_QUERY + where}) AS filtered_users",
+                            params=params, fetch_one=True)
+        return row['count'] if row else 0
+    except Exception as e:
+        logger.error(f"统计用户数失败: {e}")
+        return 0
+
+def get_user_stats():
+    """
+    用户总数、启用数及各角色人数（SQL聚合，不受分页影响）
+
+    Returns:
+        {'total': int, 'active': int, 'by_role': {角色名: 人数}}，没有任何用户的角色计0
+    """
+    stats = {'total': 0, 'active': 0, 'by_role': {}}
+    if not has_permission('manage_users'):
+        return stats
     query = """
-    SELECT 
-        u.user_id, 
-        u.username, 
-        u.full_name, 
-        u.email, 
-        u.is_active, 
-        r.role_name,
-        u.created_at
-    FROM users u
-    LEFT JOIN roles r ON u.role_id = r.role_id
-    ORDER BY u.created_at DESC
-    LIMIT %s OFFSET %s
+    SELECT r.role_name, COUNT(u.user_id) AS total, COUNT(u.user_id) FILTER (WHERE u.is_active) AS active
+    FROM roles r
+    LEFT JOIN users u ON u.role_id = r.role_id
+    GROUP BY r.role_name
+    UNION ALL
+    SELECT NULL, COUNT(*), COUNT(*) FILTER (WHERE is_active)
+    FROM users
+    WHERE role_id IS NULL
     """
     try:
-        result = execute_query(query, params=(limit, offset), fetch_all=True)
-        logger.info(f"获取用户列表成功，共 {len(result) if result else 0} 个用户")
-        return result or []
+        for row in execute_query(query, fetch_all=True) or []:
+            stats['total'] += row['total']
+            stats['active'] += row['active']
+            if row['role_name'] is not None:
+                stats['by_role'][row['role_name']] = row['total']
     except Exception as e:
-        logger.error(f"获取用户列表失败: {e}")
+        logger.error(f"统计用户失败: {e}")
+    return stats
+
+def get_user_by_id(user_id: int):
+    """按ID获取单个用户，不存在或无权限时返回None"""
+    if not has_permission('manage_users'):
+        return None
+    try:
+        return execute_query(USER_LIST_QUERY + " WHERE u.user_id = %s", params=(user_id,), fetch_one=True)
+    except Exception as e:
+        logger.error(f"获取用户 {user_id} 失败: {e}")
+        return None
+
+def username_exists(username: str) -> bool:
+    """
+    用户名是否已被占用（按users表唯一约束的口径精确匹配）
+
+    仅用于表单提示；查询失败时返回False，重复用户名仍由create_user的唯一约束拦下。
+    """
+    try:
+        row = execute_query("SELECT EXISTS (SELECT 1 FROM users WHERE username = %s) AS found",
+                            params=(username,), fetch_one=True)
+        return bool(row and row['found'])
+    except Exception as e:
+        logger.error(f"检查用户名 {username} 失败: {e}")
+        return False
+
+def get_user_options():
+    """
+    全部用户的 (user_id, 显示名) 列表，供下拉框使用
+
+    只取下拉框需要的三列；与get_all_users不同，这里确实需要完整名单。
+    """
+    if not has_permission('manage_users'):
+        return []
+    query = "SELECT user_id, username, full_name FROM users ORDER BY full_name, username"
+    try:
+        rows = execute_query(query, fetch_all=True) or []
+        return [(row['user_id'], f"{row['full_name']} ({row['username']})") for row in rows]
+    except Exception as e:
+        logger.error(f"获取用户选项失败: {e}")
         return []
 
 def create_user(username: str, password: str, full_name: str, 
                 role_name: str, email: str = None):
     """创建新用户"""
-    # 检查用户名存在
-    check_query = "SELECT user_id FROM users WHERE username = %s"
-    existing = execute_query(check_query, params=(username,), fetch_one=True)
-    
-    if existing:
-        return False, "用户名已存在"
-    
     # 获取role_id
-    role_query = "SELECT role_id FROM roles WHERE role_name = %s"
-    role_result = execute_query(role_query, params=(role_name,), fetch_one=True)
+    role_id = lookup_id('roles', role_name)
     
-    if not role_result:
+    if not role_id:
         return False, f"角色 '{role_name}' 不存在"
     
-    role_id = role_result['role_id']
-    
-    # 生成hash
-    password_hash = bcrypt.hashpw(
-        password.encode('utf-8'), 
-        bcrypt.gensalt()
-    ).decode('utf-8')
+    # 生成hash；线程池排满时提示稍后重试，不把异常抛到页面
+    try:
+        password_hash = hash_password(password)
+    except HashPoolBusy:
+        logger.warning(f"创建用户 {username} 时密码计算线程池繁忙")
+        return False, "系统繁忙，请稍后再试"
     
+    # 用户名唯一约束代替先查询再插入：一次往返，并发创建同名用户时也不会报错
     insert_query = """
     INSERT INTO users (username, password_hash, full_name, role_id, email, is_active, created_at, updated_at)
     VALUES (%s, %s, %s, %s, %s, true, NOW(), NOW())
+    ON CONFLICT (username) DO NOTHING
     """
     
     try:
@@ -266,7 +424,7 @@ def create_user(username: str, password: str, full_name: str,
             logger.info(f"用户创建成功: {username}")
             return True, "用户创建成功"
         else:
-            return False, "用户创建失败"
+            return False, "用户名已存在"
     except Exception as e:
         logger.error(f"创建用户失败: {e}")
         return False, f"创建失败: {str(e)}"
@@ -285,18 +443,30 @@ def update_user_status(user_id: int, is_active: bool):
         logger.error(f"更新用户状态失败: {e}")
         return False, f"更新失败: {str(e)}"
 
+def update_user_password(user_id: int, new_password: str):
+    """重置用户密码"""
+    valid, message = validate_password_strength(new_password)
+    if not valid:
+        return False, message
+    
+    query = "UPDATE users SET password_hash = %s, updated_at = NOW() WHERE user_id = %s"
+    try:
+        rowcount = execute_query(query, params=(hash_password(new_password), user_id), commit=True)
+        if rowcount > 0:
+            return True, "密码已更新"
+        else:
+            return False, "用户不存在"
+    except HashPoolBusy:
+        logger.warning(f"重置用户 {user_id} 密码时密码计算线程池繁忙")
+        return False, "系统繁忙，请稍后再试"
+    except Exception as e:
+        logger.error(f"更新用户密码失败: {e}")
+        return False, f"更新失败: {str(e)}"
+
 def get_user_activity_log(user_id=None, days=7):
     """获取用户活动日志"""
     try:
-        check_query = """
-        SELECT EXISTS (
-            SELECT 1 FROM information_schema.tables 
-            WHERE table_name = 'system_logs'
-        )
-        """
-        
-        table_exists = execute_query(check_query, fetch_one=True)
-        if not table_exists or not table_exists.get('exists'):
+        if not system_logs_exists():
             return []
         
         if user_id:
@@ -350,5 +520,27 @@ def validate_password_strength(password: str):
 
 def get_user_permissions():
     """获取当前用户的权限列表"""
-    user_role = st.session_state.get('user_role', '')
-    return ROLE_PERMISSIONS.get(user_role, [])
\ No newline at end of file
+    role_id = _current_role_id()
+    if role_id is None:
+        return []
+    return sorted(get_role_permissions(role_id))
+
+def set_role_permissions(role_id: int, permissions):
+    """替换角色的权限集合；提交后各进程的权限缓存随表变更失效"""
+    permissions = sorted(set(permissions))
+    
+    def work(uow):
+        uow.execute("DELETE FROM role_permissions WHERE role_id = %s", (role_id,))
+        if permissions:
+            uow.execute(
+                "INSERT INTO role_permissions (role_id, permission) SELECT %s, unnest(%s::varchar[])",
+                (role_id, permissions)
+            )
+    
+    try:
+        run_in_transaction(work)
+        logger.info(f"角色 {role_id} 权限已更新: {permissions}")
+        return True, "权限已更新"
+    except Exception as e:
+        logger.error(f"更新角色权限失败: {e}")
+        return False, f"更新失败: {str(e)}"
@@ -6,12 +6,32 @@ import psycopg2.pool
 import streamlit as st
 import logging
 import numpy as np
+import pandas as pd
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional, Union, Tuple
+from typing import List, Dict, Any, Optional, Union, Tuple, Iterator
 import json
 from datetime import datetime, date
 from decimal import Decimal
 import time  # 用于重试延迟
+import random
+import uuid  # 用于生成服务端游标名称
+import weakref
+import io
+import select
+import re
+import threading
+from collections import deque, OrderedDict
+
+from utils.query_metrics import record_query, record_cancel, timed_block
+from utils.table_cache import TableCache, extract_read_tables, extract_write_tables
+from utils.lookup_maps import LOOKUP_TABLES, LookupMap
+
+try:
+    # 后台线程（审计写入、密码线程池、分区维护等）和离线脚本没有脚本上下文，
+    # 调用处均传 suppress_warning=True，避免每次查询都打印 "missing ScriptRunContext"
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError:  # 旧版本Streamlit或非Streamlit环境
+    get_script_run_ctx = None
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -33,111 +53,639 @@ def get_db_config() -> Dict[str, str]:
         raise ValueError("Missing POSTGRES_PASSWORD in environment variables")
     return config
 
+# 流式查询每次从服务端拉取的行数
+STREAM_ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', '2000'))
+
+# 连接池配置（可通过环境变量调整）
+POOL_MIN_CONN = int(os.getenv('DB_POOL_MIN', '2'))
+POOL_MAX_CONN = int(os.getenv('DB_POOL_MAX', '20'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))              # 等待空闲连接的最长秒数
+POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))  # 连接最长存活秒数，超过则回收
+POOL_VALIDATE_IDLE = float(os.getenv('DB_POOL_VALIDATE_IDLE', '30'))  # 空闲超过该秒数的连接借出前先探活
+POOL_RETRY_INTERVAL = float(os.getenv('DB_POOL_RETRY_INTERVAL', '30'))  # 建池失败后多久内不再重试
+CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))              # 建立单个连接的超时秒数
+
+# 启动预热：background 后台建池，sync 同步建池，off 完全按需
+DB_WARMUP_MODE = os.getenv('DB_WARMUP', 'background')
+
+# 各类查询的语句超时秒数（0表示不限制）；interactive作为连接默认值，其余类别按事务SET LOCAL
+STATEMENT_TIMEOUTS = {
+    'interactive': float(os.getenv('DB_TIMEOUT_INTERACTIVE', '30')),
+    'report': float(os.getenv('DB_TIMEOUT_REPORT', '120')),
+    'batch': float(os.getenv('DB_TIMEOUT_BATCH', '900')),
+}
+
+# ========== 写入跟踪（按表失效缓存） ==========
+
+# 各连接上尚未结算的写入表：id(conn) -> set(table)
+_pending_writes = {}
+_pending_writes_lock = threading.Lock()
+
+def _track_writes(conn, tables):
+    """登记连接上写入的表，连接归还时统一失效相关缓存"""
+    if not tables:
+        return
+    with _pending_writes_lock:
+        _pending_writes.setdefault(id(conn), set()).update(tables)
+
+def _flush_writes(conn):
+    """失效该连接上写入过的表对应的缓存条目"""
+    with _pending_writes_lock:
+        tables = _pending_writes.pop(id(conn), None)
+    if tables:
+        invalidate_tables(tables)
+        # 本会话刚写过主库，随后的读取在复制追上前不走副本
+        _replicas.mark_write()
+
+def register_external_writes(tables):
+    """
+    登记不经过TrackingDictCursor的已提交写入（如psycopg 3连接上的流水线）
+
+    效果与连接归还时的_flush_writes相同：失效缓存并让本会话随后的读取走主库。
+    """
+    tables = set(tables)
+    if tables:
+        invalidate_tables(tables)
+        _replicas.mark_write()
+
+class TrackingDictCursor(psycopg2.extras.RealDictCursor):
+    """记录写入语句目标表的RealDictCursor"""
+
+    def execute(self, query, vars=None):
+        if isinstance(query, str):
+            _track_writes(self.connection, extract_write_tables(query))
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        if isinstance(query, str):
+            _track_writes(self.connection, extract_write_tables(query))
+        return super().executemany(query, vars_list)
+
+def get_connection_args(host: Optional[str] = None, port: Optional[str] = None) -> Dict[str, Any]:
+    """构建psycopg2连接参数（连接池与备用直连共用，host/port用于指向只读副本）"""
+    config = get_db_config()
+    conn_args = {
+        'host': host or config['host'],
+        'port': port or config['port'],
+        'database': config['database'],
+        'user': config['user'],
+        'password': config['password'],
+        'connect_timeout': CONNECT_TIMEOUT,
+        'options': f"-c statement_timeout={int(STATEMENT_TIMEOUTS['interactive'] * 1000)}",
+        'connection_factory': TypedConnection,
+        'cursor_factory': TrackingDictCursor
+    }
+    # 加SSL配置
+    if os.getenv('DB_SSL', 'false') == 'true':
+        conn_args['sslmode'] = 'require'
+    else:
+        conn_args['sslmode'] = 'prefer'
+    return conn_args
+
+class ManagedConnectionPool:
+    """
+    带健康检查和饱和度统计的线程安全连接池
+
+    在ThreadedConnectionPool之上增加：
+    - 连接耗尽时阻塞等待（带超时），而不是立即抛出PoolError
+    - 借出前校验连接，关闭/损坏/超龄的连接直接回收重建
+    - 实时统计：在用、空闲、等待耗时、每秒借出次数
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float = POOL_TIMEOUT,
+                 max_lifetime: float = POOL_MAX_LIFETIME,
+                 validate_idle: float = POOL_VALIDATE_IDLE, **conn_args):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.validate_idle = validate_idle
+        self._pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, **conn_args)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._created_at = {}   # id(conn) -> 创建时间
+        self._returned_at = {}  # id(conn) -> 最近归还时间
+        self._in_use = set()    # 已借出连接的id
+        self._checkout_times = deque(maxlen=10000)
+        self._waiting = 0
+        self._local = threading.local()
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'recycled': 0,
+            'total_wait_ms': 0.0,
+            'max_wait_ms': 0.0,
+        }
+
+    def getconn(self, timeout: Optional[float] = None):
+        """借出连接，无空闲连接时最多等待timeout秒"""
+        timeout = self.timeout if timeout is None else timeout
+        wait_start = time.perf_counter()
+
+        with self._lock:
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        if not acquired:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise psycopg2.pool.PoolError(f"等待数据库连接超时（{timeout}s），连接池已满: {self.maxconn}")
+
+        try:
+            conn = self._checkout_valid()
+        except Exception:
+            self._slots.release()
+            raise
+
+        wait_ms = (time.perf_counter() - wait_start) * 1000
+        with self._lock:
+            self._in_use.add(id(conn))
+            self._stats['checkouts'] += 1
+            self._stats['total_wait_ms'] += wait_ms
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+            self._checkout_times.append(time.time())
+        self._local.last_wait_ms = wait_ms
+        return conn
+
+    def last_wait_ms(self) -> float:
+        """当前线程最近一次借出连接的等待耗时（毫秒）"""
+        return getattr(self._local, 'last_wait_ms', 0.0)
+
+    def _checkout_valid(self):
+        """从底层连接池取出一个可用连接，丢弃失效连接"""
+        # 最多尝试maxconn+1次，避免所有空闲连接都已失效时死循环
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            key = id(conn)
+            now = time.time()
+            created_at = self._created_at.setdefault(key, now)
+
+            if conn.closed or now - created_at > self.max_lifetime or not self._is_alive(conn, now):
+                self._discard(conn)
+                continue
+            return conn
+        raise psycopg2.pool.PoolError("无法从连接池获取有效连接")
+
+    def _is_alive(self, conn, now: float) -> bool:
+        """空闲较久的连接执行SELECT 1探活"""
+        returned_at = self._returned_at.get(id(conn))
+        if returned_at is None or now - returned_at < self.validate_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"连接探活失败，将回收: {e}")
+            return False
+
+    def _discard(self, conn):
+        """关闭并移出失效连接"""
+        key = id(conn)
+        _prepared_statements.forget(conn)
+        self._created_at.pop(key, None)
+        self._returned_at.pop(key, None)
+        with self._lock:
+            self._stats['recycled'] += 1
+        try:
+            self._pool.putconn(conn, close=True)
+        except Exception as e:
+            logger.error(f"回收连接失败: {e}")
+
+    def owns(self, conn) -> bool:
+        """判断连接是否由本连接池借出"""
+        with self._lock:
+            return id(conn) in self._in_use
+
+    def putconn(self, conn):
+        """归还连接，损坏或处于未知事务状态的连接直接回收"""
+        key = id(conn)
+        with self._lock:
+            if key not in self._in_use:
+                raise psycopg2.pool.PoolError("归还的连接不属于该连接池")
+            self._in_use.discard(key)
+        try:
+            broken = conn.closed or (
+                conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN
+            )
+            if broken:
+                self._discard(conn)
+            else:
+                self._returned_at[key] = time.time()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        """关闭所有连接"""
+        self._pool.closeall()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池实时统计"""
+        now = time.time()
+        with self._lock:
+            recent = sum(1 for t in self._checkout_times if now - t <= 60)
+            checkouts = self._stats['checkouts']
+            return {
+                'min': self.minconn,
+                'max': self.maxconn,
+                'in_use': len(self._in_use),
+                'idle': len(self._pool._pool),
+                'waiting': self._waiting,
+                'checkouts': checkouts,
+                'checkouts_per_sec': round(recent / 60, 2),
+                'avg_wait_ms': round(self._stats['total_wait_ms'] / checkouts, 2) if checkouts else 0.0,
+                'max_wait_ms': round(self._stats['max_wait_ms'], 2),
+                'timeouts': self._stats['timeouts'],
+                'recycled': self._stats['recycled'],
+            }
+
 # 全局连接池
 _connection_pool = None
+# 连接池不可用时的备用直连次数
+_fallback_connects = 0
+_pool_init_lock = threading.Lock()
+_pool_retry_at = 0.0
 
 def init_connection_pool():
-    """初始化连接池，支持SSL和重试"""
-    global _connection_pool
+    """
+    初始化连接池（首次使用时调用）
+
+    失败后在POOL_RETRY_INTERVAL秒内直接抛出，不再重复尝试，
+    调用方走备用直连，避免每次请求都卡在建池上。
+    """
+    global _connection_pool, _pool_retry_at
     
-    try:
-        if _connection_pool is None:
-            config = get_db_config()
-            pool_args = {
-                'host': config['host'],
-                'port': config['port'],
-                'database': config['database'],
-                'user': config['user'],
-                'password': config['password'],
-                'cursor_factory': psycopg2.extras.RealDictCursor
-            }
-            # 加SSL配置
-            if os.getenv('DB_SSL', 'false') == 'true':
-                pool_args['sslmode'] = 'require'
-            else:
-                pool_args['sslmode'] = 'prefer'
-            
-            _connection_pool = psycopg2.pool.ThreadedConnectionPool(
-                2, 20,  # 调整min=2, max=20以适应负载
-                **pool_args
-            )
-            logger.info("数据库连接池初始化成功")
-    except Exception as e:
-        logger.error(f"数据库连接池初始化失败: {e}")
-        _connection_pool = None
-        # 重试机制：等待2s后重试一次
-        time.sleep(2)
+    if _connection_pool is not None:
+        return
+    
+    with _pool_init_lock:
+        if _connection_pool is not None:
+            return
+        if time.monotonic() < _pool_retry_at:
+            raise RuntimeError("连接池初始化失败，等待重试间隔")
+        
         try:
-            _connection_pool = psycopg2.pool.ThreadedConnectionPool(
-                2, 20, 
-                **pool_args
-            )
-            logger.info("连接池重试初始化成功")
-        except:
+            _connection_pool = ManagedConnectionPool(POOL_MIN_CONN, POOL_MAX_CONN, **get_connection_args())
+            logger.info(f"数据库连接池初始化成功 (min={POOL_MIN_CONN}, max={POOL_MAX_CONN})")
+        except Exception as e:
+            _pool_retry_at = time.monotonic() + POOL_RETRY_INTERVAL
+            logger.error(f"数据库连接池初始化失败，{POOL_RETRY_INTERVAL:.0f}s内不再重试: {e}")
             raise
+    
+    start_cache_listener()
 
-def get_connection():
-    """从连接池获取连接"""
-    global _connection_pool
+def get_connection(read_only: bool = False):
+    """
+    从连接池获取连接
+
+    Args:
+        read_only: 只读查询，配置了副本时可路由到延迟达标的只读副本
+    """
+    global _connection_pool, _fallback_connects
     
+    if read_only and _replicas.enabled:
+        routed = _replicas.acquire()
+        if routed is not None:
+            conn, node = routed
+            _checkout_local.pool = node.pool
+            return conn
+    
+    _checkout_local.pool = None
     if _connection_pool is None:
-        init_connection_pool()
+        try:
+            init_connection_pool()
+        except Exception as e:
+            logger.error(f"连接池不可用，改用直接连接: {e}")
     
     try:
         if _connection_pool:
             return _connection_pool.getconn()
         else:
             # 备用直接连接
-            config = get_db_config()
-            pool_args = {
-                'host': config['host'],
-                'port': config['port'],
-                'database': config['database'],
-                'user': config['user'],
-                'password': config['password'],
-                'cursor_factory': psycopg2.extras.RealDictCursor
-            }
-            if os.getenv('DB_SSL', 'false') == 'true':
-                pool_args['sslmode'] = 'require'
-            else:
-                pool_args['sslmode'] = 'prefer'
-            return psycopg2.connect(**pool_args)
+            _fallback_connects += 1
+            logger.warning(f"使用备用直接连接（累计 {_fallback_connects} 次）")
+            return psycopg2.connect(**get_connection_args())
     except Exception as e:
         logger.error(f"获取数据库连接失败: {e}")
         raise
 
+def _reset_session_state(conn):
+    """
+    把连接恢复为连接池约定的会话状态
+
+    调用方可能修改了autocommit、隔离级别或只读属性，不复位就会带给下一个借用者。
+    psycopg2>=2.7中这些属性只影响客户端发出的BEGIN，复位不产生网络往返。
+    """
+    if conn.closed:
+        return
+    try:
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+        if conn.isolation_level is not None or conn.readonly is not None or conn.deferrable is not None:
+            conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT')
+    except psycopg2.Error as e:
+        # 无法确认状态的连接不能再借出，关闭后由连接池回收
+        logger.warning(f"复位连接状态失败，将回收: {e}")
+        conn.close()
+
 def return_connection(conn):
     """归还连接到连接池"""
     global _connection_pool
     
     try:
-        if _connection_pool and conn:
+        if conn:
+            # 提交与否都失效：回滚时多失效一次无害，漏失效则会返回脏数据
+            _flush_writes(conn)
+            _reset_session_state(conn)
+        if _connection_pool and conn and _connection_pool.owns(conn):
             _connection_pool.putconn(conn)
-        elif conn:
+        elif conn and not _replicas.release(conn):
+            _prepared_statements.forget(conn)
             conn.close()
     except Exception as e:
         logger.error(f"归还连接失败: {e}")
 
+def get_pool_stats() -> Dict[str, Any]:
+    """获取连接池统计信息"""
+    stats = _connection_pool.get_stats() if _connection_pool else {}
+    stats['fallback_connects'] = _fallback_connects
+    return stats
+
+def _last_pool_wait_ms() -> float:
+    """当前线程最近一次借出连接的等待耗时"""
+    pool = getattr(_checkout_local, 'pool', None) or _connection_pool
+    return pool.last_wait_ms() if pool else 0.0
+
+# ========== 只读副本路由 ==========
+
+# 只读副本地址，逗号分隔的 host[:port]；为空时全部走主库
+REPLICA_HOSTS = [h.strip() for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h.strip()]
+REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', '5'))                 # 允许路由的最大复制延迟秒数
+REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', '2'))   # 延迟探测间隔秒数
+REPLICA_POOL_MAX_CONN = int(os.getenv('DB_REPLICA_POOL_MAX', str(POOL_MAX_CONN)))
+
+# 接收与回放位置一致时视为无延迟（主库空闲时回放时间戳会一直变旧）
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN NULL
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+END AS lag_seconds
+"""
+
+_READ_ONLY_PATTERN = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+_LOCKING_PATTERN = re.compile(r'\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE|KEY\s+SHARE)\b', re.IGNORECASE)
+_SIDE_EFFECT_PATTERN = re.compile(
+    r'\b(?:nextval|setval|pg_notify|pg_advisory_\w*|txid_current|pg_current_wal_lsn)\s*\(',
+    re.IGNORECASE
+)
+
+# 借出连接所属的连接池（主库或副本），用于统计等待耗时
+_checkout_local = threading.local()
+
+def is_read_only_query(query: str) -> bool:
+    """判断语句能否在只读副本上执行"""
+    return (
+        bool(_READ_ONLY_PATTERN.match(query))
+        and not extract_write_tables(query)
+        and not _LOCKING_PATTERN.search(query)
+        and not _SIDE_EFFECT_PATTERN.search(query)
+    )
+
+def _session_key() -> str:
+    """读己之写的粘滞单位：Streamlit会话，非Streamlit环境按线程"""
+    if get_script_run_ctx is not None:
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    return f"thread-{threading.get_ident()}"
+
+class ReplicaNode:
+    """单个只读副本及其最近一次延迟探测结果"""
+
+    def __init__(self, address: str):
+        host, _, port = address.partition(':')
+        self.host = host
+        self.port = port or '5432'
+        self.pool = None
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.checked_at = None
+        self.reads = 0
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+class ReplicaRouter:
+    """
+    只读查询的副本路由
+
+    - 后台线程定期探测各副本复制延迟，超过max_lag的副本暂停路由
+    - 会话写入主库后，在 max_lag + 探测间隔 内该会话的读取固定走主库，
+      保证读到自己刚提交的数据（副本延迟不超过max_lag，追上所需时间有上界）
+    - 无可用副本时退回主库
+    """
+
+    def __init__(self, addresses: List[str], max_lag: float = REPLICA_MAX_LAG,
+                 check_interval: float = REPLICA_CHECK_INTERVAL):
+        self.nodes = [ReplicaNode(address) for address in addresses]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+        self._session_writes = {}  # 会话标识 -> 最近写入时间
+        self._monitor = None
+        self._stats = {'replica_reads': 0, 'primary_fallbacks': 0, 'sticky_reads': 0, 'errors': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.nodes)
+
+    @property
+    def sticky_window(self) -> float:
+        return self.max_lag + self.check_interval
+
+    def mark_write(self, session_key: Optional[str] = None):
+        """记录会话写入主库的时间"""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._session_writes[session_key or _session_key()] = now
+            if len(self._session_writes) > 10000:
+                cutoff = now - self.sticky_window
+                self._session_writes = {k: t for k, t in self._session_writes.items() if t >= cutoff}
+
+    def _is_sticky(self, session_key: str) -> bool:
+        with self._lock:
+            written_at = self._session_writes.get(session_key)
+        return written_at is not None and time.monotonic() - written_at < self.sticky_window
+
+    def _ensure_monitor(self):
+        if self._monitor is None or not self._monitor.is_alive():
+            with self._lock:
+                if self._monitor is None or not self._monitor.is_alive():
+                    self._monitor = threading.Thread(
+                        target=self._monitor_loop, name='replica-lag-monitor', daemon=True
+                    )
+                    self._monitor.start()
+
+    def _monitor_loop(self):
+        while True:
+            for node in self.nodes:
+                self.probe(node)
+            time.sleep(self.check_interval)
+
+    def probe(self, node: ReplicaNode):
+        """探测副本复制延迟并更新可用状态"""
+        conn = None
+        try:
+            if node.pool is None:
+                node.pool = ManagedConnectionPool(
+                    1, REPLICA_POOL_MAX_CONN, **get_connection_args(node.host, node.port)
+                )
+            conn = node.pool.getconn()
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_QUERY)
+                lag = cursor.fetchone()['lag_seconds']
+            conn.rollback()
+            if lag is None:
+                node.healthy, node.lag = False, None
+                node.error = "节点不处于恢复模式（可能已被提升为主库）"
+            else:
+                node.lag = float(lag)
+                node.healthy = node.lag <= self.max_lag
+                node.error = None if node.healthy else f"复制延迟 {node.lag:.1f}s 超过上限"
+        except Exception as e:
+            if node.healthy:
+                logger.warning(f"只读副本 {node.address} 不可用: {e}")
+            node.healthy = False
+            node.error = str(e)
+        finally:
+            node.checked_at = time.time()
+            if conn:
+                try:
+                    node.pool.putconn(conn)
+                except Exception:
+                    pass
+
+    def acquire(self):
+        """借出一个副本连接，返回 (连接, 节点)；应走主库时返回None"""
+        self._ensure_monitor()
+        if self._is_sticky(_session_key()):
+            with self._lock:
+                self._stats['sticky_reads'] += 1
+            return None
+        
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.nodes)
+        for i in range(len(self.nodes)):
+            node = self.nodes[(start + i) % len(self.nodes)]
+            if not node.healthy or node.pool is None:
+                continue
+            try:
+                conn = node.pool.getconn()
+            except Exception as e:
+                node.healthy = False
+                node.error = str(e)
+                continue
+            with self._lock:
+                node.reads += 1
+                self._stats['replica_reads'] += 1
+            return conn, node
+        
+        with self._lock:
+            self._stats['primary_fallbacks'] += 1
+        return None
+
+    def _owner(self, conn) -> Optional[ReplicaNode]:
+        for node in self.nodes:
+            if node.pool is not None and node.pool.owns(conn):
+                return node
+        return None
+
+    def release(self, conn) -> bool:
+        """归还副本连接；连接不属于任何副本时返回False"""
+        node = self._owner(conn)
+        if node is None:
+            return False
+        node.pool.putconn(conn)
+        return True
+
+    def report_error(self, conn, error: Exception):
+        """副本上查询失败：连接类错误立即暂停该副本，等待下次探测恢复"""
+        node = self._owner(conn) if conn else None
+        if node is None:
+            return
+        with self._lock:
+            self._stats['errors'] += 1
+        if isinstance(error, psycopg2.OperationalError):
+            node.healthy = False
+            node.error = str(error)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """副本路由统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_lag'] = self.max_lag
+        stats['nodes'] = [
+            {
+                'address': node.address,
+                'healthy': node.healthy,
+                'lag_seconds': round(node.lag, 3) if node.lag is not None else None,
+                'reads': node.reads,
+                'checked_at': node.checked_at,
+                'error': node.error,
+            }
+            for node in self.nodes
+        ]
+        return stats
+
+_replicas = ReplicaRouter(REPLICA_HOSTS)
+
+def get_replica_stats() -> Dict[str, Any]:
+    """获取只读副本路由统计"""
+    return _replicas.get_stats()
+
 @contextmanager
 def get_db_connection():
     """数据库连接上下文管理器"""
     conn = None
-    try:
-        conn = get_connection()
-        yield conn
-    except Exception as e:
-        if conn:
-            conn.rollback()
-        logger.error(f"数据库操作异常: {e}")
-        raise
-    finally:
-        if conn:
-            return_connection(conn)
+    with timed_block('connection', _last_pool_wait_ms):
+        try:
+            conn = get_connection()
+            yield conn
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"数据库操作异常: {e}")
+            raise
+        finally:
+            if conn:
+                return_connection(conn)
+            # 连接可能用于写入，结束后使本次运行的查询缓存失效
+            invalidate_request_cache()
 
 # ========== 数据类型转换 ==========
 
 def convert_numpy_types(obj):
-    """转换numpy类型为Python原生类型"""
+    """
+    转换numpy类型为Python原生类型
+
+    查询参数与结果已由下方注册的适配器/解析器处理，无需再调用；
+    仅用于COPY编码和页面上从DataFrame取出的记录。
+    """
     if isinstance(obj, np.integer):
         return int(obj)
     elif isinstance(obj, np.floating):
@@ -155,15 +703,395 @@ def convert_numpy_types(obj):
     else:
         return obj
 
+# NUMERIC -> float 解析器：在libpq文本值上直接构造float，跳过Decimal中间对象
+NUMERIC_AS_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values,
+    'NUMERIC_AS_FLOAT',
+    lambda value, cursor: float(value) if value is not None else None
+)
+NUMERIC_ARRAY_AS_FLOAT = psycopg2.extensions.new_array_type(
+    (1231,), 'NUMERIC_ARRAY_AS_FLOAT', NUMERIC_AS_FLOAT
+)
+
+class TypedConnection(psycopg2.extensions.connection):
+    """创建时注册结果解析器的连接，连接池、副本和备用直连共用"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        psycopg2.extensions.register_type(NUMERIC_AS_FLOAT, self)
+        psycopg2.extensions.register_type(NUMERIC_ARRAY_AS_FLOAT, self)
+
+def _adapt_numpy_array(value):
+    return psycopg2.extensions.adapt(value.tolist())
+
+def _register_param_adapters():
+    """numpy标量/数组参数适配器（进程级，导入时注册一次）"""
+    register = psycopg2.extensions.register_adapter
+    register(np.integer, lambda value: psycopg2.extensions.AsIs(int(value)))
+    register(np.floating, lambda value: psycopg2.extensions.adapt(float(value)))
+    register(np.bool_, lambda value: psycopg2.extensions.adapt(bool(value)))
+    register(np.ndarray, _adapt_numpy_array)
+
+_register_param_adapters()
+
 def serialize_params(params):
-    """序列化查询参数"""
-    if params is None:
+    """规范化查询参数：列表转为元组，值的类型转换交给适配器"""
+    if isinstance(params, list):
+        return tuple(params)
+    return params
+
+# ========== 预编译语句缓存 ==========
+
+# 每个连接最多保留的服务端预编译语句数量
+PREPARED_CACHE_SIZE = int(os.getenv('DB_PREPARED_CACHE_SIZE', '64'))
+
+_PLACEHOLDER_PATTERN = re.compile(r'%%|%s')
+
+class PreparedStatementRegistry:
+    """
+    按连接维护的服务端PREPARE语句注册表
+
+    以查询文本为键，每个连接独立LRU淘汰（DEALLOCATE）。命中时直接
+    EXECUTE，跳过服务端的解析/重写；未命中时PREPARE与首次EXECUTE在
+    同一次往返中发送。仅支持%s位置参数，%s不能出现在字符串字面量中。
+    """
+
+    def __init__(self, capacity: int = PREPARED_CACHE_SIZE):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._statements = {}  # (id(conn), backend_pid) -> OrderedDict[query, name]
+        self._stale = set()  # 执行失败、服务端可能残留未登记语句的连接
+        self._query_stats = {}
+        self._counter = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _to_server_placeholders(query: str) -> str:
+        """将%s占位符改写为$1..$n，保留%%转义供客户端插值"""
+        index = 0
+
+        def replace(match):
+            nonlocal index
+            if match.group(0) == '%%':
+                return '%%'
+            index += 1
+            return f'${index}'
+
+        return _PLACEHOLDER_PATTERN.sub(replace, query)
+
+    def execute(self, cursor, query: str, params: Optional[Union[List, Tuple]] = None):
+        """通过预编译语句执行查询，结果留在cursor中"""
+        params = tuple(params or ())
+        conn = cursor.connection
+        conn_key = (id(conn), conn.info.backend_pid)
+        evicted = None
+
+        with self._lock:
+            reset = conn_key in self._stale
+            self._stale.discard(conn_key)
+            statements = self._statements.setdefault(conn_key, OrderedDict())
+            name = statements.get(query)
+            hit = name is not None
+            if hit:
+                statements.move_to_end(query)
+            else:
+                self._counter += 1
+                name = f"ps_{self._counter}"
+                if len(statements) >= self.capacity:
+                    _, evicted = statements.popitem(last=False)
+                    self.evictions += 1
+
+        args = f" ({', '.join(['%s'] * len(params))})" if params else ""
+        execute_sql = f"EXECUTE {name}{args}"
+        if not hit:
+            # DEALLOCATE / PREPARE / EXECUTE 合并为一次往返，结果集取最后一条语句
+            prepare_sql = f"PREPARE {name} AS {self._to_server_placeholders(query)}"
+            execute_sql = f"{prepare_sql}; {execute_sql}"
+            if reset:
+                execute_sql = f"DEALLOCATE ALL; {execute_sql}"
+            elif evicted:
+                execute_sql = f"DEALLOCATE {evicted}; {execute_sql}"
+            if not params:
+                # 无参数时psycopg2不做插值，需自行还原%%转义
+                execute_sql = execute_sql.replace('%%', '%')
+
+        _track_writes(conn, extract_write_tables(query))
+        start = time.perf_counter()
+        try:
+            cursor.execute(execute_sql, params or None)
+        except Exception:
+            # 状态不确定时放弃该连接上的注册记录，下次使用新名称重新PREPARE。
+            # 失败的事务中无法立即DEALLOCATE，服务端已PREPARE的语句留到该连接
+            # 下一次预编译执行时用DEALLOCATE ALL清掉（这些连接上只有本注册表PREPARE）
+            with self._lock:
+                self._statements.pop(conn_key, None)
+                self._stale.add(conn_key)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            if not hit:
+                statements[query] = name
+            stats = self._query_stats.setdefault(query, {
+                'hits': 0, 'misses': 0, 'hit_ms': 0.0, 'miss_ms': 0.0
+            })
+            if hit:
+                stats['hits'] += 1
+                stats['hit_ms'] += elapsed_ms
+            else:
+                stats['misses'] += 1
+                stats['miss_ms'] += elapsed_ms
+
+    def forget(self, conn):
+        """连接关闭或回收时清除其注册记录"""
+        with self._lock:
+            for key in [k for k in self._statements if k[0] == id(conn)]:
+                del self._statements[key]
+            self._stale = {key for key in self._stale if key[0] != id(conn)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率及按查询估算的节省耗时"""
+        with self._lock:
+            queries = []
+            total_hits = total_misses = 0
+            for query, stats in self._query_stats.items():
+                hits, misses = stats['hits'], stats['misses']
+                total_hits += hits
+                total_misses += misses
+                avg_hit = stats['hit_ms'] / hits if hits else 0.0
+                avg_miss = stats['miss_ms'] / misses if misses else 0.0
+                # 未命中时走完整解析/规划，与命中耗时之差即每次命中节省的时间
+                saved_per_hit = max(avg_miss - avg_hit, 0.0) if hits and misses else 0.0
+                queries.append({
+                    'query': ' '.join(query.split())[:120],
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 4),
+                    'avg_hit_ms': round(avg_hit, 3),
+                    'avg_miss_ms': round(avg_miss, 3),
+                    'saved_ms_per_hit': round(saved_per_hit, 3),
+                    'saved_ms_total': round(saved_per_hit * hits, 3),
+                })
+            total = total_hits + total_misses
+            return {
+                'hits': total_hits,
+                'misses': total_misses,
+                'hit_rate': round(total_hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'connections': len(self._statements),
+                'queries': sorted(queries, key=lambda q: q['saved_ms_total'], reverse=True),
+            }
+
+_prepared_statements = PreparedStatementRegistry()
+
+def execute_prepared(cursor, query: str, params: Optional[Union[List, Tuple]] = None):
+    """在给定游标上通过预编译语句执行（用于事务内的热点查询）"""
+    _prepared_statements.execute(cursor, query, serialize_params(params))
+
+def get_prepared_stats() -> Dict[str, Any]:
+    """获取预编译语句缓存统计"""
+    return _prepared_statements.get_stats()
+
+# ========== 单次运行内查询去重 ==========
+
+# 是否启用单次脚本运行内的只读查询去重
+REQUEST_CACHE_ENABLED = os.getenv('DB_REQUEST_CACHE', 'true') == 'true'
+
+_request_cache_local = threading.local()
+
+def _current_run_marker():
+    """
+    当前Streamlit脚本运行的标识对象
+
+    ScriptRunContext在每次rerun开始时会重建widget_ids_this_run集合，
+    以弱引用持有该集合即可判断是否仍处于同一次运行。
+    """
+    if get_script_run_ctx is None:
         return None
-    
-    if isinstance(params, (list, tuple)):
-        return tuple(convert_numpy_types(p) for p in params)
-    else:
-        return convert_numpy_types(params)
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    return getattr(ctx, 'widget_ids_this_run', None)
+
+def _get_request_cache() -> Optional[Dict]:
+    """获取当前运行的查询缓存，非Streamlit运行环境返回None"""
+    if not REQUEST_CACHE_ENABLED:
+        return None
+    marker = _current_run_marker()
+    if marker is None:
+        return None
+    owner = getattr(_request_cache_local, 'owner', None)
+    if owner is None or owner() is not marker:
+        _request_cache_local.owner = weakref.ref(marker)
+        _request_cache_local.entries = {}
+    return _request_cache_local.entries
+
+def _copy_result(result):
+    """复制查询结果，避免调用方修改影响缓存"""
+    if isinstance(result, list):
+        return [dict(row) for row in result]
+    if isinstance(result, dict):
+        return dict(result)
+    return result
+
+def invalidate_request_cache():
+    """写操作后清空本次运行的查询缓存"""
+    entries = getattr(_request_cache_local, 'entries', None)
+    if entries:
+        entries.clear()
+
+# ========== 语句超时与取消 ==========
+
+# 检查执行中查询所属会话是否已重跑/断开的间隔秒数
+CANCEL_CHECK_INTERVAL = float(os.getenv('DB_CANCEL_CHECK_INTERVAL', '1'))
+
+try:
+    from streamlit.runtime import Runtime
+except ImportError:
+    Runtime = None
+
+def _resolve_timeout_ms(timeout: Optional[float], category: str) -> int:
+    """单次调用的超时优先，否则取类别默认值"""
+    if timeout is None:
+        if category not in STATEMENT_TIMEOUTS:
+            raise ValueError(f"未知的查询类别: {category}")
+        timeout = STATEMENT_TIMEOUTS[category]
+    return int(timeout * 1000)
+
+def _set_statement_timeout(conn, timeout: Optional[float], category: str):
+    """与连接默认值不同时，为当前事务设置语句超时"""
+    timeout_ms = _resolve_timeout_ms(timeout, category)
+    if timeout_ms == int(STATEMENT_TIMEOUTS['interactive'] * 1000):
+        return
+    with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cursor:
+        cursor.execute("SET LOCAL statement_timeout = %s", (timeout_ms,))
+
+_rerun_probe_warned = False
+
+def _rerun_requested(ctx) -> bool:
+    """
+    脚本是否已被请求重跑/停止
+
+    ScriptRequests没有公开的状态查询接口，只能读取其私有的 _state。
+    Streamlit版本不再提供该属性时退化为只检测会话断开，并记录一次警告。
+    """
+    global _rerun_probe_warned
+    state = getattr(getattr(ctx, 'script_requests', None), '_state', None)
+    name = getattr(state, 'name', None)
+    if name is None:
+        if not _rerun_probe_warned:
+            _rerun_probe_warned = True
+            logger.warning("无法读取Streamlit脚本请求状态，仅在会话断开时取消查询")
+        return False
+    return name in ('RERUN', 'STOP')
+
+def _abandon_reason(ctx) -> Optional[str]:
+    """查询发起的脚本运行是否已被放弃：会话断开或已请求重跑/停止"""
+    try:
+        if Runtime is not None and Runtime.exists():
+            if not Runtime.instance().is_active_session(ctx.session_id):
+                return 'disconnect'
+        if _rerun_requested(ctx):
+            return 'rerun'
+    except Exception:
+        pass
+    return None
+
+class QueryCanceller:
+    """
+    跟踪Streamlit会话中执行中的查询
+
+    查询阻塞在libpq里时脚本线程无法响应rerun，用户已离开页面的报表会一直占着
+    连接池。后台线程定期检查发起查询的会话，已重跑或断开的在服务端取消。
+    """
+
+    def __init__(self, check_interval: float = CANCEL_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._inflight = {}  # token -> {'conn', 'ctx', 'reason'}
+        self._counter = 0
+        self._watcher = None
+
+    def register(self, conn) -> Optional[int]:
+        """登记执行中的查询，非Streamlit运行环境返回None"""
+        if get_script_run_ctx is None:
+            return None
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None:
+            return None
+        with self._lock:
+            self._counter += 1
+            token = self._counter
+            self._inflight[token] = {'conn': conn, 'ctx': ctx, 'reason': None}
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(
+                    target=self._watch, name='query-canceller', daemon=True
+                )
+                self._watcher.start()
+        return token
+
+    def unregister(self, token: Optional[int]) -> Optional[str]:
+        """注销查询，返回其被取消的原因（未取消为None）"""
+        if token is None:
+            return None
+        with self._lock:
+            entry = self._inflight.pop(token, None)
+        return entry['reason'] if entry else None
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            with self._lock:
+                entries = [(token, entry) for token, entry in self._inflight.items() if entry['reason'] is None]
+            for token, entry in entries:
+                reason = _abandon_reason(entry['ctx'])
+                if reason is None:
+                    continue
+                # 检查会话期间查询可能已结束、连接已归还并被其他请求借出；
+                # 持锁确认仍在登记中再取消，unregister在取消完成前不会返回
+                with self._lock:
+                    if self._inflight.get(token) is not entry:
+                        continue
+                    entry['reason'] = reason
+                    try:
+                        entry['conn'].cancel()
+                        logger.info(f"会话{'断开' if reason == 'disconnect' else '已重跑'}，已取消执行中的查询")
+                    except Exception as e:
+                        logger.error(f"取消查询失败: {e}")
+
+    def get_inflight_count(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+_query_canceller = QueryCanceller()
+
+@contextmanager
+def statement_guard(conn, timeout: Optional[float] = None, category: str = 'interactive'):
+    """
+    为连接上的后续语句设置超时，并在会话放弃时允许服务端取消
+
+    Args:
+        conn: 已借出的连接（非autocommit，SET LOCAL作用于当前事务）
+        timeout: 本次调用的超时秒数，优先于类别默认值
+        category: interactive / report / batch
+    """
+    _set_statement_timeout(conn, timeout, category)
+    token = _query_canceller.register(conn)
+    try:
+        yield
+    except psycopg2.extensions.QueryCanceledError as e:
+        reason = _query_canceller.unregister(token)
+        token = None
+        if reason is None:
+            reason = 'timeout' if 'statement timeout' in str(e) else 'other'
+        record_cancel(reason, category)
+        raise
+    finally:
+        _query_canceller.unregister(token)
+
+def get_inflight_query_count() -> int:
+    """当前可被取消跟踪的执行中查询数"""
+    return _query_canceller.get_inflight_count()
 
 # ========== 核心数据库操作函数 ==========
 
@@ -172,7 +1100,11 @@ def execute_query(
     params: Optional[Union[List, Tuple, Dict]] = None,
     fetch_one: bool = False,
     fetch_all: bool = False,
-    commit: bool = False
+    commit: bool = False,
+    prepare: bool = False,
+    timeout: Optional[float] = None,
+    category: str = 'interactive',
+    use_replica: bool = True
 ) -> Optional[Union[List[Dict], Dict, int]]:
     """
     执行数据库查询 - 修复版
@@ -183,26 +1115,48 @@ def execute_query(
         fetch_one: 是否返回单条记录
         fetch_all: 是否返回所有记录
         commit: 是否提交事务
+        prepare: 是否走服务端预编译语句缓存（仅限%s位置参数的热点查询）
+        timeout: 语句超时秒数，优先于category的默认值
+        category: 查询类别 interactive / report / batch，决定默认语句超时
+        use_replica: 为False时只读查询也走主库（结果要长期缓存时使用）
     
     Returns:
         查询结果、影响行数或None
     """
+    # 单次运行内去重：相同的只读查询在一次脚本执行中只访问一次数据库
+    request_cache = None
+    cache_key = None
+    if (fetch_one or fetch_all) and not commit:
+        request_cache = _get_request_cache()
+        if request_cache is not None:
+            cache_key = (query, repr(params), fetch_one)
+            if cache_key in request_cache:
+                return _copy_result(request_cache[cache_key])
+    
     conn = None
     cursor = None
+    start = time.perf_counter()
+    pool_wait_ms = 0.0
+    rows = None
     
     try:
         # 序列化参数
         clean_params = serialize_params(params)
         
-        # 获取连接
-        conn = get_connection()
+        # 获取连接：只读查询可路由到副本
+        read_only = use_replica and (fetch_one or fetch_all) and not commit and is_read_only_query(query)
+        conn = get_connection(read_only=read_only)
+        pool_wait_ms = _last_pool_wait_ms()
         cursor = conn.cursor()
         
-        # 执行查询（加超时30s）
-        if clean_params:
-            cursor.execute(query, clean_params)
-        else:
-            cursor.execute(query)
+        # 执行查询（语句超时按类别/单次调用设置，会话放弃时服务端取消）
+        with statement_guard(conn, timeout, category):
+            if prepare and not isinstance(clean_params, dict):
+                _prepared_statements.execute(cursor, query, clean_params)
+            elif clean_params:
+                cursor.execute(query, clean_params)
+            else:
+                cursor.execute(query)
         
         # 处理结果
         result = None
@@ -210,21 +1164,24 @@ def execute_query(
         if fetch_one:
             row = cursor.fetchone()
             result = dict(row) if row else None
+            rows = 1 if row else 0
         elif fetch_all:
-            rows = cursor.fetchall()
-            result = [dict(row) for row in rows] if rows else []
+            fetched = cursor.fetchall()
+            result = [dict(row) for row in fetched] if fetched else []
+            rows = len(result)
         else:
             # 对于DML，返回影响行数
             result = cursor.rowcount
+            rows = cursor.rowcount
         
         # 提交事务
         if commit:
             conn.commit()
+            invalidate_request_cache()
             logger.debug(f"事务已提交: {query[:50]}... 影响行数: {cursor.rowcount}")
         
-        # 转换数据类型
-        if result:
-            result = convert_numpy_types(result)
+        if cache_key is not None:
+            request_cache[cache_key] = _copy_result(result)
         
         return result
         
@@ -232,6 +1189,7 @@ def execute_query(
         logger.error(f"数据库错误: {e}")
         logger.error(f"查询语句: {query}")
         logger.error(f"参数: {params}")  # 注意：生产中mask敏感params
+        _replicas.report_error(conn, e)
         if conn:
             conn.rollback()
         raise
@@ -248,6 +1206,143 @@ def execute_query(
             cursor.close()
         if conn:
             return_connection(conn)
+        record_query(query, (time.perf_counter() - start) * 1000, rows=rows, pool_wait_ms=pool_wait_ms)
+
+def stream_query(
+    query: str,
+    params: Optional[Union[List, Tuple, Dict]] = None,
+    itersize: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    timeout: Optional[float] = None,
+    category: str = 'report'
+) -> Iterator[Union[Dict, List[Dict]]]:
+    """
+    流式执行查询 - 基于服务端命名游标，按需逐批拉取结果
+
+    Args:
+        query: SQL查询语句（仅限SELECT）
+        params: 查询参数
+        itersize: 每次网络往返从服务端拉取的行数
+        batch_size: 为空时逐行返回；否则按批返回行列表
+        timeout: 单条语句（含每次FETCH）的超时秒数
+        category: 查询类别，默认report
+
+    Yields:
+        单行字典，或指定batch_size时的行字典列表
+    """
+    conn = None
+    cursor = None
+
+    try:
+        clean_params = serialize_params(params)
+
+        conn = get_connection(read_only=is_read_only_query(query))
+        with statement_guard(conn, timeout, category):
+            # 命名游标在服务端保存结果集，客户端内存只保留当前批次
+            cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+            cursor.itersize = itersize or STREAM_ITERSIZE
+
+            if clean_params:
+                cursor.execute(query, clean_params)
+            else:
+                cursor.execute(query)
+
+            if batch_size:
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield [dict(row) for row in rows]
+            else:
+                for row in cursor:
+                    yield dict(row)
+
+    except psycopg2.Error as e:
+        logger.error(f"流式查询数据库错误: {e}")
+        logger.error(f"查询语句: {query}")
+        raise
+
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except Exception as e:
+                logger.error(f"关闭流式游标失败: {e}")
+        if conn:
+            # 命名游标依赖事务，结束时回滚以释放服务端资源
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.error(f"结束流式查询事务失败: {e}")
+            return_connection(conn)
+
+def query_frame(
+    query: str,
+    params: Optional[Union[List, Tuple, Dict]] = None,
+    coerce_float: bool = True,
+    timeout: Optional[float] = None,
+    category: str = 'report'
+) -> pd.DataFrame:
+    """
+    执行查询并直接返回DataFrame - 元组游标 + 列式构建
+
+    跳过逐行dict分配：使用元组游标，结果按列构建为带类型的DataFrame。
+
+    Args:
+        query: SQL查询语句
+        params: 查询参数
+        coerce_float: 是否将NUMERIC列解析为float（连接默认如此；False时保留Decimal）
+        timeout: 语句超时秒数，优先于category的默认值
+        category: 查询类别，默认report
+
+    Returns:
+        查询结果DataFrame，无数据时返回带列名的空DataFrame
+    """
+    conn = None
+    cursor = None
+    start = time.perf_counter()
+    pool_wait_ms = 0.0
+    rows = []
+
+    try:
+        clean_params = serialize_params(params)
+
+        conn = get_connection(read_only=is_read_only_query(query))
+        pool_wait_ms = _last_pool_wait_ms()
+        # 使用普通元组游标，避免RealDictCursor逐行构建字典
+        cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+        if not coerce_float:
+            psycopg2.extensions.register_type(psycopg2.extensions.DECIMAL, cursor)
+
+        with statement_guard(conn, timeout, category):
+            if clean_params:
+                cursor.execute(query, clean_params)
+            else:
+                cursor.execute(query)
+
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+        rows = cursor.fetchall() if cursor.description else []
+
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        return pd.DataFrame.from_records(rows, columns=columns, coerce_float=coerce_float)
+
+    except psycopg2.Error as e:
+        logger.error(f"数据库错误: {e}")
+        logger.error(f"查询语句: {query}")
+        raise
+
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            # 只读查询同样需要结束事务，避免连接以idle in transaction状态归还
+            try:
+                conn.rollback()
+            except Exception as e:
+                logger.error(f"结束查询事务失败: {e}")
+            return_connection(conn)
+        record_query(query, (time.perf_counter() - start) * 1000, rows=len(rows), pool_wait_ms=pool_wait_ms)
 
 def test_connection() -> bool:
     """测试数据库连接"""
@@ -287,48 +1382,130 @@ def check_table_exists(table_name: str) -> bool:
         logger.error(f"检查表 {table_name} 是否存在失败: {e}")
         return False
 
-# ========== 专用查询函数 ==========
+# ========== 键集分页 ==========
+
+# 列表页默认每页行数
+PAGE_SIZE = int(os.getenv('DB_PAGE_SIZE', '50'))
+
+def fetch_keyset_page(
+    query: str,
+    sort_key: Tuple[str, str],
+    params: Optional[Union[List, Tuple]] = None,
+    after: Optional[Tuple] = None,
+    limit: int = PAGE_SIZE,
+    descending: bool = True
+) -> Dict[str, Any]:
+    """
+    键集分页 - 按 (排序列, 主键) 定位下一页，第500页与第1页代价相同
+
+    查询作为子查询包裹，PostgreSQL会将其展开，定位条件和排序可直接
+    使用 (排序列, 主键) 复合索引（见迁移 c3d1e9b7a2f4）。
+
+    Args:
+        query: 不含ORDER BY/LIMIT的查询，可带WHERE条件和%s参数
+        sort_key: (排序列, 主键列)，均为query输出的列名，排序列须非空
+        params: query的参数
+        after: 上一页返回的next_cursor，为空时取第一页
+        limit: 每页行数
+        descending: 是否倒序（最新的在前）
+
+    Returns:
+        {'rows': 本页记录, 'next_cursor': 下一页游标，没有更多时为None}
+    """
+    sort_column, id_column = sort_key
+    direction, comparator = ('DESC', '<') if descending else ('ASC', '>')
+    
+    page_query = f"SELECT * FROM ({query}) AS keyset_page"
+    page_params = list(params or [])
+    if after is not None:
+        page_query += f" WHERE ({sort_column}, {id_column}) {comparator} (%s, %s)"
+        page_params.extend(after)
+    page_query += f" ORDER BY {sort_column} {direction}, {id_column} {direction} LIMIT %s"
+    # 多取一行判断是否还有下一页
+    page_params.append(limit + 1)
+    
+    rows = execute_query(page_query, params=tuple(page_params), fetch_all=True) or []
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1][sort_column], rows[-1][id_column])
+    return {'rows': rows, 'next_cursor': next_cursor}
+
+# ========== 专用查询函数 ==========
+
+MOLD_LIST_QUERY = """
+SELECT 
+    m.mold_id,
+    m.mold_code,
+    m.mold_name,
+    m.mold_drawing_number,
+    mft.type_name as functional_type,
+    m.supplier,
+    m.manufacturing_date,
+    m.theoretical_lifespan_strokes,
+    m.accumulated_strokes,
+    m.maintenance_cycle_strokes,
+    ms.status_name as current_status,
+    sl.location_name as current_location,
+    u.full_name as responsible_person,
+    m.remarks,
+    m.created_at,
+    m.updated_at
+FROM molds m
+LEFT JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
+LEFT JOIN mold_statuses ms ON m.current_status_id = ms.status_id
+LEFT JOIN storage_locations sl ON m.current_location_id = sl.location_id
+LEFT JOIN users u ON m.responsible_person_id = u.user_id
+"""
+
+def get_molds_page(after: Optional[Tuple] = None, limit: int = PAGE_SIZE) -> Dict[str, Any]:
+    """按创建时间倒序分页获取模具，返回 {'rows', 'next_cursor'}"""
+    try:
+        return fetch_keyset_page(MOLD_LIST_QUERY, ('created_at', 'mold_id'), after=after, limit=limit)
+    except Exception as e:
+        logger.error(f"获取模具列表失败: {e}")
+        return {'rows': [], 'next_cursor': None}
+
+def get_all_molds(*, limit: int = 100, after: Optional[Tuple] = None) -> List[Dict]:
+    """
+    获取模具信息，支持分页
+
+    参数仅限关键字传入：旧签名为 (offset, limit)，按位置调用会被误解。
+
+    Args:
+        limit: 返回行数
+        after: 上一页最后一行的 (created_at, mold_id)，为空时从最新开始
+    """
+    return get_molds_page(after=after, limit=limit)['rows']
 
-def get_all_molds(offset: int = 0, limit: int = 100) -> List[Dict]:
-    """获取所有模具信息，支持分页"""
+def get_mold_by_id(mold_id: int) -> Optional[Dict]:
+    """根据ID获取模具信息"""
     try:
+        # 预编译语句的结果列在PREPARE时固定，m.* 在molds表结构变更后会报
+        # "cached plan must not change result type"，因此逐列列出。
+        # 只取 sql.backup/init.sql 与 sql.backup/sql/01-tables.sql 两版表结构共有的列
         query = """
         SELECT 
             m.mold_id,
             m.mold_code,
             m.mold_name,
             m.mold_drawing_number,
-            mft.type_name as functional_type,
-            m.supplier,
+            m.mold_functional_type_id,
             m.manufacturing_date,
+            m.acceptance_date,
             m.theoretical_lifespan_strokes,
             m.accumulated_strokes,
             m.maintenance_cycle_strokes,
-            ms.status_name as current_status,
-            sl.location_name as current_location,
-            u.full_name as responsible_person,
+            m.current_status_id,
+            m.current_location_id,
+            m.responsible_person_id,
+            m.design_drawing_link,
             m.remarks,
+            m.project_number,
+            m.associated_equipment_number,
+            m.entry_date,
             m.created_at,
-            m.updated_at
-        FROM molds m
-        LEFT JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
-        LEFT JOIN mold_statuses ms ON m.current_status_id = ms.status_id
-        LEFT JOIN storage_locations sl ON m.current_location_id = sl.location_id
-        LEFT JOIN users u ON m.responsible_person_id = u.user_id
-        ORDER BY m.created_at DESC
-        LIMIT %s OFFSET %s
-        """
-        return execute_query(query, params=(limit, offset), fetch_all=True) or []
-    except Exception as e:
-        logger.error(f"获取模具列表失败: {e}")
-        return []
-
-def get_mold_by_id(mold_id: int) -> Optional[Dict]:
-    """根据ID获取模具信息"""
-    try:
-        query = """
-        SELECT 
-            m.*,
+            m.updated_at,
             mft.type_name as functional_type,
             ms.status_name as current_status,
             sl.location_name as current_location,
@@ -340,7 +1517,7 @@ def get_mold_by_id(mold_id: int) -> Optional[Dict]:
         LEFT JOIN users u ON m.responsible_person_id = u.user_id
         WHERE m.mold_id = %s
         """
-        return execute_query(query, params=(mold_id,), fetch_one=True)
+        return execute_query(query, params=(mold_id,), fetch_one=True, prepare=True)
     except Exception as e:
         logger.error(f"获取模具 {mold_id} 信息失败: {e}")
         return None
@@ -349,7 +1526,7 @@ def get_loan_statuses() -> List[Dict]:
     """获取借用状态列表"""
     try:
         query = "SELECT status_id, status_name, description FROM loan_statuses ORDER BY status_id"
-        return execute_query(query, fetch_all=True) or []
+        return cached_query(query) or []
     except Exception as e:
         logger.error(f"获取借用状态失败: {e}")
         return []
@@ -358,7 +1535,7 @@ def get_mold_statuses() -> List[Dict]:
     """获取模具状态列表"""
     try:
         query = "SELECT status_id, status_name, description FROM mold_statuses ORDER BY status_id"
-        return execute_query(query, fetch_all=True) or []
+        return cached_query(query) or []
     except Exception as e:
         logger.error(f"获取模具状态失败: {e}")
         return []
@@ -367,7 +1544,7 @@ def get_storage_locations() -> List[Dict]:
     """获取存储位置列表"""
     try:
         query = "SELECT location_id, location_name, description FROM storage_locations ORDER BY location_name"
-        return execute_query(query, fetch_all=True) or []
+        return cached_query(query) or []
     except Exception as e:
         logger.error(f"获取存储位置失败: {e}")
         return []
@@ -376,51 +1553,208 @@ def get_functional_types() -> List[Dict]:
     """获取模具功能类型列表"""
     try:
         query = "SELECT type_id, type_name, description FROM mold_functional_types ORDER BY type_name"
-        return execute_query(query, fetch_all=True) or []
+        return cached_query(query) or []
     except Exception as e:
         logger.error(f"获取功能类型失败: {e}")
         return []
 
 # ========== 数据验证函数 ==========
 
-def validate_foreign_key(table: str, column: str, value: Any) -> bool:
-    """验证外键是否存在"""
+# 单条验证查询携带的最大值数量，超出时分块
+VALIDATION_CHUNK_SIZE = int(os.getenv('DB_VALIDATION_CHUNK_SIZE', '10000'))
+
+# 模具导入时需校验的外键列：列名 -> (引用表, 引用列)
+MOLD_FOREIGN_KEYS = {
+    'mold_functional_type_id': ('mold_functional_types', 'type_id'),
+    'current_status_id': ('mold_statuses', 'status_id'),
+    'current_location_id': ('storage_locations', 'location_id'),
+    'responsible_person_id': ('users', 'user_id'),
+}
+
+def _distinct_values(values) -> List[Any]:
+    """去重并忽略NULL，保持首次出现顺序"""
+    return list(dict.fromkeys(v for v in values if v is not None))
+
+def _chunks(values: List[Any], size: int = VALIDATION_CHUNK_SIZE) -> Iterator[List[Any]]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _as_int_key(value) -> Optional[int]:
+    """将导入数据中的ID（字符串、Excel读出的浮点数等）规范为int，无法表示为整数时返回None"""
+    if isinstance(value, (bool, np.bool_)):
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
     try:
-        if value is None:
-            return True  # NULL值是允许的
-        
-        query = f"SELECT EXISTS(SELECT 1 FROM {table} WHERE {column} = %s)"
-        result = execute_query(query, params=(value,), fetch_one=True)
-        return result.get('exists', False) if result else False
+        if isinstance(value, (float, np.floating, Decimal)):
+            # NaN/inf 由int()抛出异常
+            return int(value) if value == int(value) else None
+        if isinstance(value, str):
+            return int(value.strip())
+    except (ValueError, OverflowError, ArithmeticError):
+        return None
+    return None
+
+INTEGER_TYPES = frozenset({'smallint', 'integer', 'bigint'})
+
+_column_types = {}  # (表, 列) -> 类型名，表结构在进程生命周期内视为不变
+
+def _column_type(table: str, column: str) -> Optional[str]:
+    """列的类型名（format_type，如 integer / character varying），表或列不存在时返回None"""
+    key = (table, column)
+    if key not in _column_types:
+        row = execute_query(
+            "SELECT format_type(a.atttypid, NULL) AS type_name FROM pg_attribute a "
+            "WHERE a.attrelid = to_regclass(%s) AND a.attname = %s AND NOT a.attisdropped",
+            params=(table, column), fetch_one=True
+        )
+        _column_types[key] = row['type_name'] if row else None
+    return _column_types[key]
+
+def find_missing_foreign_keys(table: str, column: str, values) -> set:
+    """
+    批量验证外键：一次查询解析一整列取值
+
+    被引用列为整数类型时，取值先规范为int再以bigint[]传入，导入数据中的
+    字符串ID（'3'）不会因text[]与integer比较而报错；其他类型的列按原值
+    以 = ANY(%s) 比较。
+
+    Args:
+        table: 被引用的表
+        column: 被引用的列
+        values: 待验证的值（可迭代，NULL视为合法）
+
+    Returns:
+        在被引用表中不存在的值（原始取值）；查询失败时保守地返回全部待验证值
+    """
+    distinct = _distinct_values(values)
+    if not distinct:
+        return set()
+    
+    try:
+        if _column_type(table, column) in INTEGER_TYPES:
+            keys = {v: _as_int_key(v) for v in distinct}
+            query = f"SELECT {column} AS value FROM {table} WHERE {column} = ANY(%s::bigint[])"
+        else:
+            keys = {v: v for v in distinct}
+            query = f"SELECT {column} AS value FROM {table} WHERE {column} = ANY(%s)"
+        found = set()
+        for chunk in _chunks(list({k for k in keys.values() if k is not None})):
+            rows = execute_query(query, params=(chunk,), fetch_all=True) or []
+            found.update(row['value'] for row in rows)
+        return {v for v, key in keys.items() if key not in found}
     except Exception as e:
-        logger.error(f"验证外键失败: {table}.{column} = {value}, 错误: {e}")
-        return False
+        logger.error(f"批量验证外键失败: {table}.{column} ({len(distinct)} 个值), 错误: {e}")
+        return set(distinct)
 
-def validate_unique_constraint(table: str, column: str, value: Any, exclude_id: Optional[int] = None) -> bool:
-    """验证唯一约束"""
+def find_unique_conflicts(table: str, column: str, values, exclude_ids=None,
+                          primary_key: Optional[str] = None) -> set:
+    """
+    批量验证唯一约束
+
+    Args:
+        table: 目标表
+        column: 唯一列
+        values: 待写入的值
+        exclude_ids: 更新场景下排除的主键（这些行自身的值不算冲突）
+        primary_key: 主键列名，默认按 {table[:-1]}_id 推断
+
+    Returns:
+        与已有数据冲突或在本批内重复的值；查询失败时保守地返回全部待验证值
+    """
+    values = [v for v in values if v is not None]
+    if not values:
+        return set()
+    
+    seen, conflicts = set(), set()
+    for value in values:
+        if value in seen:
+            conflicts.add(value)
+        seen.add(value)
+    distinct = list(seen)
+    
     try:
-        query = f"SELECT EXISTS(SELECT 1 FROM {table} WHERE {column} = %s"
-        params = [value]
-        
-        if exclude_id:
+        query = f"SELECT {column} AS value FROM {table} WHERE {column} = ANY(%s)"
+        exclude = [i for i in (exclude_ids or []) if i is not None]
+        if exclude:
             # 假设主键为 {table[:-1]}_id
-            primary_key = f"{table[:-1]}_id"  
-            query += f" AND {primary_key} != %s"
-            params.append(exclude_id)
-        
-        query += ")"
-        
-        result = execute_query(query, params=tuple(params), fetch_one=True)
-        exists = result.get('exists', False) if result else False
-        return not exists  # 不存在才表示唯一约束满足
+            query += f" AND {primary_key or f'{table[:-1]}_id'} <> ALL(%s)"
+        for chunk in _chunks(distinct):
+            params = (chunk, exclude) if exclude else (chunk,)
+            rows = execute_query(query, params=params, fetch_all=True) or []
+            conflicts.update(row['value'] for row in rows)
+        return conflicts
     except Exception as e:
-        logger.error(f"验证唯一约束失败: {table}.{column} = {value}, 错误: {e}")
-        return False
+        logger.error(f"批量验证唯一约束失败: {table}.{column} ({len(distinct)} 个值), 错误: {e}")
+        return set(distinct)
+
+def validate_mold_batch(molds: List[Dict]) -> Dict[str, set]:
+    """
+    校验一批待导入模具的外键与编号唯一性
+
+    每个被引用表一次查询（加编号唯一性一次），与行数无关。
+
+    Returns:
+        列名 -> 非法取值集合，只包含存在问题的列
+    """
+    errors = {}
+    for column, (table, ref_column) in MOLD_FOREIGN_KEYS.items():
+        missing = find_missing_foreign_keys(table, ref_column, (m.get(column) for m in molds))
+        if missing:
+            errors[column] = missing
+    
+    duplicates = find_unique_conflicts('molds', 'mold_code', (m.get('mold_code') for m in molds))
+    if duplicates:
+        errors['mold_code'] = duplicates
+    return errors
+
+def validate_foreign_key(table: str, column: str, value: Any) -> bool:
+    """验证外键是否存在"""
+    return not find_missing_foreign_keys(table, column, [value])
+
+def validate_unique_constraint(table: str, column: str, value: Any, exclude_id: Optional[int] = None) -> bool:
+    """验证唯一约束"""
+    return not find_unique_conflicts(table, column, [value], exclude_ids=[exclude_id] if exclude_id else None)
 
 # ========== 批量操作函数 ==========
 
+def _copy_text_value(value) -> str:
+    """将Python值编码为COPY TEXT格式的字段"""
+    if value is None:
+        return '\\N'
+    # Decimal原样输出文本，convert_numpy_types会转成float丢失精度
+    if isinstance(value, Decimal):
+        return str(value)
+    value = convert_numpy_types(value)
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (datetime, date)):
+        text = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        text = json.dumps(value, ensure_ascii=False)
+    else:
+        text = str(value)
+    return (text.replace('\\', '\\\\')
+                .replace('\t', '\\t')
+                .replace('\n', '\\n')
+                .replace('\r', '\\r'))
+
+def _copy_rows(cursor, table: str, columns: List[str], data: List[List]):
+    """通过COPY FROM STDIN写入数据"""
+    buffer = io.StringIO()
+    for row in data:
+        buffer.write('\t'.join(_copy_text_value(v) for v in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    _track_writes(cursor.connection, {table})
+
+def _insert_row_params(row) -> tuple:
+    """execute_values回退路径的行参数：dict没有默认适配器，按JSON传入（与COPY编码一致）"""
+    return tuple(psycopg2.extras.Json(value) if isinstance(value, dict) else value for value in row)
+
 def bulk_insert(table: str, columns: List[str], data: List[List]) -> bool:
-    """批量插入数据"""
+    """批量插入数据 - 优先COPY，失败时回退execute_values"""
     if not data:
         return True
     
@@ -430,16 +1764,31 @@ def bulk_insert(table: str, columns: List[str], data: List[List]) -> bool:
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        start = time.perf_counter()
+        method = "COPY"
         
-        # 构建SQL语句
-        placeholders = ", ".join(["%s"] * len(columns))
-        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
-        
-        # 执行批量插入
-        cursor.executemany(query, data)
+        try:
+            with statement_guard(conn, category='batch'):
+                _copy_rows(cursor, table, columns, data)
+        except psycopg2.extensions.QueryCanceledError:
+            raise
+        except psycopg2.Error as e:
+            # COPY失败（权限、类型编码等）时回退为多行INSERT
+            logger.warning(f"COPY写入 {table} 失败，回退execute_values: {e}")
+            conn.rollback()
+            method = "execute_values"
+            query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s"
+            # 回滚后SET LOCAL失效，需重新设置
+            with statement_guard(conn, category='batch'):
+                psycopg2.extras.execute_values(
+                    cursor, query, [_insert_row_params(row) for row in data], page_size=1000
+                )
         conn.commit()
+        invalidate_request_cache()
         
-        logger.info(f"批量插入成功: {table} - {len(data)} 条记录")
+        elapsed = time.perf_counter() - start
+        rate = len(data) / elapsed if elapsed > 0 else float('inf')
+        logger.info(f"批量插入成功: {table} - {len(data)} 条记录 ({method}, {elapsed:.2f}s, {rate:,.0f} 行/秒)")
         return True
         
     except Exception as e:
@@ -455,7 +1804,12 @@ def bulk_insert(table: str, columns: List[str], data: List[List]) -> bool:
             return_connection(conn)
 
 def bulk_update(table: str, updates: List[Dict]) -> bool:
-    """批量更新数据"""
+    """
+    批量更新数据 - 临时表 + 单条 UPDATE ... FROM
+
+    按 (set列, where列) 分组，每组先COPY进与目标表同类型的临时表，
+    再用一条UPDATE关联更新。
+    """
     if not updates:
         return True
     
@@ -465,21 +1819,47 @@ def bulk_update(table: str, updates: List[Dict]) -> bool:
     try:
         conn = get_connection()
         cursor = conn.cursor()
+        start = time.perf_counter()
         
+        # 按列组合分组，同组内可共享一张临时表
+        groups = OrderedDict()
         for update in updates:
             if not update.get('set') or not update.get('where'):
                 continue
-            
-            set_clause = ", ".join([f"{k} = %s" for k in update['set'].keys()])
-            where_clause = " AND ".join([f"{k} = %s" for k in update['where'].keys()])
-            
-            query = f"UPDATE {table} SET {set_clause} WHERE {where_clause}"
-            params = list(update['set'].values()) + list(update['where'].values())
-            
-            cursor.execute(query, params)
+            key = (tuple(update['set'].keys()), tuple(update['where'].keys()))
+            groups.setdefault(key, []).append(
+                list(update['set'].values()) + list(update['where'].values())
+            )
+        
+        updated_rows = 0
+        with statement_guard(conn, category='batch'):
+            for index, ((set_columns, where_columns), rows) in enumerate(groups.items()):
+                temp_table = f"_bulk_update_{index}"
+                temp_columns = [f"set_{c}" for c in set_columns] + [f"where_{c}" for c in where_columns]
+                select_list = ", ".join(
+                    [f"{c} AS set_{c}" for c in set_columns] + [f"{c} AS where_{c}" for c in where_columns]
+                )
+                # CREATE TABLE AS ... WITH NO DATA 继承列类型但不带约束
+                cursor.execute(
+                    f"CREATE TEMP TABLE {temp_table} ON COMMIT DROP AS "
+                    f"SELECT {select_list} FROM {table} WITH NO DATA"
+                )
+                _copy_rows(cursor, temp_table, temp_columns, rows)
+                
+                set_clause = ", ".join([f"{c} = s.set_{c}" for c in set_columns])
+                where_clause = " AND ".join([f"t.{c} = s.where_{c}" for c in where_columns])
+                cursor.execute(f"UPDATE {table} AS t SET {set_clause} FROM {temp_table} AS s WHERE {where_clause}")
+                updated_rows += cursor.rowcount
         
         conn.commit()
-        logger.info(f"批量更新成功: {table} - {len(updates)} 条记录")
+        invalidate_request_cache()
+        
+        elapsed = time.perf_counter() - start
+        rate = len(updates) / elapsed if elapsed > 0 else float('inf')
+        logger.info(
+            f"批量更新成功: {table} - {len(updates)} 条记录，实际更新 {updated_rows} 行 "
+            f"({elapsed:.2f}s, {rate:,.0f} 行/秒)"
+        )
         return True
         
     except Exception as e:
@@ -497,33 +1877,252 @@ def bulk_update(table: str, updates: List[Dict]) -> bool:
 # ========== 事务处理 ==========
 
 @contextmanager
-def transaction():
-    """事务上下文管理器"""
+def transaction(timeout: Optional[float] = None, category: str = 'interactive'):
+    """
+    事务上下文管理器
+
+    Args:
+        timeout: 事务内每条语句的超时秒数，优先于category的默认值
+        category: 查询类别 interactive / report / batch
+    """
     conn = None
     
-    try:
-        conn = get_connection()
-        conn.autocommit = False
-        
-        yield conn
-        
-        conn.commit()
-        logger.debug("事务提交成功")
-        
-    except Exception as e:
-        logger.error(f"事务执行失败: {e}")
-        if conn:
-            conn.rollback()
-            logger.debug("事务已回滚")
-        raise
-        
-    finally:
-        if conn:
-            return_connection(conn)
+    with timed_block('transaction', _last_pool_wait_ms):
+        try:
+            conn = get_connection()
+            conn.autocommit = False
+            
+            with statement_guard(conn, timeout, category):
+                yield conn
+            
+            conn.commit()
+            invalidate_request_cache()
+            logger.debug("事务提交成功")
+            
+        except Exception as e:
+            logger.error(f"事务执行失败: {e}")
+            if conn and not conn.closed:
+                conn.rollback()
+                logger.debug("事务已回滚")
+            raise
+            
+        finally:
+            if conn:
+                # return_connection会复位autocommit/隔离级别，调用方的修改不会泄漏给下一个借用者
+                return_connection(conn)
+
+# ========== 工作单元 ==========
+
+# 序列化失败 / 死锁检测：整个事务重放即可成功的错误
+RETRYABLE_PGCODES = frozenset({'40001', '40P01'})
+UOW_MAX_RETRIES = int(os.getenv('DB_UOW_MAX_RETRIES', '3'))
+# 重试退避基数与上限（秒），实际等待为 [0, min(base * 2^n, cap)) 的随机值
+UOW_BACKOFF_BASE = float(os.getenv('DB_UOW_BACKOFF_BASE', '0.02'))
+UOW_BACKOFF_CAP = float(os.getenv('DB_UOW_BACKOFF_CAP', '0.5'))
+
+ISOLATION_LEVELS = {
+    'read_committed': 'READ COMMITTED',
+    'repeatable_read': 'REPEATABLE READ',
+    'serializable': 'SERIALIZABLE',
+}
+
+_uow_stats_lock = threading.Lock()
+_uow_stats = {'commits': 0, 'rollbacks': 0, 'retries': 0, 'failures': 0}
+
+def _count_uow(key: str):
+    with _uow_stats_lock:
+        _uow_stats[key] += 1
+
+class UnitOfWork:
+    """
+    一次事务尝试内的操作句柄
+
+    所有语句共用同一游标和连接；需要"读-判断-写"的业务规则时，
+    用 SELECT ... FOR UPDATE 锁定行，或把判断写进 UPDATE 的 WHERE 条件。
+    """
+
+    def __init__(self, conn, attempt: int = 1):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.attempt = attempt
+        self.rollback_only = False
+        self._savepoint_seq = 0
+
+    def execute(self, query: str, params=None) -> int:
+        """执行语句，返回受影响行数"""
+        self.cursor.execute(query, serialize_params(params))
+        return self.cursor.rowcount
+
+    def fetch_one(self, query: str, params=None) -> Optional[Dict]:
+        self.cursor.execute(query, serialize_params(params))
+        row = self.cursor.fetchone()
+        return dict(row) if row else None
+
+    def fetch_all(self, query: str, params=None) -> List[Dict]:
+        self.cursor.execute(query, serialize_params(params))
+        return [dict(row) for row in self.cursor.fetchall()]
+
+    def set_rollback_only(self):
+        """业务校验不通过：结束时回滚而不提交，不抛异常也不重试"""
+        self.rollback_only = True
+
+    @contextmanager
+    def savepoint(self, name: Optional[str] = None):
+        """
+        保存点：块内异常只回滚到保存点，外层事务继续
+
+        异常仍会向上抛出，由调用方决定是否吞掉后继续执行。
+        """
+        self._savepoint_seq += 1
+        name = name or f"uow_sp_{self._savepoint_seq}"
+        self.cursor.execute(f'SAVEPOINT "{name}"')
+        try:
+            yield
+        except Exception:
+            self.cursor.execute(f'ROLLBACK TO SAVEPOINT "{name}"')
+            raise
+        else:
+            self.cursor.execute(f'RELEASE SAVEPOINT "{name}"')
+
+    def close(self):
+        if not self.cursor.closed:
+            self.cursor.close()
+
+def _retry_delay(attempt: int) -> float:
+    """带抖动的指数退避，避免冲突双方同时重放再次冲突"""
+    return random.uniform(0, min(UOW_BACKOFF_BASE * (2 ** (attempt - 1)), UOW_BACKOFF_CAP))
+
+def run_in_transaction(work, isolation: str = 'read_committed', read_only: bool = False,
+                       max_retries: int = UOW_MAX_RETRIES, timeout: Optional[float] = None,
+                       category: str = 'interactive'):
+    """
+    在一个短事务中执行 work(uow) 并提交，序列化失败或死锁时整体重放
+
+    work 可能被调用多次，只能包含数据库操作：界面提示等副作用请根据返回值在事务外完成。
+    隔离级别随psycopg2发出的BEGIN一起发送，不增加往返；连接归还时复位。
+
+    Args:
+        work: 接收 UnitOfWork 的可调用对象，其返回值即本函数返回值
+        isolation: read_committed / repeatable_read / serializable
+        read_only: 只读事务
+        max_retries: 可重试错误的最大重放次数
+        timeout: 事务内每条语句的超时秒数，优先于category的默认值
+        category: 查询类别 interactive / report / batch
+    """
+    if isolation not in ISOLATION_LEVELS:
+        raise ValueError(f"不支持的隔离级别: {isolation}")
+
+    attempt = 0
+    while True:
+        attempt += 1
+        conn = None
+        uow = None
+        with timed_block('transaction', _last_pool_wait_ms):
+            try:
+                conn = get_connection()
+                conn.autocommit = False
+                conn.set_session(isolation_level=ISOLATION_LEVELS[isolation], readonly=read_only)
+                uow = UnitOfWork(conn, attempt)
+
+                with statement_guard(conn, timeout, category):
+                    result = work(uow)
+
+                if uow.rollback_only:
+                    conn.rollback()
+                    _count_uow('rollbacks')
+                else:
+                    conn.commit()
+                    invalidate_request_cache()
+                    _count_uow('commits')
+                return result
+
+            except psycopg2.Error as e:
+                if conn and not conn.closed:
+                    conn.rollback()
+                if e.pgcode in RETRYABLE_PGCODES and attempt <= max_retries:
+                    _count_uow('retries')
+                    logger.warning(f"事务冲突（{e.pgcode}），第{attempt}次重试")
+                else:
+                    _count_uow('failures')
+                    logger.error(f"事务执行失败: {e}")
+                    raise
+
+            except Exception as e:
+                _count_uow('failures')
+                logger.error(f"事务执行失败: {e}")
+                if conn and not conn.closed:
+                    conn.rollback()
+                raise
+
+            finally:
+                if uow:
+                    uow.close()
+                if conn:
+                    return_connection(conn)
+
+        time.sleep(_retry_delay(attempt))
+
+def get_unit_of_work_stats() -> Dict[str, int]:
+    """工作单元提交/回滚/重试/失败计数（供系统监控页展示）"""
+    with _uow_stats_lock:
+        return dict(_uow_stats)
 
 # ========== 缓存和性能优化 ==========
 
-@st.cache_data(ttl=300)  # 缓存5分钟
+# 按表失效的查询缓存（进程内共享）
+TABLE_CACHE_MAX_ENTRIES = int(os.getenv('DB_TABLE_CACHE_SIZE', '1000'))
+_table_cache = TableCache(TABLE_CACHE_MAX_ENTRIES)
+
+def cached_query(
+    query: str,
+    params: Optional[Union[List, Tuple, Dict]] = None,
+    fetch_one: bool = False,
+    tables: Optional[List[str]] = None,
+    ttl: Optional[float] = None
+) -> Optional[Union[List[Dict], Dict]]:
+    """
+    带按表失效的只读查询缓存
+
+    Args:
+        query: SQL查询语句
+        params: 查询参数
+        fetch_one: 是否返回单条记录（否则返回全部）
+        tables: 依赖的表，默认从FROM/JOIN子句解析
+        ttl: 可选过期秒数，默认只在依赖表被写入时失效
+
+    Returns:
+        查询结果（副本）
+    """
+    key = (query, repr(params), fetch_one)
+    hit, value = _table_cache.get(key)
+    if hit:
+        return _copy_result(value)
+
+    # 失效代数在查询前取得：查询期间依赖表被写入时，本次结果只返回、不缓存。
+    # 与字典表映射一样读主库：失效来自主库的提交，滞后副本上的旧数据缓存后不会再被纠正
+    dependencies = tables or extract_read_tables(query)
+    snapshot = _table_cache.snapshot(dependencies)
+    result = execute_query(query, params=params, fetch_one=fetch_one, fetch_all=not fetch_one,
+                           use_replica=False)
+    _table_cache.put(key, _copy_result(result), dependencies, ttl=ttl, snapshot=snapshot)
+    return result
+
+def invalidate_tables(tables) -> int:
+    """失效读取了指定表的缓存条目"""
+    if isinstance(tables, str):
+        tables = [tables]
+    removed = _table_cache.invalidate(tables)
+    _invalidate_lookup_maps(tables)
+    _invalidate_role_permissions(tables)
+    invalidate_request_cache()
+    if removed:
+        logger.debug(f"缓存失效: {sorted(tables)} - {removed} 条")
+    return removed
+
+def get_table_cache_stats() -> Dict[str, Any]:
+    """获取按表缓存的统计信息"""
+    return _table_cache.get_stats()
+
 def get_cached_lookup_data():
     """获取缓存的查找数据"""
     try:
@@ -537,25 +2136,305 @@ def get_cached_lookup_data():
         logger.error(f"获取缓存查找数据失败: {e}")
         return {}
 
-def clear_cache():
-    """清除缓存"""
+def clear_cache(tables: Optional[List[str]] = None):
+    """清除缓存，指定tables时只失效相关条目"""
     try:
-        if hasattr(st, 'cache_data'):
-            st.cache_data.clear()
-        logger.info("缓存已清除")
+        if tables:
+            invalidate_tables(tables)
+        else:
+            _table_cache.clear()
+            _invalidate_lookup_maps(LOOKUP_TABLES)
+            _invalidate_role_permissions()
+            invalidate_request_cache()
+        logger.info(f"缓存已清除: {tables or '全部'}")
     except Exception as e:
         logger.error(f"清除缓存失败: {e}")
 
+# ========== 字典表映射 ==========
+
+# 字典表 -> 当前LookupMap；刷新时整体替换，读取方无需加锁
+_lookup_maps: Dict[str, LookupMap] = {}
+# 每次失效递增，防止失效前发出的加载结果覆盖失效
+_lookup_versions: Dict[str, int] = {}
+_lookup_lock = threading.Lock()
+
+def _invalidate_lookup_maps(tables):
+    """丢弃指定字典表的映射，下次访问时重新加载"""
+    with _lookup_lock:
+        for table in tables:
+            if table in LOOKUP_TABLES:
+                _lookup_maps.pop(table, None)
+                _lookup_versions[table] = _lookup_versions.get(table, 0) + 1
+
+def load_lookup_maps(tables=None) -> Dict[str, LookupMap]:
+    """
+    一次查询加载多张字典表的映射
+
+    始终读主库：变更通知来自主库，从滞后的副本加载可能拿到通知之前的数据，
+    而之后不会再有通知来纠正。
+
+    Args:
+        tables: 字典表名列表，默认全部
+    """
+    tables = [t for t in (tables or LOOKUP_TABLES) if t in LOOKUP_TABLES]
+    if not tables:
+        return {}
+
+    with _lookup_lock:
+        versions = {table: _lookup_versions.get(table, 0) for table in tables}
+
+    query = " UNION ALL ".join(
+        f"SELECT '{table}' AS lookup_table, {LOOKUP_TABLES[table][0]} AS item_id, "
+        f"{LOOKUP_TABLES[table][1]}::text AS item_name FROM {table}"
+        for table in tables
+    )
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+        conn.rollback()
+    finally:
+        return_connection(conn)
+
+    pairs = {table: [] for table in tables}
+    for row in rows:
+        pairs[row['lookup_table']].append((row['item_id'], row['item_name']))
+    maps = {table: LookupMap(table, items) for table, items in pairs.items()}
+
+    with _lookup_lock:
+        for table, lookup in maps.items():
+            if _lookup_versions.get(table, 0) == versions[table]:
+                _lookup_maps[table] = lookup
+    logger.debug(f"字典表映射已加载: {', '.join(tables)}")
+    return maps
+
+def get_lookup_map(table: str) -> LookupMap:
+    """
+    获取字典表的 id <-> 名称 映射，首次访问或失效后从数据库加载
+
+    加载失败时返回空映射（不缓存），调用方按"名称不存在"处理。
+    """
+    lookup = _lookup_maps.get(table)
+    if lookup is not None:
+        return lookup
+    if table not in LOOKUP_TABLES:
+        raise ValueError(f"未登记的字典表: {table}")
+    try:
+        return load_lookup_maps([table])[table]
+    except Exception as e:
+        logger.error(f"加载字典表 {table} 失败: {e}")
+        return LookupMap(table, ())
+
+def lookup_id(table: str, name: str) -> Optional[int]:
+    """字典表名称 -> id，不存在时返回None"""
+    return get_lookup_map(table).id_of(name)
+
+def lookup_ids(table: str, names) -> List[int]:
+    """多个名称 -> id列表，用于 = ANY(%s) 代替按名称的子查询"""
+    return get_lookup_map(table).ids_of(names)
+
+def lookup_name(table: str, item_id: int) -> Optional[str]:
+    """字典表id -> 名称，不存在时返回None"""
+    return get_lookup_map(table).name_of(item_id)
+
+def get_lookup_stats() -> Dict[str, Any]:
+    """已加载的字典表及条目数"""
+    maps = dict(_lookup_maps)
+    return {table: len(lookup) for table, lookup in maps.items()}
+
+# ========== 角色权限 ==========
+
+# role_id -> frozenset(权限)；与字典表映射相同，整体替换，按版本防止旧的加载结果覆盖失效
+_role_permissions: Dict[int, frozenset] = {}
+_role_permissions_version = 0
+_role_permissions_lock = threading.Lock()
+PERMISSION_TABLES = frozenset({'roles', 'role_permissions'})
+
+def _invalidate_role_permissions(tables=PERMISSION_TABLES):
+    """相关表被写入时丢弃全部角色权限，下次检查时重新加载"""
+    global _role_permissions, _role_permissions_version
+    if PERMISSION_TABLES.isdisjoint(tables):
+        return
+    with _role_permissions_lock:
+        _role_permissions = {}
+        _role_permissions_version += 1
+
+def get_role_permissions_version() -> int:
+    """当前权限缓存版本，配合cache_role_permissions使用"""
+    return _role_permissions_version
+
+def cache_role_permissions(role_id: int, permissions, version: int):
+    """
+    写入单个角色的权限（如登录查询顺带取得的权限集合）
+
+    version为发出查询前取得的get_role_permissions_version()；期间发生过
+    失效则丢弃，以免旧数据覆盖。
+    """
+    global _role_permissions
+    with _role_permissions_lock:
+        if _role_permissions_version == version:
+            _role_permissions = {**_role_permissions, role_id: frozenset(permissions)}
+
+def load_role_permissions() -> Dict[int, frozenset]:
+    """一次查询加载所有角色的权限（与字典表映射一样始终读主库）"""
+    global _role_permissions
+    version = _role_permissions_version
+    query = """
+    SELECT r.role_id,
+           COALESCE(array_agg(rp.permission) FILTER (WHERE rp.permission IS NOT NULL), '{}') AS permissions
+    FROM roles r
+    LEFT JOIN role_permissions rp ON rp.role_id = r.role_id
+    GROUP BY r.role_id
+    """
+    conn = get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+        conn.rollback()
+    finally:
+        return_connection(conn)
+
+    permissions = {row['role_id']: frozenset(row['permissions']) for row in rows}
+    with _role_permissions_lock:
+        if _role_permissions_version == version:
+            _role_permissions = permissions
+    logger.debug(f"角色权限已加载: {len(permissions)} 个角色")
+    return permissions
+
+def get_role_permissions(role_id: int) -> frozenset:
+    """
+    获取角色的权限集合，命中缓存时不访问数据库
+
+    加载失败时返回空集合（不缓存），即按无权限处理。
+    """
+    permissions = _role_permissions.get(role_id)
+    if permissions is not None:
+        return permissions
+    try:
+        return load_role_permissions().get(role_id, frozenset())
+    except Exception as e:
+        logger.error(f"加载角色权限失败: {e}")
+        return frozenset()
+
+# ========== 跨进程缓存失效 ==========
+
+# 与迁移 a7fa15410410 中触发器使用的通道一致
+CACHE_NOTIFY_CHANNEL = os.getenv('DB_CACHE_NOTIFY_CHANNEL', 'table_changes')
+CACHE_LISTENER_ENABLED = os.getenv('DB_CACHE_LISTENER', 'true') == 'true'
+
+class CacheInvalidationListener(threading.Thread):
+    """
+    LISTEN表变更通知的后台线程（每进程一个）
+
+    其他副本提交写入后，触发器通过pg_notify广播表名，本线程收到后
+    失效本进程内读取了该表的缓存条目。断线重连后清空全部缓存，
+    以免漏掉断线期间的通知。
+    """
+
+    def __init__(self, channel: str = CACHE_NOTIFY_CHANNEL, poll_timeout: float = 5.0):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.channel = channel
+        self.poll_timeout = poll_timeout
+        self._stop_event = threading.Event()
+        self.notifications = 0
+        self.reconnects = 0
+
+    def stop(self):
+        """请求线程退出"""
+        self._stop_event.set()
+
+    def _connect(self):
+        conn_args = get_connection_args()
+        conn_args.pop('cursor_factory', None)
+        conn = psycopg2.connect(**conn_args)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _handle(self, payload: str):
+        try:
+            table = json.loads(payload).get('table')
+        except (ValueError, AttributeError):
+            table = payload
+        if table:
+            self.notifications += 1
+            invalidate_tables([table])
+
+    def run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                if self.reconnects:
+                    # 断线期间的通知已丢失，保守地清空缓存
+                    _table_cache.clear()
+                    _invalidate_lookup_maps(LOOKUP_TABLES)
+                    _invalidate_role_permissions()
+                logger.info(f"缓存失效监听已启动: LISTEN {self.channel}")
+                backoff = 1.0
+                while not self._stop_event.is_set():
+                    if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                self.reconnects += 1
+                logger.warning(f"缓存失效监听断开，{backoff:.0f}s后重连: {e}")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if conn:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+_cache_listener = None
+_cache_listener_lock = threading.Lock()
+
+def start_cache_listener() -> Optional[CacheInvalidationListener]:
+    """启动本进程的缓存失效监听线程（幂等）"""
+    global _cache_listener
+    if not CACHE_LISTENER_ENABLED:
+        return None
+    with _cache_listener_lock:
+        if _cache_listener is None or not _cache_listener.is_alive():
+            _cache_listener = CacheInvalidationListener()
+            _cache_listener.start()
+    return _cache_listener
+
+def get_cache_listener_stats() -> Dict[str, Any]:
+    """获取缓存失效监听状态"""
+    if _cache_listener is None:
+        return {'running': False, 'notifications': 0, 'reconnects': 0}
+    return {
+        'running': _cache_listener.is_alive(),
+        'notifications': _cache_listener.notifications,
+        'reconnects': _cache_listener.reconnects,
+    }
+
 # ========== 初始化 ==========
 
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
 def initialize_database():
-    """初始化数据库连接"""
+    """初始化数据库连接并探活（同步执行，离线脚本可显式调用）"""
     try:
         init_connection_pool()
         
         # 测试连接
         if test_connection():
             logger.info("数据库连接正常")
+            try:
+                load_lookup_maps()
+            except Exception as e:
+                logger.warning(f"预加载字典表映射失败，将在首次访问时加载: {e}")
             return True
         else:
             logger.error("数据库连接失败")
@@ -565,5 +2444,35 @@ def initialize_database():
         logger.error(f"数据库初始化失败: {e}")
         return False
 
-# 自动初始化
-initialize_database()
\ No newline at end of file
+def warm_up_database(mode: Optional[str] = None) -> Optional[threading.Thread]:
+    """
+    预热连接池（每进程至多一次）
+
+    模块导入时不再连接数据库，连接池在首次查询时才创建。应用入口可调用本函数
+    提前建池，background模式下不阻塞页面渲染。
+
+    Args:
+        mode: background / sync / off，默认读取环境变量DB_WARMUP
+
+    Returns:
+        background模式下返回预热线程
+    """
+    global _warmup_thread
+    mode = mode or DB_WARMUP_MODE
+    if mode == 'off' or _connection_pool is not None:
+        return None
+    
+    with _warmup_lock:
+        if _warmup_thread is not None:
+            return _warmup_thread
+        if mode == 'sync':
+            _warmup_thread = threading.current_thread()
+        else:
+            _warmup_thread = threading.Thread(
+                target=initialize_database, name='db-warmup', daemon=True
+            )
+            _warmup_thread.start()
+            return _warmup_thread
+    
+    initialize_database()
+    return None
\ No newline at end of file
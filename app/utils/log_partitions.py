@@ -0,0 +1,235 @@
+# utils/log_partitions.py - system_logs 月分区维护：预建未来分区、按保留期删除旧分区
+import os
+import logging
+import threading
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import psycopg2
+
+from utils.database import run_in_transaction, invalidate_tables
+
+logger = logging.getLogger(__name__)
+
+# 与迁移 f8a3d5c2e9b4 中的命名一致
+LOG_TABLE = 'system_logs'
+PARTITION_PREFIX = 'system_logs_p'
+DEFAULT_PARTITION = 'system_logs_default'
+
+# 提前建好的未来月数；写入落到未建分区的月份时进入默认分区
+LOG_PARTITION_MONTHS_AHEAD = int(os.getenv('DB_LOG_PARTITION_MONTHS_AHEAD', '3'))
+# 保留最近多少个整月（不含当前月）的日志，0表示永久保留
+LOG_RETENTION_MONTHS = int(os.getenv('DB_LOG_RETENTION_MONTHS', '0'))
+LOG_PARTITION_CHECK_INTERVAL = float(os.getenv('DB_LOG_PARTITION_CHECK_INTERVAL', '21600'))
+LOG_PARTITION_MAINTENANCE = os.getenv('DB_LOG_PARTITION_MAINTENANCE', 'true') == 'true'
+# 删除分区需要父表的ACCESS EXCLUSIVE锁，排队期间会挡住所有日志读写；等锁超过该秒数即放弃，下个周期重试
+LOG_PARTITION_LOCK_TIMEOUT = float(os.getenv('DB_LOG_PARTITION_LOCK_TIMEOUT', '2'))
+
+LOCK_NOT_AVAILABLE = '55P03'
+
+PARTITIONS_QUERY = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = to_regclass(%s)
+"""
+
+def _add_months(month_start: date, months: int) -> date:
+    index = month_start.year * 12 + month_start.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _partition_name(month_start: date) -> str:
+    return f"{PARTITION_PREFIX}{month_start:%Y%m}"
+
+def _partition_month(name: str) -> Optional[date]:
+    """system_logs_p202610 -> date(2026, 10, 1)，非月分区返回None"""
+    suffix = name[len(PARTITION_PREFIX):]
+    if not name.startswith(PARTITION_PREFIX) or len(suffix) != 6 or not suffix.isdigit():
+        return None
+    return date(int(suffix[:4]), int(suffix[4:]), 1)
+
+def _lock_maintenance(uow) -> bool:
+    """多个副本同时维护时只有一个执行，其余直接跳过"""
+    row = uow.fetch_one("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (LOG_TABLE + '_partitions',))
+    return bool(row and row['locked'])
+
+def _current_month(uow) -> date:
+    """按数据库时区取当月第一天，与分区边界（timestamptz按会话时区解释）保持一致"""
+    return uow.fetch_one("SELECT date_trunc('month', now())::date AS month")['month']
+
+def _is_partitioned(uow) -> bool:
+    row = uow.fetch_one(
+        "SELECT c.relkind = 'p' AS partitioned FROM pg_class c WHERE c.oid = to_regclass(%s)", (LOG_TABLE,)
+    )
+    return bool(row and row['partitioned'])
+
+def _create_partition(uow, month_start: date):
+    """
+    新建月分区，并把默认分区中落在该月的日志移入
+
+    直接 CREATE TABLE ... PARTITION OF 会因默认分区中已有该月数据而失败，
+    因此先建普通表、搬数据，再ATTACH。
+    """
+    name = _partition_name(month_start)
+    lower, upper = month_start.isoformat(), _add_months(month_start, 1).isoformat()
+    uow.execute(f"CREATE TABLE {name} (LIKE {LOG_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    uow.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        (lower, upper)
+    )
+    uow.execute(f"ALTER TABLE {LOG_TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+
+def ensure_log_partitions(months_ahead: int = LOG_PARTITION_MONTHS_AHEAD) -> List[str]:
+    """
+    建好当前月到之后months_ahead个月的分区，并把默认分区中的数据拆到各自的月分区
+
+    Returns:
+        新建的分区名列表；表未分区或其他进程正在维护时返回空列表
+    """
+    def work(uow):
+        if not _lock_maintenance(uow) or not _is_partitioned(uow):
+            return []
+        existing = {row['relname'] for row in uow.fetch_all(PARTITIONS_QUERY, (LOG_TABLE,))}
+        current = _current_month(uow)
+        months = {_add_months(current, offset) for offset in range(months_ahead + 1)}
+        # 默认分区通常为空；有数据时（早于迁移的月份、批量导入）补建对应月分区
+        months.update(
+            row['month'] for row in uow.fetch_all(
+                f"SELECT DISTINCT date_trunc('month', timestamp)::date AS month FROM {DEFAULT_PARTITION}"
+            )
+        )
+        created = []
+        for month_start in sorted(months):
+            if _partition_name(month_start) not in existing:
+                _create_partition(uow, month_start)
+                created.append(_partition_name(month_start))
+        return created
+
+    created = run_in_transaction(work, category='batch')
+    if created:
+        invalidate_tables([LOG_TABLE])
+        logger.info(f"已创建日志分区: {', '.join(created)}")
+    return created
+
+def _drop_partition(name: str) -> bool:
+    """
+    在独立的短事务中删除一个分区，等不到父表锁时放弃
+
+    默认分区存在时不能使用 DETACH PARTITION CONCURRENTLY，只能直接DROP；
+    每个分区单独提交，ACCESS EXCLUSIVE锁只持有到该分区删除完成。
+
+    Returns:
+        是否已删除；等锁超时或其他进程正在维护时返回False
+    """
+    def work(uow):
+        if not _lock_maintenance(uow):
+            return False
+        uow.execute("SET LOCAL lock_timeout = %s", (int(LOG_PARTITION_LOCK_TIMEOUT * 1000),))
+        try:
+            with uow.savepoint():
+                uow.execute(f"DROP TABLE IF EXISTS {name}")
+        except psycopg2.Error as e:
+            if e.pgcode != LOCK_NOT_AVAILABLE:
+                raise
+            return False
+        return True
+
+    return run_in_transaction(work, category='batch')
+
+def drop_expired_log_partitions(retention_months: int = LOG_RETENTION_MONTHS) -> List[str]:
+    """
+    删除早于保留期的整月分区（DROP TABLE，不产生逐行DELETE的膨胀和WAL）
+
+    保留当前月及之前retention_months个整月；默认分区中的过期日志按行删除。
+    等不到父表锁的分区留到下个维护周期。
+
+    Returns:
+        删除的分区名列表
+    """
+    if retention_months <= 0:
+        return []
+
+    def work(uow):
+        if not _lock_maintenance(uow) or not _is_partitioned(uow):
+            return None, []
+        cutoff = _add_months(_current_month(uow), -retention_months)
+        expired = []
+        for row in uow.fetch_all(PARTITIONS_QUERY, (LOG_TABLE,)):
+            month_start = _partition_month(row['relname'])
+            if month_start is not None and month_start < cutoff:
+                expired.append(row['relname'])
+        uow.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < %s", (cutoff.isoformat(),))
+        return cutoff, sorted(expired)
+
+    cutoff, expired = run_in_transaction(work, category='batch')
+    dropped = [name for name in expired if _drop_partition(name)]
+    deferred = len(expired) - len(dropped)
+    if dropped:
+        invalidate_tables([LOG_TABLE])
+        logger.info(f"已删除过期日志分区（早于 {cutoff}）: {', '.join(dropped)}")
+    if deferred:
+        _maintenance_stats['deferred'] += deferred
+        logger.info(f"{deferred} 个过期日志分区等锁超时，下个周期重试")
+    return dropped
+
+_maintenance_stats = {'runs': 0, 'created': 0, 'dropped': 0, 'deferred': 0, 'errors': 0, 'last_error': None}
+
+def run_log_partition_maintenance() -> Dict[str, List[str]]:
+    """执行一次分区维护：先预建再清理"""
+    try:
+        created = ensure_log_partitions()
+        dropped = drop_expired_log_partitions()
+    except Exception as e:
+        _maintenance_stats['errors'] += 1
+        _maintenance_stats['last_error'] = str(e)
+        raise
+    _maintenance_stats['runs'] += 1
+    _maintenance_stats['created'] += len(created)
+    _maintenance_stats['dropped'] += len(dropped)
+    return {'created': created, 'dropped': dropped}
+
+class LogPartitionMaintainer(threading.Thread):
+    """定期执行分区维护的后台线程（每进程一个，跨副本由advisory锁互斥）"""
+
+    def __init__(self, interval: float = LOG_PARTITION_CHECK_INTERVAL):
+        super().__init__(name='log-partition-maintainer', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """请求线程退出"""
+        self._stop_event.set()
+
+    def run(self):
+        # 启动后先等一小段时间，避开连接池预热
+        delay = min(60.0, self.interval)
+        while not self._stop_event.wait(delay):
+            try:
+                run_log_partition_maintenance()
+            except Exception as e:
+                logger.warning(f"日志分区维护失败: {e}")
+            delay = self.interval
+
+_maintainer = None
+_maintainer_lock = threading.Lock()
+
+def start_log_partition_maintenance() -> Optional[LogPartitionMaintainer]:
+    """启动本进程的分区维护线程（幂等）"""
+    global _maintainer
+    if not LOG_PARTITION_MAINTENANCE:
+        return None
+    with _maintainer_lock:
+        if _maintainer is None or not _maintainer.is_alive():
+            _maintainer = LogPartitionMaintainer()
+            _maintainer.start()
+    return _maintainer
+
+def get_log_partition_stats() -> Dict[str, Any]:
+    """获取分区维护统计（本进程）"""
+    return {
+        **_maintenance_stats,
+        'running': _maintainer is not None and _maintainer.is_alive(),
+        'months_ahead': LOG_PARTITION_MONTHS_AHEAD,
+        'retention_months': LOG_RETENTION_MONTHS,
+    }
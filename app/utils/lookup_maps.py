@@ -0,0 +1,70 @@
+# utils/lookup_maps.py - 字典表的进程内双向映射
+from types import MappingProxyType
+from typing import Iterable, List, Optional, Tuple
+
+# 字典表 -> (主键列, 名称列)；名称列在各表上均有唯一约束
+LOOKUP_TABLES = {
+    'mold_statuses': ('status_id', 'status_name'),
+    'loan_statuses': ('status_id', 'status_name'),
+    'maintenance_types': ('type_id', 'type_name'),
+    'maintenance_result_statuses': ('status_id', 'status_name'),
+    'mold_functional_types': ('type_id', 'type_name'),
+    'storage_locations': ('location_id', 'location_name'),
+    'roles': ('role_id', 'role_name'),
+}
+
+class LookupMap:
+    """
+    不可变的 id <-> 名称 双向映射
+
+    构造后不再修改，刷新时整体替换为新实例：读取方持有的旧实例保持一致，
+    不需要加锁。
+    """
+
+    __slots__ = ('table', '_by_id', '_by_name')
+
+    def __init__(self, table: str, pairs: Iterable[Tuple[int, str]]):
+        by_id = {}
+        by_name = {}
+        for item_id, name in pairs:
+            by_id[item_id] = name
+            by_name[name] = item_id
+        self.table = table
+        self._by_id = MappingProxyType(by_id)
+        self._by_name = MappingProxyType(by_name)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_by_name'):
+            raise AttributeError(f"{type(self).__name__} 不可修改")
+        object.__setattr__(self, name, value)
+
+    def id_of(self, name: str) -> Optional[int]:
+        """名称 -> id，不存在时返回None"""
+        return self._by_name.get(name)
+
+    def name_of(self, item_id: int) -> Optional[str]:
+        """id -> 名称，不存在时返回None"""
+        return self._by_id.get(item_id)
+
+    def ids_of(self, names: Iterable[str]) -> List[int]:
+        """多个名称 -> id列表，忽略不存在的名称（列表适配为数组，可直接用于 = ANY(%s)）"""
+        return [self._by_name[name] for name in names if name in self._by_name]
+
+    @property
+    def by_id(self):
+        """只读视图 id -> 名称"""
+        return self._by_id
+
+    @property
+    def by_name(self):
+        """只读视图 名称 -> id"""
+        return self._by_name
+
+    def __contains__(self, name) -> bool:
+        return name in self._by_name
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __repr__(self) -> str:
+        return f"LookupMap({self.table!r}, {len(self)} 项)"
@@ -1,7 +1,7 @@
 # utils/mold_search.py - 可选的搜索组件增强
 import streamlit as st
 import pandas as pd
-from utils.database import execute_query
+from utils.database import execute_query, lookup_id
 
 def create_mold_search_widget():
     """创建模具搜索组件"""
@@ -84,7 +84,8 @@ def perform_mold_search(query, only_available=True, max_results=20):
         
         # 如果只搜索可用模具
         if only_available:
-            base_sql += " AND ms.status_name = '闲置'"
+            base_sql += " AND m.current_status_id = %s"
+            params.append(lookup_id('mold_statuses', '闲置'))
         
         base_sql += f" ORDER BY m.mold_code LIMIT {max_results}"
         
@@ -214,16 +215,15 @@ def get_popular_molds(limit=8):
         COUNT(mlr.loan_id) as usage_count
     FROM molds m
     LEFT JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
-    LEFT JOIN mold_statuses ms ON m.current_status_id = ms.status_id
     LEFT JOIN mold_loan_records mlr ON m.mold_id = mlr.mold_id
-    WHERE ms.status_name = '闲置'
+    WHERE m.current_status_id = %s
     GROUP BY m.mold_id, m.mold_code, m.mold_name, mft.type_name
     ORDER BY usage_count DESC, m.mold_code
     LIMIT %s
     """
     
     try:
-        return execute_query(query, (limit,), fetch_all=True) or []
+        return execute_query(query, (lookup_id('mold_statuses', '闲置'), limit), fetch_all=True) or []
     except:
         return []
 
@@ -240,14 +240,13 @@ def get_molds_by_type(type_name, limit=10):
     query = """
     SELECT m.mold_id, m.mold_code, m.mold_name
     FROM molds m
-    JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
-    JOIN mold_statuses ms ON m.current_status_id = ms.status_id
-    WHERE mft.type_name = %s AND ms.status_name = '闲置'
+    WHERE m.mold_functional_type_id = %s AND m.current_status_id = %s
     ORDER BY m.mold_code
     LIMIT %s
     """
     
     try:
-        return execute_query(query, (type_name, limit), fetch_all=True) or []
+        params = (lookup_id('mold_functional_types', type_name), lookup_id('mold_statuses', '闲置'), limit)
+        return execute_query(query, params, fetch_all=True) or []
     except:
         return []
\ No newline at end of file
@@ -0,0 +1,165 @@
+# utils/password_hashing.py - 在有界线程池中执行bcrypt计算
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# 新哈希使用的work factor；登录时发现已存哈希的cost与此不同则透明重算
+BCRYPT_ROUNDS = int(os.getenv('AUTH_BCRYPT_ROUNDS', '12'))
+# 同时进行bcrypt计算的线程数（bcrypt计算期间释放GIL，线程即可并行占用CPU核）
+HASH_WORKERS = int(os.getenv('AUTH_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+# 排队上限：超过时新请求在入队前等待，至多HASH_QUEUE_TIMEOUT秒
+HASH_MAX_PENDING = int(os.getenv('AUTH_HASH_MAX_PENDING', '64'))
+HASH_QUEUE_TIMEOUT = float(os.getenv('AUTH_HASH_QUEUE_TIMEOUT', '10'))
+
+class HashPoolBusy(RuntimeError):
+    """密码计算排队已满且等待超时"""
+
+class PasswordHashPool:
+    """
+    bcrypt计算的专用线程池
+
+    登录高峰时每次校验要占用100-300ms CPU，直接在脚本线程上执行会
+    挤占其他会话的重跑。这里限制并发计算数与排队数，并统计排队等待
+    与计算耗时，便于判断线程数是否合适。
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = {
+            'submitted': 0, 'completed': 0, 'rejected': 0, 'rehashes': 0,
+            'pending': 0, 'running': 0, 'max_pending': 0,
+            'total_wait_ms': 0.0, 'max_wait_ms': 0.0, 'total_work_ms': 0.0,
+        }
+
+    def _run(self, func: Callable, args: tuple, queued_at: float):
+        started = time.perf_counter()
+        with self._lock:
+            self._stats['pending'] -= 1
+            self._stats['running'] += 1
+            wait_ms = (started - queued_at) * 1000
+            self._stats['total_wait_ms'] += wait_ms
+            self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._stats['running'] -= 1
+                self._stats['completed'] += 1
+                self._stats['total_work_ms'] += (time.perf_counter() - started) * 1000
+            self._slots.release()
+
+    def submit(self, func: Callable, *args, timeout: float = HASH_QUEUE_TIMEOUT):
+        """提交计算，返回Future；排队已满且timeout内未腾出位置时抛出HashPoolBusy"""
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashPoolBusy(f"密码计算排队已满（{self.workers}线程）")
+        with self._lock:
+            self._stats['submitted'] += 1
+            self._stats['pending'] += 1
+            self._stats['max_pending'] = max(self._stats['max_pending'], self._stats['pending'])
+        try:
+            return self._executor.submit(self._run, func, args, time.perf_counter())
+        except Exception:
+            with self._lock:
+                self._stats['pending'] -= 1
+            self._slots.release()
+            raise
+
+    def count_rehash(self):
+        with self._lock:
+            self._stats['rehashes'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        completed = stats['completed'] or 1
+        return {
+            'workers': self.workers,
+            'submitted': stats['submitted'],
+            'completed': stats['completed'],
+            'pending': stats['pending'],
+            'running': stats['running'],
+            'max_pending': stats['max_pending'],
+            'rejected': stats['rejected'],
+            'rehashes': stats['rehashes'],
+            'avg_wait_ms': round(stats['total_wait_ms'] / completed, 2),
+            'max_wait_ms': round(stats['max_wait_ms'], 2),
+            'avg_work_ms': round(stats['total_work_ms'] / completed, 2),
+        }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> PasswordHashPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashPool()
+    return _pool
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(password: str, password_hash: str) -> bool:
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """生成bcrypt哈希（在线程池中计算，当前线程等待结果）"""
+    return _get_pool().submit(_hash, password, rounds).result()
+
+def verify_password(password: str, password_hash: str) -> bool:
+    """校验密码（在线程池中计算，当前线程等待结果）；哈希格式无效时返回False"""
+    try:
+        return _get_pool().submit(_check, password, password_hash).result()
+    except ValueError as e:
+        logger.warning(f"无效的密码哈希: {e}")
+        return False
+
+def hash_cost(password_hash: str) -> Optional[int]:
+    """解析 $2b$12$... 中的cost，格式不符时返回None"""
+    parts = password_hash.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(password_hash: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """已存哈希的cost与当前策略不同时需要重算"""
+    return hash_cost(password_hash) != rounds
+
+def rehash_in_background(password: str, on_hashed: Callable[[str], Any]):
+    """
+    按当前策略重算哈希，完成后在工作线程中调用on_hashed(new_hash)
+
+    用于登录成功后的透明升级，不增加本次登录的耗时；排队已满时放弃，
+    下次登录再试。
+    """
+    pool = _get_pool()
+
+    def work():
+        new_hash = _hash(password, BCRYPT_ROUNDS)
+        try:
+            on_hashed(new_hash)
+            pool.count_rehash()
+        except Exception as e:
+            logger.error(f"保存重算的密码哈希失败: {e}")
+
+    try:
+        pool.submit(work, timeout=0)
+    except HashPoolBusy:
+        logger.info("密码计算繁忙，跳过本次哈希升级")
+
+def get_password_hash_stats() -> Dict[str, Any]:
+    """获取密码计算线程池统计"""
+    return _get_pool().stats()
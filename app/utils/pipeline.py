@@ -0,0 +1,174 @@
+# utils/pipeline.py - 单次网络往返执行一组语句（psycopg 3 pipeline模式）
+import os
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Union, Tuple
+
+from utils.database import (
+    convert_numpy_types, run_in_transaction, register_external_writes,
+    RETRYABLE_PGCODES, UOW_MAX_RETRIES, POOL_TIMEOUT, _retry_delay
+)
+from utils.async_database import _get_conninfo_kwargs
+from utils.query_metrics import record_query, get_caller
+from utils.table_cache import extract_write_tables
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+    from psycopg.types.numeric import FloatLoader
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# 流水线连接池大小（psycopg 3同步连接，与psycopg2连接池相互独立）
+PIPELINE_POOL_MIN_CONN = int(os.getenv('DB_PIPELINE_POOL_MIN', '1'))
+PIPELINE_POOL_MAX_CONN = int(os.getenv('DB_PIPELINE_POOL_MAX', '5'))
+# 设为false时总是使用psycopg2顺序执行（用于对比或排查）
+PIPELINE_ENABLED = os.getenv('DB_PIPELINE', 'true') == 'true'
+
+StatementSpec = Union[str, Tuple, Dict[str, Any]]
+
+def _normalize_statement(spec: StatementSpec) -> Dict[str, Any]:
+    """
+    统一语句描述，结果形状与execute_query一致
+
+    支持三种写法：
+        "UPDATE ..."                                  -> 返回受影响行数
+        ("UPDATE ... %s", params)                     -> 返回受影响行数
+        {'query': ..., 'params': ..., 'fetch_one': True} / {'fetch_all': True}
+    """
+    if isinstance(spec, str):
+        return {'query': spec, 'params': None, 'fetch_one': False, 'fetch_all': False}
+    if isinstance(spec, tuple):
+        query, params = spec
+        return {'query': query, 'params': params, 'fetch_one': False, 'fetch_all': False}
+    return {
+        'query': spec['query'],
+        'params': spec.get('params'),
+        'fetch_one': spec.get('fetch_one', False),
+        'fetch_all': spec.get('fetch_all', False),
+    }
+
+def _configure_connection(conn):
+    """新建连接的会话设置：NUMERIC直接解析为float，与psycopg2连接的结果类型一致"""
+    conn.adapters.register_loader('numeric', FloatLoader)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> 'ConnectionPool':
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    kwargs={**_get_conninfo_kwargs(), 'row_factory': dict_row},
+                    min_size=PIPELINE_POOL_MIN_CONN,
+                    max_size=PIPELINE_POOL_MAX_CONN,
+                    timeout=POOL_TIMEOUT,
+                    configure=_configure_connection,
+                    name='pipeline-db',
+                    open=True,
+                )
+                logger.info(f"流水线连接池创建成功（{PIPELINE_POOL_MIN_CONN}-{PIPELINE_POOL_MAX_CONN}）")
+    return _pool
+
+def _collect(cursor, spec: Dict[str, Any]):
+    if spec['fetch_one']:
+        return cursor.fetchone()
+    if spec['fetch_all']:
+        return cursor.fetchall()
+    return cursor.rowcount
+
+def _run_pipelined(specs: List[Dict[str, Any]]) -> Tuple[List[Any], float]:
+    """BEGIN、全部语句与COMMIT一起发送，只等待一次服务端响应"""
+    pool = _get_pool()
+    wait_start = time.perf_counter()
+    with pool.connection() as conn:
+        pool_wait_ms = (time.perf_counter() - wait_start) * 1000
+        cursors = []
+        with conn.pipeline(), conn.transaction():
+            for spec in specs:
+                # psycopg 3不使用psycopg2的numpy适配器，参数在此转换
+                params = spec['params']
+                if isinstance(params, tuple):
+                    params = list(params)
+                cursor = conn.cursor()
+                cursor.execute(spec['query'], convert_numpy_types(params))
+                cursors.append(cursor)
+        # 退出pipeline块时所有结果均已接收
+        return [_collect(cursor, spec) for cursor, spec in zip(cursors, specs)], pool_wait_ms
+
+def _run_sequential(specs: List[Dict[str, Any]]) -> List[Any]:
+    """未安装psycopg 3时的退化实现：同一事务内顺序执行，语义相同但每条语句一次往返"""
+    def work(uow):
+        results = []
+        for spec in specs:
+            if spec['fetch_one']:
+                results.append(uow.fetch_one(spec['query'], spec['params']))
+            elif spec['fetch_all']:
+                results.append(uow.fetch_all(spec['query'], spec['params']))
+            else:
+                results.append(uow.execute(spec['query'], spec['params']))
+        return results
+    return run_in_transaction(work)
+
+def run_pipeline(statements: List[StatementSpec], max_retries: int = UOW_MAX_RETRIES) -> List[Any]:
+    """
+    在一个事务中执行一组互不依赖结果的语句，一次网络往返返回全部结果
+
+    适合"插入记录 + 更新状态"这类参数在发送前已确定的语句组；后一条语句
+    需要根据前一条的结果决定时，请使用run_in_transaction()。任一语句失败
+    则整个事务回滚并抛出异常。
+
+    Args:
+        statements: 语句描述列表（见 _normalize_statement）
+        max_retries: 序列化失败或死锁时的最大重放次数
+
+    Returns:
+        与statements一一对应的结果：fetch_one为dict或None，fetch_all为list[dict]，否则为受影响行数
+    """
+    specs = [_normalize_statement(spec) for spec in statements]
+    if not specs:
+        return []
+
+    if psycopg is None or not PIPELINE_ENABLED:
+        return _run_sequential(specs)
+
+    caller = get_caller()
+    batch_query = ';\n'.join(spec['query'] for spec in specs)
+    attempt = 0
+    while True:
+        attempt += 1
+        start = time.perf_counter()
+        pool_wait_ms = 0.0
+        rows = None
+        try:
+            results, pool_wait_ms = _run_pipelined(specs)
+            rows = sum(len(result) for result, spec in zip(results, specs) if spec['fetch_all'])
+            break
+        except psycopg.Error as e:
+            if e.sqlstate in RETRYABLE_PGCODES and attempt <= max_retries:
+                logger.warning(f"流水线事务冲突（{e.sqlstate}），第{attempt}次重试")
+            else:
+                logger.error(f"流水线执行失败: {e}")
+                raise
+        finally:
+            record_query(batch_query, (time.perf_counter() - start) * 1000, rows=rows,
+                         pool_wait_ms=pool_wait_ms, caller=caller, kind='pipeline')
+        time.sleep(_retry_delay(attempt))
+
+    written = set()
+    for spec in specs:
+        written |= extract_write_tables(spec['query'])
+    register_external_writes(written)
+    return results
+
+def get_pipeline_pool_stats() -> Dict[str, Any]:
+    """流水线连接池状态"""
+    if _pool is None:
+        return {'open': False, 'backend': 'psycopg3' if psycopg else 'sequential'}
+    return {'open': True, 'backend': 'psycopg3', **_pool.get_stats()}
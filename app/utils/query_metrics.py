@@ -0,0 +1,247 @@
+# utils/query_metrics.py - 查询耗时统计与慢查询日志
+import os
+import re
+import sys
+import time
+import logging
+import hashlib
+import threading
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 慢查询阈值（毫秒）与日志位置
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('DB_SLOW_QUERY_MS', '500'))
+SLOW_QUERY_LOG = os.getenv('DB_SLOW_QUERY_LOG', os.path.join('logs', 'slow_queries.log'))
+SLOW_QUERY_LOG_BYTES = int(os.getenv('DB_SLOW_QUERY_LOG_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv('DB_SLOW_QUERY_LOG_BACKUPS', '5'))
+
+# 每个查询指纹保留的最近样本数
+SAMPLES_PER_QUERY = 1000
+# 保留统计的查询指纹上限，超出时淘汰最久未出现的指纹（动态拼接的SQL会不断产生新指纹）
+MAX_QUERY_FINGERPRINTS = int(os.getenv('DB_MAX_QUERY_FINGERPRINTS', '500'))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+# 调用方识别时跳过的内部模块
+_INTERNAL_FILES = ('database.py', 'async_database.py', 'query_metrics.py', 'contextlib.py')
+
+_lock = threading.Lock()
+_query_samples = OrderedDict()      # 指纹 -> 统计，按最近出现排序
+_recent_samples = deque(maxlen=5000)  # (时间戳, 耗时ms, 指纹)
+_slow_queries = deque(maxlen=200)
+_slow_logger = None
+_cancel_counts = {}                 # (原因, 类别) -> 次数
+
+def fingerprint(query: str) -> str:
+    """归一化SQL：去掉字面量和多余空白，同类查询归为同一指纹"""
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER_LITERAL.sub('?', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+def fingerprint_id(normalized: str) -> str:
+    """指纹的短哈希，用于日志检索"""
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:12]
+
+def get_caller() -> str:
+    """定位发起查询的页面/函数（跳过数据库工具层）"""
+    frame = sys._getframe(1)
+    while frame:
+        filename = os.path.basename(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES:
+            return f"{os.path.splitext(filename)[0]}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+def _get_slow_logger() -> logging.Logger:
+    """惰性创建滚动慢查询日志"""
+    global _slow_logger
+    if _slow_logger is None:
+        slow_logger = logging.getLogger('slow_query')
+        slow_logger.propagate = False
+        try:
+            log_dir = os.path.dirname(SLOW_QUERY_LOG)
+            if log_dir:
+                os.makedirs(log_dir, exist_ok=True)
+            handler = RotatingFileHandler(
+                SLOW_QUERY_LOG,
+                maxBytes=SLOW_QUERY_LOG_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS,
+                encoding='utf-8'
+            )
+            handler.setFormatter(logging.Formatter('%(asctime)s\t%(message)s'))
+            slow_logger.addHandler(handler)
+        except OSError as e:
+            logger.error(f"无法创建慢查询日志 {SLOW_QUERY_LOG}: {e}")
+        _slow_logger = slow_logger
+    return _slow_logger
+
+def record_query(query: str, duration_ms: float, rows: Optional[int] = None,
+                 pool_wait_ms: float = 0.0, caller: Optional[str] = None,
+                 kind: str = 'query'):
+    """记录一次查询/事务的耗时"""
+    normalized = fingerprint(query)
+    caller = caller or get_caller()
+    now = time.time()
+
+    with _lock:
+        stats = _query_samples.get(normalized)
+        if stats is None:
+            stats = {
+                'id': fingerprint_id(normalized),
+                'kind': kind,
+                'count': 0,
+                'rows': 0,
+                'pool_wait_ms': 0.0,
+                'callers': set(),
+                'durations': deque(maxlen=SAMPLES_PER_QUERY),
+            }
+            _query_samples[normalized] = stats
+            while len(_query_samples) > MAX_QUERY_FINGERPRINTS:
+                _query_samples.popitem(last=False)
+        else:
+            _query_samples.move_to_end(normalized)
+        stats['count'] += 1
+        stats['rows'] += rows or 0
+        stats['pool_wait_ms'] += pool_wait_ms
+        stats['callers'].add(caller)
+        stats['durations'].append(duration_ms)
+        _recent_samples.append((now, duration_ms, stats['id']))
+
+    if duration_ms >= SLOW_QUERY_THRESHOLD_MS:
+        entry = {
+            'timestamp': now,
+            'id': fingerprint_id(normalized),
+            'kind': kind,
+            'caller': caller,
+            'duration_ms': round(duration_ms, 2),
+            'rows': rows,
+            'pool_wait_ms': round(pool_wait_ms, 2),
+            'query': normalized[:500],
+        }
+        with _lock:
+            _slow_queries.append(entry)
+        _get_slow_logger().warning(
+            f"{entry['duration_ms']}ms\t{kind}\t{caller}\trows={rows}\t"
+            f"pool_wait={entry['pool_wait_ms']}ms\t{entry['id']}\t{entry['query']}"
+        )
+
+@contextmanager
+def timed_block(kind: str, pool_wait_ms=None):
+    """
+    记录整个代码块（事务、连接占用）的耗时
+
+    Args:
+        kind: 块类型，如 transaction / connection
+        pool_wait_ms: 返回借出连接等待耗时的函数，块结束时调用
+    """
+    caller = get_caller()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        wait_ms = pool_wait_ms() if pool_wait_ms else 0.0
+        record_query(f"<{kind}> {caller}", duration_ms, pool_wait_ms=wait_ms,
+                     caller=caller, kind=kind)
+
+def _percentiles(durations) -> Dict[str, float]:
+    """计算p50/p95/p99"""
+    if not durations:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = np.fromiter(durations, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 2),
+        'p95': round(float(p95), 2),
+        'p99': round(float(p99), 2),
+        'max': round(float(values.max()), 2),
+    }
+
+def get_query_stats(kind: Optional[str] = None) -> List[Dict[str, Any]]:
+    """按查询指纹汇总耗时分位数，按p95降序"""
+    with _lock:
+        snapshot = [
+            (normalized, dict(stats, durations=list(stats['durations']), callers=sorted(stats['callers'])))
+            for normalized, stats in _query_samples.items()
+            if kind is None or stats['kind'] == kind
+        ]
+
+    results = []
+    for normalized, stats in snapshot:
+        count = stats['count']
+        results.append({
+            'id': stats['id'],
+            'kind': stats['kind'],
+            'query': normalized[:200],
+            'callers': ', '.join(stats['callers']),
+            'count': count,
+            'avg_rows': round(stats['rows'] / count, 1) if count else 0,
+            'avg_pool_wait_ms': round(stats['pool_wait_ms'] / count, 2) if count else 0.0,
+            **_percentiles(stats['durations']),
+        })
+    return sorted(results, key=lambda r: r['p95'], reverse=True)
+
+def get_overall_percentiles(since_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """全部查询的总体分位数，可限定最近N秒"""
+    cutoff = time.time() - since_seconds if since_seconds else 0
+    with _lock:
+        durations = [d for ts, d, _ in _recent_samples if ts >= cutoff]
+    result = _percentiles(durations)
+    result['count'] = len(durations)
+    return result
+
+def get_recent_samples(since_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """最近的耗时样本，用于趋势图"""
+    cutoff = time.time() - since_seconds if since_seconds else 0
+    with _lock:
+        return [
+            {'timestamp': ts, 'duration_ms': d, 'id': qid}
+            for ts, d, qid in _recent_samples if ts >= cutoff
+        ]
+
+def get_slow_queries(limit: int = 50) -> List[Dict[str, Any]]:
+    """最近的慢查询（内存中保留最近200条）"""
+    with _lock:
+        return list(_slow_queries)[-limit:][::-1]
+
+def record_cancel(reason: str, category: str):
+    """
+    记录一次被取消的查询
+
+    Args:
+        reason: timeout（语句超时）/ rerun（会话重跑）/ disconnect（会话断开）
+        category: 查询类别，如 interactive / report / batch
+    """
+    with _lock:
+        key = (reason, category)
+        _cancel_counts[key] = _cancel_counts.get(key, 0) + 1
+
+def get_cancel_stats() -> Dict[str, Any]:
+    """被取消查询的计数，按原因和类别汇总"""
+    with _lock:
+        counts = dict(_cancel_counts)
+    by_reason, by_category = {}, {}
+    for (reason, category), count in counts.items():
+        by_reason[reason] = by_reason.get(reason, 0) + count
+        by_category[category] = by_category.get(category, 0) + count
+    return {
+        'total': sum(counts.values()),
+        'by_reason': by_reason,
+        'by_category': by_category,
+    }
+
+def reset_query_stats():
+    """清空内存统计"""
+    with _lock:
+        _query_samples.clear()
+        _recent_samples.clear()
+        _slow_queries.clear()
+        _cancel_counts.clear()
@@ -0,0 +1,157 @@
+# utils/rate_limit.py - 跨会话、跨副本共享的登录限流（PostgreSQL令牌桶）
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.database import execute_query
+
+logger = logging.getLogger(__name__)
+
+# 每个用户名：最多连续尝试次数（桶容量），之后每分钟恢复的次数
+LOGIN_USER_BURST = float(os.getenv('AUTH_LOGIN_USER_BURST', '5'))
+LOGIN_USER_PER_MINUTE = float(os.getenv('AUTH_LOGIN_USER_PER_MINUTE', '1'))
+# 每个客户端IP：同一出口可能有多人登录，容量更大
+LOGIN_IP_BURST = float(os.getenv('AUTH_LOGIN_IP_BURST', '30'))
+LOGIN_IP_PER_MINUTE = float(os.getenv('AUTH_LOGIN_IP_PER_MINUTE', '10'))
+# 清理已回满的桶的间隔（秒）
+RATE_LIMIT_SWEEP_INTERVAL = float(os.getenv('AUTH_RATE_LIMIT_SWEEP_INTERVAL', '300'))
+RATE_LIMIT_ENABLED = os.getenv('AUTH_RATE_LIMIT', 'true') == 'true'
+
+# 一条语句完成"补充令牌 + 尝试取走一个"：按主键定位，行锁保证并发安全。
+# 令牌不足时不扣减，被拒绝的尝试不会无限延长锁定时间。
+TAKE_TOKEN_QUERY = """
+INSERT INTO login_rate_limits AS b (bucket_key, capacity, refill_per_sec, tokens, allowed, updated_at)
+SELECT v.bucket_key, v.capacity, v.refill_per_sec, v.capacity - 1, true, now()
+FROM (VALUES {values}) AS v (bucket_key, capacity, refill_per_sec)
+ON CONFLICT (bucket_key) DO UPDATE SET
+    capacity = EXCLUDED.capacity,
+    refill_per_sec = EXCLUDED.refill_per_sec,
+    tokens = CASE
+        WHEN LEAST(EXCLUDED.capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * EXCLUDED.refill_per_sec) >= 1
+        THEN LEAST(EXCLUDED.capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * EXCLUDED.refill_per_sec) - 1
+        ELSE LEAST(EXCLUDED.capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * EXCLUDED.refill_per_sec)
+    END,
+    allowed = LEAST(EXCLUDED.capacity, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * EXCLUDED.refill_per_sec) >= 1,
+    updated_at = now()
+RETURNING bucket_key, allowed, tokens, refill_per_sec
+"""
+
+# 已回满的桶与不存在的桶等价，可以删除
+SWEEP_QUERY = """
+DELETE FROM login_rate_limits
+WHERE tokens + EXTRACT(EPOCH FROM now() - updated_at) * refill_per_sec >= capacity
+"""
+
+_stats = {'checks': 0, 'limited': 0, 'errors': 0, 'swept': 0}
+_stats_lock = threading.Lock()
+
+def _count(key: str, amount: int = 1):
+    with _stats_lock:
+        _stats[key] += amount
+
+def _buckets(username: str, client_ip: Optional[str]) -> List[Tuple[str, float, float]]:
+    buckets = [(f"user:{username.strip().lower()}", LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE / 60)]
+    if client_ip:
+        buckets.append((f"ip:{client_ip}", LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60))
+    return buckets
+
+def check_login_allowed(username: str, client_ip: Optional[str] = None) -> Tuple[bool, Optional[float]]:
+    """
+    为一次登录尝试从用户名桶和IP桶各取一个令牌
+
+    在查询用户和bcrypt校验之前调用，只有一次按主键的写入。限流表
+    不可用时放行（记录错误），不因限流故障阻止登录。
+
+    Returns:
+        (是否放行, 被拒绝时建议的等待秒数；不会恢复的桶（refill为0）为None)
+    """
+    if not RATE_LIMIT_ENABLED:
+        return True, 0.0
+    _ensure_sweeper()
+    buckets = _buckets(username, client_ip)
+    query = TAKE_TOKEN_QUERY.format(
+        values=', '.join(['(%s::text, %s::double precision, %s::double precision)'] * len(buckets))
+    )
+    params = [value for bucket in buckets for value in bucket]
+    _count('checks')
+    try:
+        rows = execute_query(query, params=params, fetch_all=True, commit=True)
+    except Exception as e:
+        _count('errors')
+        logger.error(f"登录限流检查失败，本次放行: {e}")
+        return True, 0.0
+
+    denied = [row for row in rows if not row['allowed']]
+    if not denied:
+        return True, 0.0
+    _count('limited')
+    # 恢复速率配置为0的桶不会回满，视为锁定
+    if any(row['refill_per_sec'] <= 0 for row in denied):
+        retry_after = None
+    else:
+        retry_after = max((1 - row['tokens']) / row['refill_per_sec'] for row in denied)
+    keys = ', '.join(row['bucket_key'] for row in denied)
+    if retry_after is None:
+        logger.warning(f"登录限流: {keys}，已锁定")
+    else:
+        logger.warning(f"登录限流: {keys}，{retry_after:.0f}s后可重试")
+    return False, retry_after
+
+def refund_login_attempt(username: str, client_ip: Optional[str] = None):
+    """
+    退还check_login_allowed取走的令牌（尝试未实际校验密码时，如线程池繁忙）
+
+    失败只记录错误：少退一个令牌只是让限流略严，不影响登录流程。
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    keys = [key for key, _, _ in _buckets(username, client_ip)]
+    try:
+        execute_query(
+            "UPDATE login_rate_limits SET tokens = LEAST(capacity, tokens + 1) WHERE bucket_key = ANY(%s)",
+            params=(keys,), commit=True
+        )
+    except Exception as e:
+        _count('errors')
+        logger.error(f"退还登录限流令牌失败: {e}")
+
+class RateLimitSweeper(threading.Thread):
+    """定期删除已回满的令牌桶（每进程一个，多个副本同时清理也无妨）"""
+
+    def __init__(self, interval: float = RATE_LIMIT_SWEEP_INTERVAL):
+        super().__init__(name='rate-limit-sweeper', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        """请求线程退出"""
+        self._stop_event.set()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                removed = execute_query(SWEEP_QUERY, commit=True)
+                _count('swept', removed or 0)
+                if removed:
+                    logger.debug(f"清理登录限流桶 {removed} 个")
+            except Exception as e:
+                logger.warning(f"清理登录限流桶失败: {e}")
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+def _ensure_sweeper():
+    global _sweeper
+    if _sweeper is None or not _sweeper.is_alive():
+        with _sweeper_lock:
+            if _sweeper is None or not _sweeper.is_alive():
+                _sweeper = RateLimitSweeper()
+                _sweeper.start()
+
+def get_rate_limit_stats() -> Dict[str, Any]:
+    """获取登录限流统计（本进程）"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['sweeper_running'] = _sweeper is not None and _sweeper.is_alive()
+    return stats
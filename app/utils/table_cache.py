@@ -0,0 +1,151 @@
+# utils/table_cache.py - 按数据表失效的查询结果缓存
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+# 读表：FROM / JOIN 后的表名
+_READ_TABLE_PATTERN = re.compile(r'\b(?:FROM|JOIN)\s+(?:ONLY\s+)?([A-Za-z_][\w.]*)', re.IGNORECASE)
+# 写表：INSERT / UPDATE / DELETE / TRUNCATE 的目标表
+_WRITE_TABLE_PATTERN = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?)\s+(?:ONLY\s+)?([A-Za-z_][\w.]*)',
+    re.IGNORECASE
+)
+# 紧跟在上述关键字后但并非表名的词（ON CONFLICT DO UPDATE SET、FOR UPDATE OF/NOWAIT 等）
+_NON_TABLE_WORDS = {'set', 'of', 'nowait', 'skip', 'select', 'lateral', 'unnest', 'generate_series'}
+
+# 视图依赖的基础表，写基础表时同时失效读视图的缓存
+VIEW_DEPENDENCIES = {
+    'v_mold_status_overview': {'molds', 'mold_functional_types', 'mold_statuses', 'storage_locations'},
+    'v_mold_cost_summary': {'molds', 'cost_records', 'mold_maintenance_logs'},
+}
+
+def _normalize_table(name: str) -> str:
+    """去掉schema前缀并统一小写"""
+    name = name.lower().strip('"')
+    if name.startswith('public.'):
+        name = name[len('public.'):]
+    return name
+
+def _extract(pattern, query: str) -> Set[str]:
+    tables = set()
+    for match in pattern.findall(query):
+        table = _normalize_table(match)
+        if table not in _NON_TABLE_WORDS:
+            tables.add(table)
+    return tables
+
+def extract_read_tables(query: str) -> Set[str]:
+    """解析查询读取的表（视图展开为其基础表）"""
+    tables = _extract(_READ_TABLE_PATTERN, query)
+    for view, base_tables in VIEW_DEPENDENCIES.items():
+        if view in tables:
+            tables |= base_tables
+    return tables
+
+def extract_write_tables(query: str) -> Set[str]:
+    """解析语句写入的表"""
+    return _extract(_WRITE_TABLE_PATTERN, query)
+
+class TableCache:
+    """
+    以读取的数据表为依赖的结果缓存
+
+    条目默认永不过期，只在其依赖的表被写入时失效；超过容量按LRU淘汰。
+    每张表维护失效代数：查询前取snapshot()，写入时代数已变则放弃写入，
+    避免查询期间发生的失效被随后写入的旧结果覆盖。
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (value, tables, expires_at)
+        self._by_table = {}            # table -> set(key)
+        self._generations = {}         # table -> 失效次数
+        self._epoch = 0                # clear() 次数
+        self._stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'stale_fills': 0}
+
+    def snapshot(self, tables: Iterable[str]) -> Tuple[int, Dict[str, int]]:
+        """查询前记录依赖表的失效代数，传给put()"""
+        with self._lock:
+            return self._epoch, {
+                table: self._generations.get(table, 0) for table in {_normalize_table(t) for t in tables}
+            }
+
+    def get(self, key) -> Tuple[bool, Any]:
+        """返回 (是否命中, 缓存值)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return True, value
+                self._remove(key)
+            self._stats['misses'] += 1
+            return False, None
+
+    def put(self, key, value, tables: Iterable[str], ttl: Optional[float] = None,
+            snapshot: Optional[Tuple[int, Dict[str, int]]] = None) -> bool:
+        """写入缓存并登记依赖表；snapshot之后依赖表发生过失效时不写入，返回False"""
+        tables = frozenset(_normalize_table(t) for t in tables)
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if snapshot is not None:
+                epoch, generations = snapshot
+                if epoch != self._epoch or any(
+                    self._generations.get(table, 0) != generation for table, generation in generations.items()
+                ):
+                    self._stats['stale_fills'] += 1
+                    return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tables, expires_at)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+        return True
+
+    def _remove(self, key):
+        value, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate(self, tables: Iterable[str]) -> int:
+        """失效读取了指定表的全部条目，返回失效数量"""
+        removed = 0
+        with self._lock:
+            for table in {_normalize_table(t) for t in tables}:
+                self._generations[table] = self._generations.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+            self._stats['invalidations'] += removed
+        return removed
+
+    def clear(self):
+        """清空全部条目"""
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._epoch += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中率与各表的缓存条目数"""
+        with self._lock:
+            total = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'hit_rate': round(self._stats['hits'] / total, 4) if total else 0.0,
+                'tables': {table: len(keys) for table, keys in self._by_table.items()},
+            }
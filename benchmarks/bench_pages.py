@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+页面查询基准：按页面重放主要查询，报告每条查询在各数据规模下的延迟分位数
+
+用法:
+    POSTGRES_PASSWORD=... python benchmarks/bench_pages.py                      # 当前库数据
+    POSTGRES_PASSWORD=... python benchmarks/bench_pages.py --generate --scales 0.01 0.1 1
+    POSTGRES_PASSWORD=... python benchmarks/bench_pages.py --only 借用管理 维修管理
+
+--generate 在每个规模前调用 generate_data.generate(scale, truncate=True) 重建数据，
+只应在压测库上使用。能复用应用接口的查询直接调用 utils 中的函数；页面模块导入即
+渲染界面，其中的SQL在此保留副本，修改页面查询时需同步更新 PAGE_QUERIES。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+# 与 alembic/env.py 相同：把 app 目录加入搜索路径，以便导入 utils.database
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+# 基准只测量查询延迟，不需要缓存失效监听线程
+os.environ.setdefault('DB_CACHE_LISTENER', 'false')
+
+from utils.database import (  # noqa: E402
+    execute_query, query_frame, fetch_keyset_page, lookup_id, lookup_ids, MOLD_LIST_QUERY
+)
+from utils.mold_search import perform_mold_search, get_popular_molds  # noqa: E402
+from utils.auth import get_all_users  # noqa: E402
+
+# pages/2_借用管理.py view_loan_applications
+LOAN_LIST_QUERY = """
+SELECT
+    mlr.loan_id, m.mold_code, m.mold_name, u_applicant.full_name AS applicant_name,
+    mlr.application_timestamp, mlr.expected_return_timestamp, mlr.loan_out_timestamp,
+    mlr.actual_return_timestamp, COALESCE(mlr.destination_equipment, '') as destination_equipment,
+    ls.status_name AS loan_status, mlr.loan_status_id,
+    COALESCE(u_approver.full_name, '') AS approver_name, COALESCE(mlr.remarks, '') as remarks, m.mold_id
+FROM mold_loan_records mlr
+JOIN molds m ON mlr.mold_id = m.mold_id
+JOIN users u_applicant ON mlr.applicant_id = u_applicant.user_id
+JOIN loan_statuses ls ON mlr.loan_status_id = ls.status_id
+LEFT JOIN users u_approver ON mlr.approver_id = u_approver.user_id
+"""
+
+LOAN_COUNT_QUERY = """
+SELECT ls.status_name, COUNT(*) AS count
+FROM mold_loan_records mlr
+JOIN loan_statuses ls ON mlr.loan_status_id = ls.status_id
+GROUP BY ls.status_name
+"""
+
+# pages/3_维修管理.py get_molds_needing_maintenance / show_maintenance_statistics
+MAINTENANCE_NEEDED_QUERY = """
+SELECT m.mold_id, m.mold_code, m.mold_name, m.accumulated_strokes, m.maintenance_cycle_strokes,
+       mft.type_name as functional_type, ms.status_name as current_status, sl.location_name as current_location
+FROM molds m
+LEFT JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
+LEFT JOIN mold_statuses ms ON m.current_status_id = ms.status_id
+LEFT JOIN storage_locations sl ON m.current_location_id = sl.location_id
+WHERE
+    (m.maintenance_cycle_strokes > 0 AND m.accumulated_strokes >= m.maintenance_cycle_strokes)
+    OR m.current_status_id = ANY(%s)
+    OR (m.theoretical_lifespan_strokes > 0 AND m.accumulated_strokes >= m.theoretical_lifespan_strokes * 0.9)
+ORDER BY CASE WHEN m.current_status_id = ANY(%s) THEN 1 ELSE 2 END, m.mold_code
+"""
+
+MAINTENANCE_STATS_QUERY = """
+SELECT
+    COUNT(*) as total_records,
+    COUNT(CASE WHEN maintenance_end_timestamp IS NOT NULL THEN 1 END) as completed_records,
+    COUNT(CASE WHEN mt.is_repair = true THEN 1 END) as repair_records,
+    COALESCE(SUM(maintenance_cost), 0) as total_cost,
+    COALESCE(AVG(maintenance_cost), 0) as avg_cost
+FROM mold_maintenance_logs mml
+JOIN maintenance_types mt ON mml.maintenance_type_id = mt.type_id
+WHERE mml.maintenance_start_timestamp BETWEEN %s AND %s
+"""
+
+MAINTENANCE_TYPE_STATS_QUERY = """
+SELECT mt.type_name, mt.is_repair, COUNT(*) as record_count,
+       COALESCE(SUM(mml.maintenance_cost), 0) as total_cost, COALESCE(AVG(mml.maintenance_cost), 0) as avg_cost
+FROM mold_maintenance_logs mml
+JOIN maintenance_types mt ON mml.maintenance_type_id = mt.type_id
+WHERE mml.maintenance_start_timestamp BETWEEN %s AND %s
+GROUP BY mt.type_id, mt.type_name, mt.is_repair
+ORDER BY record_count DESC
+"""
+
+MAINTENANCE_TREND_QUERY = """
+SELECT DATE_TRUNC('month', mml.maintenance_start_timestamp) as month, COUNT(*) as record_count,
+       COALESCE(SUM(mml.maintenance_cost), 0) as total_cost
+FROM mold_maintenance_logs mml
+JOIN maintenance_types mt ON mml.maintenance_type_id = mt.type_id
+WHERE mml.maintenance_start_timestamp >= %s - INTERVAL '6 months'
+GROUP BY DATE_TRUNC('month', mml.maintenance_start_timestamp)
+ORDER BY month
+"""
+
+# pages/8_生产排程.py
+SCHEDULE_LIST_QUERY = """
+SELECT ps.schedule_id, ps.scheduled_start, ps.scheduled_end, ps.status, po.order_code, po.quantity,
+       p.product_name, m.mold_code, m.mold_name, e.equipment_code, u.full_name as operator_name
+FROM production_schedules ps
+JOIN production_orders po ON ps.order_id = po.order_id
+JOIN products p ON po.product_id = p.product_id
+JOIN molds m ON ps.mold_id = m.mold_id
+JOIN production_equipment e ON ps.equipment_id = e.equipment_id
+JOIN users u ON ps.operator_id = u.user_id
+WHERE DATE(ps.scheduled_start) BETWEEN %s AND %s
+ORDER BY ps.scheduled_start
+"""
+
+PENDING_ORDERS_QUERY = """
+SELECT po.order_id, po.order_code, po.quantity, po.due_date, po.priority, p.product_name,
+       COALESCE(SUM(ps.quantity), 0) as scheduled_quantity
+FROM production_orders po
+JOIN products p ON po.product_id = p.product_id
+LEFT JOIN production_schedules ps ON po.order_id = ps.order_id
+WHERE po.status = '待排程' OR po.status = '部分排程'
+GROUP BY po.order_id, po.order_code, po.quantity, po.due_date, po.priority, p.product_name
+HAVING po.quantity > COALESCE(SUM(ps.quantity), 0)
+ORDER BY po.priority DESC, po.due_date
+"""
+
+# pages/7_成本分析.py load_cost_analysis_data
+COST_TREND_QUERY = """
+SELECT DATE_TRUNC('day', cost_date) as date,
+       SUM(CASE WHEN cost_type = '维修成本' THEN amount ELSE 0 END) as maintenance_cost,
+       SUM(CASE WHEN cost_type = '停机损失' THEN amount ELSE 0 END) as downtime_cost,
+       SUM(amount) as total_cost
+FROM cost_records
+WHERE cost_date BETWEEN %s AND %s
+GROUP BY DATE_TRUNC('day', cost_date)
+ORDER BY date
+"""
+
+COST_COMPOSITION_QUERY = """
+SELECT cost_type, SUM(amount) as total_amount
+FROM cost_records
+WHERE cost_date BETWEEN %s AND %s
+GROUP BY cost_type
+"""
+
+COST_SUMMARY_QUERY = "SELECT * FROM v_mold_cost_summary ORDER BY total_cost DESC LIMIT 20"
+
+# pages/6_模具推荐.py
+RECOMMENDATION_QUERY = """
+WITH mold_scores AS (
+    SELECT m.mold_id, m.mold_code, m.mold_name, ms.status_name as status,
+        CASE WHEN ms.status_name = '闲置' THEN 100
+             WHEN ms.status_name IN ('已预定', '外借申请中') THEN 50 ELSE 0 END as availability_score,
+        CASE WHEN m.theoretical_lifespan_strokes > 0
+             THEN LEAST(100, (m.theoretical_lifespan_strokes - m.accumulated_strokes) * 100.0 / m.theoretical_lifespan_strokes)
+             ELSE 80 END as life_score
+    FROM molds m
+    JOIN mold_functional_types mft ON m.mold_functional_type_id = mft.type_id
+    JOIN mold_statuses ms ON m.current_status_id = ms.status_id
+    LEFT JOIN storage_locations sl ON m.current_location_id = sl.location_id
+    WHERE ms.status_name NOT IN ('报废', '维修中')
+)
+SELECT *, (availability_score * 0.3 + life_score * 0.25) as score
+FROM mold_scores
+WHERE availability_score > 0
+ORDER BY score DESC
+LIMIT 5
+"""
+
+# main.py 首页
+OVERVIEW_STATUS_QUERY = """
+SELECT ms.status_name, COUNT(m.mold_id) as count
+FROM mold_statuses ms
+LEFT JOIN molds m ON ms.status_id = m.current_status_id
+GROUP BY ms.status_id, ms.status_name
+ORDER BY count DESC
+"""
+
+MONTHLY_ACTIVITY_QUERY = """
+SELECT
+    COUNT(CASE WHEN action_type = 'LOGIN' THEN 1 END) as logins,
+    COUNT(CASE WHEN action_type LIKE 'CREATE%%' THEN 1 END) as creations,
+    COUNT(CASE WHEN action_type LIKE '%%LOAN%%' THEN 1 END) as loan_actions
+FROM system_logs
+WHERE timestamp >= DATE_TRUNC('month', CURRENT_DATE)
+"""
+
+
+def build_cases():
+    """页面 -> [(查询名, 可调用对象)]；参数按页面默认筛选条件（近30天等）构造"""
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    start_dt = datetime.combine(month_ago, datetime.min.time())
+    end_dt = datetime.combine(today, datetime.max.time())
+    waiting_ids = lookup_ids('mold_statuses', ('待维修', '待保养'))
+    pending_loan_id = lookup_id('loan_statuses', '待审批')
+
+    def rows(sql, params=None):
+        return lambda: execute_query(sql, params, fetch_all=True)
+
+    def loan_page(status_id=None):
+        if status_id is None:
+            return lambda: fetch_keyset_page(LOAN_LIST_QUERY, ('application_timestamp', 'loan_id'))['rows']
+        return lambda: fetch_keyset_page(
+            LOAN_LIST_QUERY + " WHERE mlr.loan_status_id = %s", ('application_timestamp', 'loan_id'),
+            params=[status_id]
+        )['rows']
+
+    return {
+        '首页': [
+            ('状态分布', rows(OVERVIEW_STATUS_QUERY)),
+            ('本月活动', rows(MONTHLY_ACTIVITY_QUERY)),
+        ],
+        '模具管理': [
+            ('模具列表首页', lambda: fetch_keyset_page(MOLD_LIST_QUERY, ('created_at', 'mold_id'))['rows']),
+        ],
+        '模具搜索': [
+            ('关键词搜索', lambda: perform_mold_search('00', only_available=True)),
+            ('热门模具', lambda: get_popular_molds(8)),
+        ],
+        '借用管理': [
+            ('申请列表首页', loan_page()),
+            ('待审批筛选', loan_page(pending_loan_id)),
+            ('状态统计', rows(LOAN_COUNT_QUERY)),
+        ],
+        '维修管理': [
+            ('待维修模具', rows(MAINTENANCE_NEEDED_QUERY, (waiting_ids, waiting_ids))),
+            ('30天统计', rows(MAINTENANCE_STATS_QUERY, (start_dt, end_dt))),
+            ('按类型统计', lambda: query_frame(MAINTENANCE_TYPE_STATS_QUERY, params=(start_dt, end_dt))),
+            ('月度趋势', lambda: query_frame(MAINTENANCE_TREND_QUERY, params=(start_dt,))),
+        ],
+        '生产排程': [
+            ('排程列表', rows(SCHEDULE_LIST_QUERY, (month_ago, today + timedelta(days=30)))),
+            ('待排程订单', rows(PENDING_ORDERS_QUERY)),
+        ],
+        '成本分析': [
+            ('成本趋势', rows(COST_TREND_QUERY, (month_ago, today))),
+            ('成本构成', rows(COST_COMPOSITION_QUERY, (month_ago, today))),
+            ('模具成本汇总', rows(COST_SUMMARY_QUERY)),
+        ],
+        '模具推荐': [
+            ('评分推荐', rows(RECOMMENDATION_QUERY)),
+        ],
+        '系统管理': [
+            ('用户列表', lambda: get_all_users(limit=100)),
+        ],
+    }
+
+
+def percentile(sorted_samples, pct: float) -> float:
+    """最近秩分位数"""
+    index = max(0, min(len(sorted_samples) - 1, int(round(pct / 100 * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+def run_case(func, repeat: int):
+    """返回 (行数, 样本列表ms) ；执行失败时抛出异常"""
+    result = func()  # 预热：填充计划缓存与共享缓冲区
+    count = len(result) if result is not None else 0
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return count, sorted(samples)
+
+
+def run_suite(label: str, repeat: int, only=None) -> dict:
+    """执行全部用例并打印结果，返回 (页面, 查询名) -> p95"""
+    print(f"\n=== {label} ===")
+    print(f"{'页面/查询':<28}{'行数':>8}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    summary = {}
+    for page, cases in build_cases().items():
+        if only and page not in only:
+            continue
+        for name, func in cases:
+            key = f"{page}/{name}"
+            try:
+                count, samples = run_case(func, repeat)
+            except Exception as e:
+                print(f"{key:<28}{'失败':>8}  {str(e).splitlines()[0]}")
+                summary[key] = None
+                continue
+            p95 = percentile(samples, 95)
+            summary[key] = p95
+            print(f"{key:<28}{count:>8}{statistics.median(samples):>10.2f}{p95:>10.2f}"
+                  f"{percentile(samples, 99):>10.2f}{samples[-1]:>10.2f}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="页面查询延迟基准测试")
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--generate', action='store_true', help='每个规模前重建合成数据（清空业务表）')
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.01, 0.1, 1.0])
+    parser.add_argument('--only', nargs='+', help='只测指定页面')
+    args = parser.parse_args()
+
+    if not args.generate:
+        run_suite('当前数据', args.repeat, args.only)
+        return
+
+    from generate_data import generate
+
+    results = {}
+    for scale in args.scales:
+        generate(scale, truncate=True)
+        results[scale] = run_suite(f"规模因子 {scale:g}", args.repeat, args.only)
+
+    # 汇总：各查询p95随规模的变化
+    print(f"\n{'p95(ms)':<28}" + ''.join(f"{f'x{scale:g}':>10}" for scale in args.scales))
+    for key in results[args.scales[0]]:
+        cells = []
+        for scale in args.scales:
+            value = results[scale].get(key)
+            cells.append(f"{'失败':>10}" if value is None else f"{value:>10.2f}")
+        print(f"{key:<28}" + ''.join(cells))
+
+
+if __name__ == '__main__':
+    main()
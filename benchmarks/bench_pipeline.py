@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+多语句往返延迟基准：逐条 execute_query / 单事务顺序执行 / psycopg 3 流水线
+
+用法:
+    POSTGRES_PASSWORD=... python benchmarks/bench_pipeline.py [--delay-ms 5] [--statements 2 4 6]
+
+基准在本机起一个TCP转发代理，每个方向的数据都延迟 --delay-ms 的一半，
+模拟应用与数据库之间的网络往返（RTT = --delay-ms），连接都经由该代理。
+也可以用 --delay-ms 0 并在数据库所在机器上用 netem 注入延迟，例如:
+    tc qdisc add dev lo root netem delay 2.5ms
+未安装psycopg 3时流水线一项退化为顺序执行，会在输出中注明。
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+# 与 alembic/env.py 相同：把 app 目录加入搜索路径，以便导入 utils.database
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+# 基准只测量语句往返，不需要缓存失效监听线程
+os.environ.setdefault('DB_CACHE_LISTENER', 'false')
+
+QUERY = "SELECT %s::int AS v"
+
+
+class DelayProxy:
+    """在本机端口与数据库之间转发TCP数据，每个方向延迟 one_way_ms"""
+
+    def __init__(self, target_host: str, target_port: int, one_way_ms: float):
+        self.target = (target_host, target_port)
+        self.delay = one_way_ms / 1000
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(64)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.server.accept()
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._pipe, args=(client, upstream), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, client), daemon=True).start()
+
+    def _pipe(self, src, dst):
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                if self.delay:
+                    time.sleep(self.delay)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (src, dst):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+def measure(func, repeat: int) -> float:
+    """返回中位耗时（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多语句往返延迟基准测试")
+    parser.add_argument('--delay-ms', type=float, default=5.0, help='模拟的网络往返时间（毫秒）')
+    parser.add_argument('--statements', type=int, nargs='+', default=[2, 4, 6])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.delay_ms > 0:
+        proxy = DelayProxy(
+            os.getenv('POSTGRES_HOST', 'localhost'),
+            int(os.getenv('POSTGRES_PORT', '5432')),
+            args.delay_ms / 2
+        )
+        os.environ['POSTGRES_HOST'] = '127.0.0.1'
+        os.environ['POSTGRES_PORT'] = str(proxy.port)
+
+    from utils.database import execute_query, run_in_transaction
+    from utils.pipeline import run_pipeline, psycopg
+
+    def one_by_one(n):
+        for i in range(n):
+            execute_query(QUERY, (i,), fetch_one=True)
+
+    def single_transaction(n):
+        run_in_transaction(lambda uow: [uow.fetch_one(QUERY, (i,)) for i in range(n)])
+
+    def pipelined(n):
+        run_pipeline([{'query': QUERY, 'params': (i,), 'fetch_one': True} for i in range(n)])
+
+    # 预热各连接池，避免把建连耗时计入
+    one_by_one(1)
+    single_transaction(1)
+    pipelined(1)
+
+    backend = '流水线' if psycopg else '流水线(未安装psycopg 3，顺序执行)'
+    print(f"RTT {args.delay_ms:g} ms，每项取 {args.repeat} 次中位数")
+    print(f"{'语句数':>6} {'逐条(ms)':>10} {'单事务(ms)':>12} {backend + '(ms)':>14} {'≈往返次数':>12}")
+    for n in args.statements:
+        sequential = measure(lambda: one_by_one(n), args.repeat)
+        transaction = measure(lambda: single_transaction(n), args.repeat)
+        pipeline = measure(lambda: pipelined(n), args.repeat)
+        round_trips = (
+            f"{sequential / args.delay_ms:.0f}/{transaction / args.delay_ms:.0f}/{pipeline / args.delay_ms:.0f}"
+            if args.delay_ms else '-'
+        )
+        print(f"{n:>6} {sequential:>10.2f} {transaction:>12.2f} {pipeline:>14.2f} {round_trips:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+query_frame 与 execute_query + pd.DataFrame 的取数性能对比
+
+用法:
+    POSTGRES_PASSWORD=... python benchmarks/bench_query_frame.py [--rows 10000 100000 1000000]
+
+数据由 generate_series 在服务端生成，不依赖业务表，可在任意库上运行。
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+# 与 alembic/env.py 相同：把 app 目录加入搜索路径，以便导入 utils.database
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.database import execute_query, query_frame  # noqa: E402
+
+BENCH_QUERY = """
+SELECT
+    g AS mold_id,
+    'LM' || LPAD(g::text, 7, '0') AS mold_code,
+    (g % 97)::numeric(10, 2) * 13.57 AS maintenance_cost,
+    (g * 37) % 500000 AS accumulated_strokes,
+    NOW() - (g % 10000) * INTERVAL '1 minute' AS created_at,
+    (g % 3 = 0) AS is_repair
+FROM generate_series(1, %s) AS g
+"""
+
+
+def legacy_frame(rows: int) -> pd.DataFrame:
+    """当前页面写法：字典列表 -> DataFrame"""
+    results = execute_query(BENCH_QUERY, params=(rows,), fetch_all=True)
+    return pd.DataFrame(results)
+
+
+def columnar_frame(rows: int) -> pd.DataFrame:
+    """新接口：元组游标 + 列式构建"""
+    return query_frame(BENCH_QUERY, params=(rows,))
+
+
+def measure(func, rows: int, repeat: int):
+    """返回 (最佳耗时秒, 峰值内存MB)"""
+    best = float('inf')
+    peak_mb = 0.0
+    for _ in range(repeat):
+        tracemalloc.start()
+        start = time.perf_counter()
+        df = func(rows)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert len(df) == rows, f"行数不符: {len(df)} != {rows}"
+        best = min(best, elapsed)
+        peak_mb = max(peak_mb, peak / 1024 / 1024)
+        del df
+    return best, peak_mb
+
+
+def main():
+    parser = argparse.ArgumentParser(description="query_frame 取数基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} | {'方式':<28} | {'耗时(s)':>9} | {'峰值内存(MB)':>12} | {'行/秒':>12}")
+    print("-" * 84)
+    for rows in args.rows:
+        for name, func in (("execute_query + DataFrame", legacy_frame),
+                           ("query_frame", columnar_frame)):
+            elapsed, peak_mb = measure(func, rows, args.repeat)
+            print(f"{rows:>10,} | {name:<28} | {elapsed:>9.3f} | {peak_mb:>12.1f} | {rows / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+结果类型转换基准：Decimal解析 + convert_numpy_types 递归 vs 连接级NUMERIC->float解析器
+
+用法:
+    python benchmarks/bench_result_types.py [--rows 1000 10000 100000]
+    POSTGRES_PASSWORD=... python benchmarks/bench_result_types.py --live
+
+默认只测客户端结果路径：直接调用psycopg2解析器处理libpq文本值，
+再构造与RealDictCursor相同形状的行字典，不需要数据库。
+--live 额外在真实连接上对比同一查询的端到端耗时。
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+import psycopg2.extensions
+
+# 与 alembic/env.py 相同：把 app 目录加入搜索路径，以便导入 utils.database
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.database import NUMERIC_AS_FLOAT, convert_numpy_types  # noqa: E402
+
+COLUMNS = ['mold_id', 'mold_code', 'maintenance_cost', 'downtime_cost', 'total_cost', 'cost_per_use']
+NUMERIC_COLUMNS = {'maintenance_cost', 'downtime_cost', 'total_cost', 'cost_per_use'}
+
+LIVE_QUERY = """
+SELECT
+    g AS mold_id,
+    'LM' || LPAD(g::text, 7, '0') AS mold_code,
+    (g % 97)::numeric(10, 2) * 13.57 AS maintenance_cost,
+    (g % 31)::numeric(10, 2) * 7.25 AS downtime_cost,
+    (g % 89)::numeric(12, 2) * 21.5 AS total_cost,
+    (g % 13)::numeric(10, 4) / 7 AS cost_per_use
+FROM generate_series(1, %s) AS g
+"""
+
+
+def make_raw_rows(rows: int):
+    """模拟libpq返回的文本值"""
+    return [
+        (str(i), f"LM{i:07d}", f"{(i % 97) * 13.57:.2f}", f"{(i % 31) * 7.25:.2f}",
+         f"{(i % 89) * 21.5:.2f}", f"{(i % 13) / 7:.4f}")
+        for i in range(1, rows + 1)
+    ]
+
+
+def legacy_path(raw_rows):
+    """旧路径：NUMERIC解析为Decimal，构造行字典后再递归转换为float"""
+    decimal = psycopg2.extensions.DECIMAL
+    result = []
+    for raw in raw_rows:
+        result.append({
+            col: decimal(value, None) if col in NUMERIC_COLUMNS else value
+            for col, value in zip(COLUMNS, raw)
+        })
+    return convert_numpy_types(result)
+
+
+def typed_path(raw_rows):
+    """新路径：解析器直接产出float，行字典即最终结果"""
+    result = []
+    for raw in raw_rows:
+        result.append({
+            col: NUMERIC_AS_FLOAT(value, None) if col in NUMERIC_COLUMNS else value
+            for col, value in zip(COLUMNS, raw)
+        })
+    return result
+
+
+def best_of(func, arg, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_live(rows: int, repeat: int):
+    """真实连接上对比：游标级Decimal + 递归转换 vs 连接默认解析器"""
+    from utils.database import get_connection, return_connection
+
+    def legacy(n):
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                psycopg2.extensions.register_type(psycopg2.extensions.DECIMAL, cursor)
+                cursor.execute(LIVE_QUERY, (n,))
+                convert_numpy_types([dict(row) for row in cursor.fetchall()])
+            conn.rollback()
+        finally:
+            return_connection(conn)
+
+    def typed(n):
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(LIVE_QUERY, (n,))
+                [dict(row) for row in cursor.fetchall()]
+            conn.rollback()
+        finally:
+            return_connection(conn)
+
+    return best_of(legacy, rows, repeat), best_of(typed, rows, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结果类型转换基准测试")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--live', action='store_true', help='同时在真实数据库上测量')
+    args = parser.parse_args()
+
+    print(f"{'行数':>10} {'旧路径(ms)':>12} {'新路径(ms)':>12} {'加速':>8}")
+    for rows in args.rows:
+        raw_rows = make_raw_rows(rows)
+        assert legacy_path(raw_rows[:10]) == typed_path(raw_rows[:10])
+        legacy = best_of(legacy_path, raw_rows, args.repeat)
+        typed = best_of(typed_path, raw_rows, args.repeat)
+        print(f"{rows:>10} {legacy * 1000:>12.2f} {typed * 1000:>12.2f} {legacy / typed:>7.2f}x")
+
+    if args.live:
+        print("\n端到端（含网络与libpq解析）")
+        print(f"{'行数':>10} {'旧路径(ms)':>12} {'新路径(ms)':>12} {'加速':>8}")
+        for rows in args.rows:
+            legacy, typed = run_live(rows, args.repeat)
+            print(f"{rows:>10} {legacy * 1000:>12.2f} {typed * 1000:>12.2f} {legacy / typed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
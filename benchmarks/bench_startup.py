@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+冷启动耗时基准：模块导入与 app/main.py 首次运行
+
+用法:
+    POSTGRES_PASSWORD=... python benchmarks/bench_startup.py [--repeat 5] [--budget 3.0]
+    POSTGRES_PASSWORD=x python benchmarks/bench_startup.py --unreachable-db
+
+每次测量都在新的子进程中进行，保证是冷导入。--unreachable-db 把数据库指向
+不可路由地址，用于确认数据库慢或不可用时启动不被阻塞。
+超过 --budget（秒）时以非零状态退出，可用于CI。
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.realpath(os.path.join(os.path.dirname(__file__), '..'))
+APP_DIR = os.path.join(ROOT, 'app')
+
+# 被页面、auth、离线脚本广泛导入的模块
+IMPORT_TARGETS = [
+    'utils.database',
+    'utils.async_database',
+    'utils.auth',
+    'utils.mold_search',
+]
+
+IMPORT_SNIPPET = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+start = time.perf_counter()
+import {module}
+print(time.perf_counter() - start)
+"""
+
+MAIN_SNIPPET = """
+import sys, time
+sys.path.insert(0, {app_dir!r})
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+AppTest.from_file({main!r}, default_timeout=60).run()
+print(time.perf_counter() - start)
+"""
+
+# TEST-NET-1，连接会一直挂起直到connect_timeout
+UNREACHABLE_HOST = '192.0.2.1'
+
+
+def run_snippet(code: str, env: dict) -> float:
+    """在新进程中执行代码片段，返回其打印的耗时秒数"""
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'unknown error')
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measure(code: str, env: dict, repeat: int):
+    """返回 (中位数, 最小值)，单位秒"""
+    samples = [run_snippet(code, env) for _ in range(repeat)]
+    return statistics.median(samples), min(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动耗时基准测试")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='单项中位耗时上限（秒）')
+    parser.add_argument('--unreachable-db', action='store_true')
+    parser.add_argument('--skip-main', action='store_true', help='只测模块导入')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.unreachable_db:
+        env['POSTGRES_HOST'] = UNREACHABLE_HOST
+    env.setdefault('POSTGRES_PASSWORD', 'bench')
+
+    cases = [
+        (f"import {module}", IMPORT_SNIPPET.format(app_dir=APP_DIR, module=module))
+        for module in IMPORT_TARGETS
+    ]
+    if not args.skip_main:
+        cases.append(('app/main.py 首次运行', MAIN_SNIPPET.format(
+            app_dir=APP_DIR, main=os.path.join(APP_DIR, 'main.py')
+        )))
+
+    print(f"{'项目':<32}{'中位(s)':>10}{'最小(s)':>10}")
+    over_budget = []
+    for label, code in cases:
+        try:
+            median, best = measure(code, env, args.repeat)
+        except Exception as e:
+            print(f"{label:<32}{'失败':>10}  {e}")
+            over_budget.append(label)
+            continue
+        flag = ''
+        if args.budget is not None and median > args.budget:
+            flag = '  超出预算'
+            over_budget.append(label)
+        print(f"{label:<32}{median:>10.3f}{best:>10.3f}{flag}")
+
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+"""
+合成数据生成器：按规模因子向完整业务表结构批量写入数据
+
+用法:
+    POSTGRES_PASSWORD=... python benchmarks/generate_data.py --scale 0.1
+    POSTGRES_PASSWORD=... python benchmarks/generate_data.py --scale 1 --truncate
+
+表结构以 sql.backup/init.sql + sql/complete_init.sql 为准，需预先建好。
+--scale 1 约为 1万模具 / 100万使用记录 / 500万系统日志（见 BASE_ROWS）。
+数据全部由 generate_series 在服务端生成，客户端只发送语句，百万行级别也无需在
+Python 中逐行构造。分布：
+    模具状态、借用状态、维修结果按现场比例加权；
+    累计冲次偏向寿命前段（random()^1.5），使用记录集中在少数热门模具（random()^2）；
+    时间戳覆盖近两年并偏向近期，系统日志集中在少数活跃用户（random()^3）。
+生成的编码带本次运行标识前缀（SYN<时间>-），可重复运行而不冲突。
+--truncate 会清空全部业务表（不含字典表），只应在压测库上使用。
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import bcrypt
+import psycopg2
+
+# 与 alembic/env.py 相同：把 app 目录加入搜索路径，以便导入 utils.database
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from utils.database import get_connection_args  # noqa: E402
+from utils.log_partitions import ensure_log_partitions  # noqa: E402
+
+# --scale 1 时各表行数
+BASE_ROWS = {
+    'users': 500,
+    'molds': 10_000,
+    'mold_parts': 40_000,
+    'products': 2_000,
+    'mold_loan_records': 200_000,
+    'mold_usage_records': 1_000_000,
+    'mold_maintenance_logs': 100_000,
+    'production_orders': 20_000,
+    'production_schedules': 30_000,
+    'mold_recommendations': 50_000,
+    'cost_records': 150_000,
+    'system_logs': 5_000_000,
+}
+
+# 每条INSERT ... SELECT生成的最大行数
+CHUNK_ROWS = 200_000
+
+# 字典表种子数据（与 sql/complete_init.sql 一致的部分保持同名）
+SEED_NAMES = {
+    'roles': ['超级管理员', '模具库管理员', '模具工', '冲压操作工', '工艺员'],
+    'mold_functional_types': ['落料模', '拉伸模', '冲孔模', '整形模', '切边模', '复合模'],
+    'storage_locations': [f'模具库{area}-{i:02d}' for area in 'ABC' for i in range(1, 9)],
+    'mold_statuses': ['闲置', '使用中', '已借出', '已预定', '外借申请中', '维修中', '保养中', '待维修', '待保养', '报废'],
+    'loan_statuses': ['待审批', '已批准', '已批准待借出', '已借出', '已归还', '已驳回', '逾期', '外借申请中'],
+    'maintenance_result_statuses': ['待开始', '进行中', '完成待检', '合格可用', '失败待查', '等待备件', '需要外协'],
+    'mold_part_categories': ['凸模', '凹模', '压边圈', '顶杆', '导柱导套'],
+    'product_types': ['平底杯', '圆筒', '异形件'],
+    'materials': ['钛TA1', '钛TA2', '不锈钢304', '铝1060'],
+}
+SEED_COLUMNS = {
+    'roles': 'role_name',
+    'mold_functional_types': 'type_name',
+    'storage_locations': 'location_name',
+    'mold_statuses': 'status_name',
+    'loan_statuses': 'status_name',
+    'maintenance_result_statuses': 'status_name',
+    'mold_part_categories': 'category_name',
+    'product_types': 'type_name',
+    'materials': 'material_name',
+}
+ID_COLUMNS = {
+    'roles': 'role_id',
+    'mold_functional_types': 'type_id',
+    'storage_locations': 'location_id',
+    'mold_statuses': 'status_id',
+    'loan_statuses': 'status_id',
+    'maintenance_result_statuses': 'status_id',
+    'mold_part_categories': 'category_id',
+    'product_types': 'type_id',
+    'materials': 'material_id',
+    'maintenance_types': 'type_id',
+}
+MAINTENANCE_TYPES = [('定期保养', False), ('日常保养', False), ('故障维修', True), ('精度修复', True), ('部件更换', True)]
+EQUIPMENT = [('PRESS-01', '1号冲压机', '液压式', 100), ('PRESS-02', '2号冲压机', '液压式', 150),
+             ('PRESS-03', '3号冲压机', '机械式', 80), ('PRESS-04', '4号冲压机', '伺服式', 200)]
+
+# 加权分布：名称 -> 权重
+WEIGHTS = {
+    'roles': {'模具工': 30, '冲压操作工': 50, '模具库管理员': 15, '工艺员': 5},
+    'mold_statuses': {'闲置': 55, '使用中': 15, '已借出': 10, '待维修': 5, '待保养': 5,
+                      '维修中': 4, '保养中': 3, '报废': 3},
+    'loan_statuses': {'已归还': 70, '已借出': 8, '已批准': 4, '待审批': 5, '已驳回': 8, '逾期': 5},
+    'maintenance_result_statuses': {'合格可用': 70, '完成待检': 10, '进行中': 8, '待开始': 5,
+                                    '失败待查': 3, '等待备件': 4},
+}
+ACTION_WEIGHTS = {'LOGIN': 40, 'LOGOUT': 25, 'VIEW_MOLD': 15, 'CREATE_LOAN': 8,
+                  'APPROVE_LOAN': 5, 'CREATE_MAINTENANCE': 5, 'UPDATE_MOLD': 2}
+ORDER_STATUS_WEIGHTS = {'待排程': 30, '部分排程': 10, '已排程': 30, '生产中': 10, '已完成': 20}
+SCHEDULE_STATUS_WEIGHTS = {'待执行': 40, '执行中': 15, '已完成': 40, '已取消': 5}
+COST_TYPE_WEIGHTS = {'维修成本': 45, '停机损失': 30, '材料成本': 25}
+
+# --truncate 清空的业务表（按依赖顺序无关，CASCADE处理）
+BUSINESS_TABLES = [
+    'system_logs', 'cost_records', 'mold_recommendations', 'production_schedules', 'production_orders',
+    'mold_maintenance_logs', 'mold_usage_records', 'mold_loan_records', 'product_process_flow',
+    'products', 'mold_parts', 'molds',
+]
+
+
+def pick(array_sql: str, skew: float = 1.0) -> str:
+    """随机取数组元素的SQL表达式；skew>1时偏向数组前部（热点）"""
+    rand = 'random()' if skew == 1.0 else f'power(random(), {skew})'
+    return f"({array_sql})[1 + floor({rand} * cardinality({array_sql}))::int]"
+
+
+def weighted(ids_by_name: dict, weights: dict) -> list:
+    """按权重展开为数组，随机下标即加权抽样"""
+    expanded = []
+    for name, weight in weights.items():
+        if name in ids_by_name:
+            expanded.extend([ids_by_name[name]] * weight)
+    return expanded or list(ids_by_name.values())
+
+
+def expand(weights: dict) -> list:
+    return [name for name, weight in weights.items() for _ in range(weight)]
+
+
+def connect():
+    """独立连接：批量生成不受交互语句超时限制"""
+    conn_args = get_connection_args()
+    conn_args.pop('cursor_factory', None)
+    conn_args.pop('connection_factory', None)
+    conn_args['options'] = '-c statement_timeout=0'
+    conn = psycopg2.connect(**conn_args)
+    conn.autocommit = True
+    return conn
+
+
+def seed_dictionaries(cursor) -> dict:
+    """补齐字典表并返回 表 -> {名称: id}"""
+    for table, names in SEED_NAMES.items():
+        column = SEED_COLUMNS[table]
+        cursor.execute(
+            f"INSERT INTO {table} ({column}) SELECT unnest(%s::text[]) ON CONFLICT ({column}) DO NOTHING",
+            (names,)
+        )
+    cursor.execute(
+        "INSERT INTO maintenance_types (type_name, is_repair) SELECT * FROM unnest(%s::text[], %s::bool[]) "
+        "ON CONFLICT (type_name) DO NOTHING",
+        ([name for name, _ in MAINTENANCE_TYPES], [repair for _, repair in MAINTENANCE_TYPES])
+    )
+    cursor.execute(
+        "INSERT INTO production_equipment (equipment_code, equipment_name, equipment_type, tonnage) "
+        "SELECT * FROM unnest(%s::text[], %s::text[], %s::text[], %s::int[]) "
+        "ON CONFLICT (equipment_code) DO NOTHING",
+        tuple(list(column) for column in zip(*EQUIPMENT))
+    )
+
+    lookups = {}
+    for table, id_column in ID_COLUMNS.items():
+        column = SEED_COLUMNS.get(table, 'type_name')
+        cursor.execute(f"SELECT {id_column}, {column} FROM {table}")
+        lookups[table] = {name: item_id for item_id, name in cursor.fetchall()}
+    return lookups
+
+
+def insert_series(cursor, table: str, sql: str, total: int, params: dict):
+    """按CHUNK_ROWS分块执行 INSERT ... SELECT ... FROM generate_series(%(lo)s, %(hi)s)"""
+    start = time.perf_counter()
+    for lo in range(1, total + 1, CHUNK_ROWS):
+        hi = min(lo + CHUNK_ROWS - 1, total)
+        cursor.execute(sql, {**params, 'lo': lo, 'hi': hi})
+    print(f"  {table:<24}{total:>12,} 行 {time.perf_counter() - start:>8.1f}s")
+
+
+def generate(scale: float, truncate: bool = False) -> dict:
+    """
+    按规模因子生成全部业务表数据
+
+    Returns:
+        表 -> 本次生成行数
+    """
+    rows = {table: max(1, int(base * scale)) for table, base in BASE_ROWS.items()}
+    run_id = datetime.now().strftime('%y%m%d%H%M%S')
+    prefix = f"SYN{run_id}-"
+
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            if truncate:
+                cursor.execute(f"TRUNCATE {', '.join(BUSINESS_TABLES)} RESTART IDENTITY CASCADE")
+                cursor.execute(r"DELETE FROM users WHERE username LIKE 'syn%\_%'")
+                print("已清空业务表")
+
+            lookups = seed_dictionaries(cursor)
+            password_hash = bcrypt.hashpw(b'synthetic', bcrypt.gensalt()).decode('utf-8')
+
+            params = {
+                'prefix': prefix,
+                'user_prefix': f"syn{run_id}_",
+                'password_hash': password_hash,
+                'role_ids': weighted(lookups['roles'], WEIGHTS['roles']),
+                'type_ids': list(lookups['mold_functional_types'].values()),
+                'location_ids': list(lookups['storage_locations'].values()),
+                'mold_status_ids': weighted(lookups['mold_statuses'], WEIGHTS['mold_statuses']),
+                'idle_status_id': lookups['mold_statuses']['闲置'],
+                'loan_status_ids': weighted(lookups['loan_statuses'], WEIGHTS['loan_statuses']),
+                'pending_loan_id': lookups['loan_statuses']['待审批'],
+                'returned_loan_id': lookups['loan_statuses']['已归还'],
+                'out_loan_ids': [lookups['loan_statuses'][name] for name in ('已借出', '已归还', '逾期')],
+                'result_status_ids': weighted(lookups['maintenance_result_statuses'],
+                                              WEIGHTS['maintenance_result_statuses']),
+                'maintenance_type_ids': list(lookups['maintenance_types'].values()),
+                'category_ids': list(lookups['mold_part_categories'].values()),
+                'product_type_ids': list(lookups['product_types'].values()),
+                'material_ids': list(lookups['materials'].values()),
+                'actions': expand(ACTION_WEIGHTS),
+                'order_statuses': expand(ORDER_STATUS_WEIGHTS),
+                'schedule_statuses': expand(SCHEDULE_STATUS_WEIGHTS),
+                'cost_types': expand(COST_TYPE_WEIGHTS),
+                'lifespans': [200_000, 500_000, 1_000_000, 2_000_000],
+            }
+
+            print(f"规模因子 {scale:g}，运行标识 {prefix}")
+
+            insert_series(cursor, 'users', f"""
+            INSERT INTO users (username, password_hash, full_name, role_id, is_active, created_at)
+            SELECT %(user_prefix)s || g, %(password_hash)s, '合成用户' || g,
+                   {pick('%(role_ids)s::int[]')}, random() < 0.95,
+                   NOW() - random() * INTERVAL '730 days'
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            """, rows['users'], params)
+
+            # 后续各表从已有行中随机引用外键
+            refs = """
+            CROSS JOIN (SELECT array_agg(user_id) AS ids FROM users WHERE is_active) AS u
+            CROSS JOIN (SELECT array_agg(mold_id ORDER BY random()) AS ids FROM molds) AS m
+            """
+
+            insert_series(cursor, 'molds', f"""
+            INSERT INTO molds (mold_code, mold_name, mold_functional_type_id, supplier, manufacturing_date,
+                               theoretical_lifespan_strokes, accumulated_strokes, maintenance_cycle_strokes,
+                               current_status_id, current_location_id, responsible_person_id, created_at)
+            SELECT %(prefix)s || LPAD(g::text, 7, '0'), '合成模具' || g, {pick('%(type_ids)s::int[]')},
+                   '供应商' || (g %% 17), CURRENT_DATE - (random() * 3650)::int,
+                   l.lifespan, floor(l.lifespan * power(random(), 1.5))::int, l.lifespan / 20,
+                   {pick('%(mold_status_ids)s::int[]')}, {pick('%(location_ids)s::int[]')},
+                   {pick('u.ids')}, NOW() - random() * INTERVAL '1095 days'
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            CROSS JOIN (SELECT array_agg(user_id) AS ids FROM users WHERE is_active) AS u
+            CROSS JOIN LATERAL (
+                SELECT (%(lifespans)s::int[])[1 + floor(random() * 4)::int + 0 * g] AS lifespan
+            ) AS l
+            """, rows['molds'], params)
+
+            insert_series(cursor, 'mold_parts', f"""
+            INSERT INTO mold_parts (mold_id, part_code, part_name, part_category_id, installation_date,
+                                    lifespan_strokes, current_status_id)
+            SELECT {pick('m.ids')}, %(prefix)s || 'P' || g, '合成部件' || g, {pick('%(category_ids)s::int[]')},
+                   CURRENT_DATE - (random() * 1500)::int, 100000 + (random() * 900000)::int,
+                   %(idle_status_id)s
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            CROSS JOIN (SELECT array_agg(mold_id) AS ids FROM molds) AS m
+            """, rows['mold_parts'], params)
+
+            insert_series(cursor, 'products', f"""
+            INSERT INTO products (product_code, product_name, product_type_id, material_id)
+            SELECT %(prefix)s || 'PR' || g, '合成产品' || g, {pick('%(product_type_ids)s::int[]')},
+                   {pick('%(material_ids)s::int[]')}
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            """, rows['products'], params)
+
+            # 每个新产品三道工序，(product_id, sequence_order) 唯一
+            cursor.execute(f"""
+            INSERT INTO product_process_flow (product_id, mold_id, sequence_order, process_step_name)
+            SELECT p.product_id, {pick('m.ids')}, s, '工序' || s
+            FROM products p
+            CROSS JOIN generate_series(1, 3) AS s
+            CROSS JOIN (SELECT array_agg(mold_id) AS ids FROM molds) AS m
+            WHERE p.product_code LIKE %(prefix)s || '%%'
+            """, params)
+
+            insert_series(cursor, 'mold_loan_records', f"""
+            INSERT INTO mold_loan_records (mold_id, applicant_id, application_timestamp, approver_id,
+                                           approval_timestamp, loan_out_timestamp, expected_return_timestamp,
+                                           actual_return_timestamp, loan_status_id, destination_equipment)
+            SELECT {pick('m.ids', 2)}, {pick('u.ids')}, t.applied,
+                   CASE WHEN t.status <> %(pending_loan_id)s THEN {pick('u.ids')} END,
+                   CASE WHEN t.status <> %(pending_loan_id)s THEN t.applied + random() * INTERVAL '8 hours' END,
+                   CASE WHEN t.status = ANY(%(out_loan_ids)s) THEN t.applied + INTERVAL '1 day' END,
+                   t.applied + (1 + random() * 30) * INTERVAL '1 day',
+                   CASE WHEN t.status = %(returned_loan_id)s
+                        THEN t.applied + (2 + random() * 30) * INTERVAL '1 day' END,
+                   t.status, 'PRESS-0' || (1 + g %% 4)
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            {refs}
+            CROSS JOIN LATERAL (
+                SELECT NOW() - power(random(), 1.5) * INTERVAL '730 days' + 0 * g * INTERVAL '1 second' AS applied,
+                       {pick('%(loan_status_ids)s::int[]')} + 0 * g AS status
+            ) AS t
+            """, rows['mold_loan_records'], params)
+
+            insert_series(cursor, 'mold_usage_records', f"""
+            INSERT INTO mold_usage_records (mold_id, operator_id, equipment_id, production_order_number,
+                                            start_timestamp, end_timestamp, strokes_this_session,
+                                            produced_quantity, qualified_quantity)
+            SELECT {pick('m.ids', 2)}, {pick('u.ids')}, 'PRESS-0' || (1 + g %% 4), 'PO' || (g %% 50000),
+                   t.started, t.started + (30 + random() * 450) * INTERVAL '1 minute',
+                   t.strokes, t.strokes * 2, floor(t.strokes * 2 * (0.95 + random() * 0.05))::int
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            {refs}
+            CROSS JOIN LATERAL (
+                SELECT NOW() - power(random(), 2) * INTERVAL '730 days' + 0 * g * INTERVAL '1 second' AS started,
+                       500 + floor(power(random(), 2) * 19500)::int + 0 * g AS strokes
+            ) AS t
+            """, rows['mold_usage_records'], params)
+
+            insert_series(cursor, 'mold_maintenance_logs', f"""
+            INSERT INTO mold_maintenance_logs (mold_id, maintenance_type_id, problem_description,
+                                               maintenance_start_timestamp, maintenance_end_timestamp,
+                                               maintained_by_id, maintenance_cost, result_status_id)
+            SELECT {pick('m.ids', 2)}, {pick('%(maintenance_type_ids)s::int[]')}, '合成维修记录' || g,
+                   t.started,
+                   CASE WHEN random() < 0.9 THEN t.started + (1 + random() * 72) * INTERVAL '1 hour' END,
+                   {pick('u.ids')}, round((100 + power(random(), 3) * 20000)::numeric, 2),
+                   {pick('%(result_status_ids)s::int[]')}
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            {refs}
+            CROSS JOIN LATERAL (
+                SELECT NOW() - random() * INTERVAL '730 days' + 0 * g * INTERVAL '1 second' AS started
+            ) AS t
+            """, rows['mold_maintenance_logs'], params)
+
+            insert_series(cursor, 'production_orders', f"""
+            INSERT INTO production_orders (order_code, product_id, quantity, due_date, priority, status, created_at)
+            SELECT %(prefix)s || 'O' || g, {pick('p.ids')}, 100 + (random() * 49900)::int,
+                   CURRENT_DATE + (random() * 90)::int - 30, 1 + (random() * 9)::int,
+                   {pick('%(order_statuses)s::text[]')}, NOW() - random() * INTERVAL '180 days'
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            CROSS JOIN (SELECT array_agg(product_id) AS ids FROM products) AS p
+            """, rows['production_orders'], params)
+
+            insert_series(cursor, 'production_schedules', f"""
+            INSERT INTO production_schedules (order_id, mold_id, equipment_id, operator_id,
+                                              scheduled_start, scheduled_end, status)
+            SELECT {pick('o.ids')}, {pick('m.ids', 2)}, {pick('e.ids')}, {pick('u.ids')},
+                   t.starts, t.starts + (2 + random() * 10) * INTERVAL '1 hour',
+                   {pick('%(schedule_statuses)s::text[]')}
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            {refs}
+            CROSS JOIN (SELECT array_agg(order_id) AS ids FROM production_orders) AS o
+            CROSS JOIN (SELECT array_agg(equipment_id) AS ids FROM production_equipment) AS e
+            CROSS JOIN LATERAL (
+                SELECT NOW() + (random() * 60 - 30) * INTERVAL '1 day' + 0 * g * INTERVAL '1 second' AS starts
+            ) AS t
+            """, rows['production_schedules'], params)
+
+            insert_series(cursor, 'mold_recommendations', f"""
+            INSERT INTO mold_recommendations (order_id, mold_id, recommendation_score, is_selected)
+            SELECT {pick('o.ids')}, {pick('m.ids')}, round((random() * 100)::numeric, 2), random() < 0.2
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            CROSS JOIN (SELECT array_agg(mold_id) AS ids FROM molds) AS m
+            CROSS JOIN (SELECT array_agg(order_id) AS ids FROM production_orders) AS o
+            """, rows['mold_recommendations'], params)
+
+            insert_series(cursor, 'cost_records', f"""
+            INSERT INTO cost_records (cost_type, related_type, related_id, amount, cost_date, created_by)
+            SELECT {pick('%(cost_types)s::text[]')}, 'mold', {pick('m.ids', 2)},
+                   round((50 + power(random(), 3) * 50000)::numeric, 2),
+                   CURRENT_DATE - (random() * 365)::int, {pick('u.ids')}
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            {refs}
+            """, rows['cost_records'], params)
+
+            insert_series(cursor, 'system_logs', f"""
+            INSERT INTO system_logs (user_id, action_type, target_resource, target_id, ip_address, timestamp)
+            SELECT {pick('u.ids', 3)}, {pick('%(actions)s::text[]')}, 'mold', (g %% 10000)::text,
+                   '10.0.' || (g %% 256) || '.' || (g %% 251), NOW() - random() * INTERVAL '365 days'
+            FROM generate_series(%(lo)s, %(hi)s) AS g
+            CROSS JOIN (SELECT array_agg(user_id) AS ids FROM users WHERE is_active) AS u
+            """, rows['system_logs'], params)
+
+            # system_logs已按月分区时，早于现有分区的日志先落入默认分区，在此拆分为月分区
+            created = ensure_log_partitions()
+            if created:
+                print(f"  新建日志分区 {len(created)} 个")
+
+            start = time.perf_counter()
+            cursor.execute("ANALYZE")
+            print(f"  ANALYZE {time.perf_counter() - start:>35.1f}s")
+    finally:
+        conn.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="合成数据生成")
+    parser.add_argument('--scale', type=float, default=0.1, help='规模因子，1约为1万模具')
+    parser.add_argument('--truncate', action='store_true', help='生成前清空业务表（仅限压测库）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = generate(args.scale, truncate=args.truncate)
+    print(f"完成：共 {sum(rows.values()):,} 行，耗时 {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# tests/conftest.py - 单元测试公共配置：与 app/ 下的页面一样以 utils.* 导入
+import os
+import sys
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..', 'app')))
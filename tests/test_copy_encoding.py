@@ -0,0 +1,55 @@
+# tests/test_copy_encoding.py - COPY TEXT 字段编码与 execute_values 回退参数
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import numpy as np
+import psycopg2.extras
+
+from utils.database import _copy_text_value, _insert_row_params
+
+
+def test_null_and_bool():
+    assert _copy_text_value(None) == '\\N'
+    assert _copy_text_value(True) == 't'
+    assert _copy_text_value(False) == 'f'
+
+
+def test_special_characters_are_escaped():
+    assert _copy_text_value('a\tb') == 'a\\tb'
+    assert _copy_text_value('line1\nline2\r') == 'line1\\nline2\\r'
+    assert _copy_text_value('C:\\temp') == 'C:\\\\temp'
+
+
+def test_backslash_escaped_before_control_characters():
+    # 先转义反斜杠，否则 \t 会被再次转义成 \\t
+    assert _copy_text_value('\\\t') == '\\\\\\t'
+
+
+def test_decimal_keeps_full_precision():
+    value = Decimal('12345678901234567.123456789')
+    assert _copy_text_value(value) == '12345678901234567.123456789'
+    assert _copy_text_value(Decimal('0.10')) == '0.10'
+
+
+def test_numpy_scalars():
+    assert _copy_text_value(np.int64(7)) == '7'
+    assert _copy_text_value(np.float64(1.5)) == '1.5'
+
+
+def test_dates_use_iso_format():
+    assert _copy_text_value(date(2026, 10, 1)) == '2026-10-01'
+    moment = datetime(2026, 10, 1, 8, 30, tzinfo=timezone.utc)
+    assert _copy_text_value(moment) == '2026-10-01T08:30:00+00:00'
+
+
+def test_json_values_are_escaped():
+    assert _copy_text_value({'note': '换行\n'}) == '{"note": "换行\\\\n"}'
+    assert _copy_text_value([1, 2]) == '[1, 2]'
+
+
+def test_insert_fallback_wraps_dicts_as_json():
+    params = _insert_row_params([1, {'k': 'v'}, 'text', None])
+    assert isinstance(params, tuple)
+    assert isinstance(params[1], psycopg2.extras.Json)
+    assert params[1].adapted == {'k': 'v'}
+    assert params[0] == 1 and params[2] == 'text' and params[3] is None
@@ -0,0 +1,83 @@
+# tests/test_keyset_pagination.py - 键集分页的查询构造与游标
+from datetime import datetime
+
+import pytest
+
+import utils.database as database
+from utils.auth import _user_filters
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    """替换 execute_query，记录生成的查询并返回预设行"""
+    calls = []
+    result = {'rows': []}
+
+    def fake_execute_query(query, params=None, **kwargs):
+        calls.append((query, params))
+        return result['rows']
+
+    monkeypatch.setattr(database, 'execute_query', fake_execute_query)
+    return calls, result
+
+
+def _rows(count):
+    return [{'created_at': datetime(2026, 10, 1, 0, 0, i), 'mold_id': 100 - i} for i in range(count)]
+
+
+def test_first_page_has_no_cursor_condition(captured):
+    calls, result = captured
+    result['rows'] = _rows(3)
+    page = database.fetch_keyset_page("SELECT * FROM molds", ('created_at', 'mold_id'), limit=5)
+    query, params = calls[0]
+    assert 'WHERE (created_at, mold_id)' not in query
+    assert query.endswith("ORDER BY created_at DESC, mold_id DESC LIMIT %s")
+    # 多取一行判断是否还有下一页
+    assert params == (6,)
+    assert len(page['rows']) == 3
+    assert page['next_cursor'] is None
+
+
+def test_next_cursor_is_last_row_of_full_page(captured):
+    calls, result = captured
+    rows = _rows(3)
+    result['rows'] = rows
+    page = database.fetch_keyset_page("SELECT * FROM molds", ('created_at', 'mold_id'), limit=2)
+    assert page['rows'] == rows[:2]
+    assert page['next_cursor'] == (rows[1]['created_at'], rows[1]['mold_id'])
+
+
+def test_cursor_condition_follows_base_params(captured):
+    calls, _ = captured
+    cursor = (datetime(2026, 10, 1), 42)
+    database.fetch_keyset_page(
+        "SELECT * FROM molds WHERE current_status_id = %s", ('created_at', 'mold_id'),
+        params=[3], after=cursor, limit=10
+    )
+    query, params = calls[0]
+    assert "WHERE (created_at, mold_id) < (%s, %s)" in query
+    assert params == (3, cursor[0], cursor[1], 11)
+
+
+def test_ascending_uses_greater_than(captured):
+    calls, _ = captured
+    database.fetch_keyset_page("SELECT * FROM t", ('ts', 'id'), after=(1, 2), limit=1, descending=False)
+    query, _ = calls[0]
+    assert "(ts, id) > (%s, %s)" in query
+    assert query.endswith("ORDER BY ts ASC, id ASC LIMIT %s")
+
+
+def test_user_filters_build_sql_conditions():
+    assert _user_filters() == ("", [])
+    where, params = _user_filters(search='li_%', role_name='模具工', is_active=False)
+    assert where == " WHERE (u.username ILIKE %s OR u.full_name ILIKE %s) AND r.role_name = %s AND u.is_active = %s"
+    # LIKE通配符按字面匹配
+    assert params == ['%li\\_\\%%', '%li\\_\\%%', '模具工', False]
+
+
+def test_paging_helpers_are_keyword_only():
+    from utils.auth import get_all_users
+    with pytest.raises(TypeError):
+        get_all_users(0, 100)
+    with pytest.raises(TypeError):
+        database.get_all_molds(0, 100)
@@ -0,0 +1,47 @@
+# tests/test_lookup_maps.py - LookupMap 不可变性与双向查找
+import pytest
+
+from utils.lookup_maps import LookupMap
+
+
+@pytest.fixture
+def statuses():
+    return LookupMap('mold_statuses', [(1, '闲置'), (2, '使用中'), (3, '维修中')])
+
+
+def test_lookup_both_directions(statuses):
+    assert statuses.id_of('使用中') == 2
+    assert statuses.name_of(3) == '维修中'
+    assert statuses.id_of('报废') is None
+    assert statuses.name_of(99) is None
+
+
+def test_ids_of_skips_unknown_names(statuses):
+    assert statuses.ids_of(['维修中', '报废', '闲置']) == [3, 1]
+
+
+def test_container_protocol(statuses):
+    assert '闲置' in statuses
+    assert '报废' not in statuses
+    assert len(statuses) == 3
+
+
+def test_attributes_cannot_be_reassigned(statuses):
+    with pytest.raises(AttributeError):
+        statuses.table = 'roles'
+    with pytest.raises(AttributeError):
+        statuses._by_id = {}
+
+
+def test_views_are_read_only(statuses):
+    with pytest.raises(TypeError):
+        statuses.by_id[4] = '报废'
+    with pytest.raises(TypeError):
+        statuses.by_name['报废'] = 4
+
+
+def test_source_pairs_are_copied():
+    pairs = [(1, 'a')]
+    lookup = LookupMap('roles', pairs)
+    pairs.append((2, 'b'))
+    assert len(lookup) == 1
@@ -0,0 +1,59 @@
+# tests/test_query_metrics.py - 查询指纹归一化与指纹数量上限
+import pytest
+
+from utils import query_metrics
+from utils.query_metrics import fingerprint, fingerprint_id, record_query, get_query_stats
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    query_metrics.reset_query_stats()
+    yield
+    query_metrics.reset_query_stats()
+
+
+def test_fingerprint_strips_literals_and_whitespace():
+    a = fingerprint("SELECT *  FROM molds\n WHERE mold_id = 42 AND mold_code = 'M-001'")
+    b = fingerprint("SELECT * FROM molds WHERE mold_id = 7 AND mold_code = 'it''s'")
+    assert a == b == "SELECT * FROM molds WHERE mold_id = ? AND mold_code = ?"
+
+
+def test_fingerprint_keeps_identifiers_with_digits():
+    assert fingerprint("SELECT * FROM system_logs_p202610 WHERE x = 1") == \
+        "SELECT * FROM system_logs_p202610 WHERE x = ?"
+
+
+def test_fingerprint_id_is_stable_and_short():
+    normalized = fingerprint("SELECT 1")
+    assert fingerprint_id(normalized) == fingerprint_id(normalized)
+    assert len(fingerprint_id(normalized)) == 12
+
+
+def test_same_fingerprint_aggregates():
+    record_query("SELECT * FROM molds WHERE mold_id = 1", 2.0, rows=1, caller='t')
+    record_query("SELECT * FROM molds WHERE mold_id = 2", 4.0, rows=1, caller='t')
+    stats = get_query_stats()
+    assert len(stats) == 1
+    assert stats[0]['count'] == 2
+    assert stats[0]['max'] == 4.0
+
+
+def test_fingerprint_cap_evicts_least_recently_seen(monkeypatch):
+    monkeypatch.setattr(query_metrics, 'MAX_QUERY_FINGERPRINTS', 3)
+    for table in ('a', 'b', 'c'):
+        record_query(f"SELECT * FROM {table}", 1.0, caller='t')
+    # a 最近再次出现，淘汰的应是 b
+    record_query("SELECT * FROM a", 1.0, caller='t')
+    record_query("SELECT * FROM d", 1.0, caller='t')
+    queries = {row['query'] for row in get_query_stats()}
+    assert queries == {"SELECT * FROM a", "SELECT * FROM c", "SELECT * FROM d"}
+
+
+def test_samples_per_fingerprint_are_bounded(monkeypatch):
+    monkeypatch.setattr(query_metrics, 'SAMPLES_PER_QUERY', 5)
+    for i in range(20):
+        record_query("SELECT 1", float(i), caller='t')
+    stats = get_query_stats()[0]
+    assert stats['count'] == 20
+    # 只保留最近5个样本：15..19
+    assert stats['p50'] == 17.0
@@ -0,0 +1,104 @@
+# tests/test_rate_limit.py - 登录限流的等待时间/锁定计算与客户端IP选取
+from types import SimpleNamespace
+
+import pytest
+
+import utils.auth as auth
+import utils.rate_limit as rate_limit
+
+
+@pytest.fixture
+def bucket_rows(monkeypatch):
+    """替换 execute_query，返回预设的令牌桶行并记录调用"""
+    calls = []
+    result = {'rows': []}
+
+    def fake_execute_query(query, params=None, **kwargs):
+        calls.append((query, params))
+        return result['rows']
+
+    monkeypatch.setattr(rate_limit, 'execute_query', fake_execute_query)
+    monkeypatch.setattr(rate_limit, '_ensure_sweeper', lambda: None)
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ENABLED', True)
+    return calls, result
+
+
+def test_buckets_per_user_and_ip():
+    buckets = rate_limit._buckets('  Admin ', '10.0.0.8')
+    assert [key for key, _, _ in buckets] == ['user:admin', 'ip:10.0.0.8']
+    assert buckets[0][2] == pytest.approx(rate_limit.LOGIN_USER_PER_MINUTE / 60)
+    assert [key for key, _, _ in rate_limit._buckets('admin', None)] == ['user:admin']
+
+
+def test_allowed_when_every_bucket_has_tokens(bucket_rows):
+    calls, result = bucket_rows
+    result['rows'] = [
+        {'bucket_key': 'user:a', 'allowed': True, 'tokens': 3.0, 'refill_per_sec': 1 / 60},
+        {'bucket_key': 'ip:1.2.3.4', 'allowed': True, 'tokens': 20.0, 'refill_per_sec': 1 / 6},
+    ]
+    assert rate_limit.check_login_allowed('a', '1.2.3.4') == (True, 0.0)
+    # 一条语句取两个桶的令牌
+    assert len(calls) == 1
+    assert calls[0][1] == ['user:a', rate_limit.LOGIN_USER_BURST, rate_limit.LOGIN_USER_PER_MINUTE / 60,
+                           'ip:1.2.3.4', rate_limit.LOGIN_IP_BURST, rate_limit.LOGIN_IP_PER_MINUTE / 60]
+
+
+def test_retry_after_is_time_until_one_token(bucket_rows):
+    _, result = bucket_rows
+    result['rows'] = [
+        {'bucket_key': 'user:a', 'allowed': False, 'tokens': 0.25, 'refill_per_sec': 1 / 60},
+        {'bucket_key': 'ip:1.2.3.4', 'allowed': False, 'tokens': 0.5, 'refill_per_sec': 1 / 6},
+    ]
+    allowed, retry_after = rate_limit.check_login_allowed('a', '1.2.3.4')
+    assert not allowed
+    # 取最慢恢复的桶：用户桶还差0.75个令牌，每秒1/60个 -> 45秒
+    assert retry_after == pytest.approx(45.0)
+
+
+def test_bucket_that_never_refills_is_a_lockout(bucket_rows):
+    _, result = bucket_rows
+    result['rows'] = [
+        {'bucket_key': 'user:a', 'allowed': False, 'tokens': 0.0, 'refill_per_sec': 0.0},
+        {'bucket_key': 'ip:1.2.3.4', 'allowed': False, 'tokens': 0.5, 'refill_per_sec': 1 / 6},
+    ]
+    assert rate_limit.check_login_allowed('a', '1.2.3.4') == (False, None)
+
+
+def test_database_error_fails_open(monkeypatch):
+    def failing_execute_query(*args, **kwargs):
+        raise RuntimeError("connection refused")
+
+    monkeypatch.setattr(rate_limit, 'execute_query', failing_execute_query)
+    monkeypatch.setattr(rate_limit, '_ensure_sweeper', lambda: None)
+    monkeypatch.setattr(rate_limit, 'RATE_LIMIT_ENABLED', True)
+    assert rate_limit.check_login_allowed('a', None) == (True, 0.0)
+
+
+def test_refund_targets_the_same_buckets(bucket_rows):
+    calls, _ = bucket_rows
+    rate_limit.refund_login_attempt('A', '1.2.3.4')
+    query, params = calls[0]
+    assert 'LEAST(capacity, tokens + 1)' in query
+    assert params == (['user:a', 'ip:1.2.3.4'],)
+
+
+def _with_headers(monkeypatch, headers):
+    monkeypatch.setattr(auth.st, 'context', SimpleNamespace(headers=headers), raising=False)
+
+
+def test_client_ip_prefers_x_real_ip(monkeypatch):
+    _with_headers(monkeypatch, {'X-Real-Ip': ' 203.0.113.9 ', 'X-Forwarded-For': '1.1.1.1, 203.0.113.9'})
+    assert auth._client_ip() == '203.0.113.9'
+
+
+def test_client_ip_uses_last_forwarded_hop(monkeypatch):
+    # 第一跳由客户端填写，可伪造；最后一跳由最近的代理追加
+    _with_headers(monkeypatch, {'X-Forwarded-For': '6.6.6.6, 198.51.100.4'})
+    assert auth._client_ip() == '198.51.100.4'
+
+
+def test_client_ip_missing(monkeypatch):
+    _with_headers(monkeypatch, {})
+    assert auth._client_ip() is None
+    _with_headers(monkeypatch, {'X-Forwarded-For': ' '})
+    assert auth._client_ip() is None
@@ -0,0 +1,81 @@
+# tests/test_table_cache.py - TableCache 失效代数与表名解析
+from utils.table_cache import TableCache, extract_read_tables, extract_write_tables
+
+
+def test_put_and_get():
+    cache = TableCache()
+    assert cache.put('k', [1], ['molds'])
+    assert cache.get('k') == (True, [1])
+    assert cache.get('missing') == (False, None)
+
+
+def test_invalidate_removes_dependent_entries_only():
+    cache = TableCache()
+    cache.put('molds', 1, ['molds'])
+    cache.put('users', 2, ['users'])
+    assert cache.invalidate(['MOLDS']) == 1
+    assert cache.get('molds') == (False, None)
+    assert cache.get('users') == (True, 2)
+
+
+def test_fill_discarded_when_table_invalidated_after_snapshot():
+    cache = TableCache()
+    snapshot = cache.snapshot(['molds'])
+    # 查询期间有写入提交
+    cache.invalidate(['molds'])
+    assert not cache.put('k', 'stale', ['molds'], snapshot=snapshot)
+    assert cache.get('k') == (False, None)
+    assert cache.get_stats()['stale_fills'] == 1
+
+
+def test_fill_kept_when_unrelated_table_invalidated():
+    cache = TableCache()
+    snapshot = cache.snapshot(['molds'])
+    cache.invalidate(['users'])
+    assert cache.put('k', 'fresh', ['molds'], snapshot=snapshot)
+    assert cache.get('k') == (True, 'fresh')
+
+
+def test_fill_discarded_after_clear():
+    cache = TableCache()
+    snapshot = cache.snapshot(['molds'])
+    cache.clear()
+    assert not cache.put('k', 'stale', ['molds'], snapshot=snapshot)
+
+
+def test_snapshot_normalizes_table_names():
+    cache = TableCache()
+    snapshot = cache.snapshot(['public.Molds'])
+    cache.invalidate(['molds'])
+    assert not cache.put('k', 'stale', ['molds'], snapshot=snapshot)
+
+
+def test_lru_eviction():
+    cache = TableCache(max_entries=2)
+    cache.put('a', 1, ['t'])
+    cache.put('b', 2, ['t'])
+    cache.get('a')
+    cache.put('c', 3, ['t'])
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+
+
+def test_ttl_expiry(monkeypatch):
+    import utils.table_cache as table_cache
+    now = [1000.0]
+    monkeypatch.setattr(table_cache.time, 'time', lambda: now[0])
+    cache = TableCache()
+    cache.put('k', 1, ['t'], ttl=10)
+    assert cache.get('k') == (True, 1)
+    now[0] += 11
+    assert cache.get('k') == (False, None)
+
+
+def test_extract_tables():
+    query = "SELECT * FROM molds m JOIN public.mold_statuses ms ON true FOR UPDATE OF m"
+    assert extract_read_tables(query) == {'molds', 'mold_statuses'}
+    assert extract_read_tables("SELECT * FROM v_mold_status_overview") >= {'molds', 'storage_locations'}
+    assert extract_write_tables(
+        "INSERT INTO users (username) VALUES (%s) ON CONFLICT DO UPDATE SET username = 'x'"
+    ) == {'users'}